@@ -0,0 +1 @@
+"""Benchmarks offline do Monitor de Ativos (ver `run_benchmarks.py`)."""
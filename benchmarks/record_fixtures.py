@@ -0,0 +1,112 @@
+"""Grava as respostas dos provedores usadas como modelo pelo replay offline.
+
+    python -m benchmarks.record_fixtures               # grava da rede
+    python -m benchmarks.record_fixtures --synthetic   # gera no mesmo formato, sem rede
+
+As respostas são salvas sem alteração (JSON da CoinGecko e CSV do
+`yfinance`); o replay as reescala para cada ativo sintético.
+"""
+import argparse
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+STOCK_TICKER = "PETR4.SA"
+CRYPTO_ID = "bitcoin"
+SIMPLE_PRICE_IDS = ["bitcoin", "ethereum", "solana"]
+
+SIMPLE_PRICE_FILE = "coingecko_simple_price.json"
+COINS_LIST_FILE = "coingecko_coins_list.json"
+B3_LISTING_FILE = "brapi_quote_list.json"
+MARKET_CHART_FILE = f"coingecko_market_chart_{CRYPTO_ID}.json"
+STOCK_HISTORY_FILE = f"yahoo_history_{STOCK_TICKER}.csv"
+METADATA_FILE = "metadata.json"
+
+def record_live():
+    """Grava respostas reais da CoinGecko e do Yahoo Finance."""
+    import requests
+    import yfinance as yf
+
+    base_url = "https://api.coingecko.com/api/v3"
+    response = requests.get(f"{base_url}/simple/price",
+                            params={'ids': ','.join(SIMPLE_PRICE_IDS), 'vs_currencies': 'usd'}, timeout=30)
+    response.raise_for_status()
+    (FIXTURES_DIR / SIMPLE_PRICE_FILE).write_text(response.text, encoding='utf-8')
+
+    response = requests.get(f"{base_url}/coins/{CRYPTO_ID}/market_chart",
+                            params={'vs_currency': 'usd', 'days': 'max', 'interval': 'daily'}, timeout=30)
+    response.raise_for_status()
+    (FIXTURES_DIR / MARKET_CHART_FILE).write_text(response.text, encoding='utf-8')
+
+    response = requests.get(f"{base_url}/coins/list", timeout=30)
+    response.raise_for_status()
+    (FIXTURES_DIR / COINS_LIST_FILE).write_text(response.text, encoding='utf-8')
+
+    response = requests.get("https://brapi.dev/api/quote/list", params={'limit': 10000}, timeout=30)
+    response.raise_for_status()
+    (FIXTURES_DIR / B3_LISTING_FILE).write_text(response.text, encoding='utf-8')
+
+    hist = yf.Ticker(STOCK_TICKER).history(period="max", interval="1d")
+    hist.to_csv(FIXTURES_DIR / STOCK_HISTORY_FILE)
+    return "live"
+
+def generate_synthetic(seed=42, crypto_days=2500, stock_days=3000, coin_count=2000, stock_count=2000):
+    """Gera fixtures no formato exato das respostas reais, sem acessar a rede."""
+    rng = random.Random(seed)
+    end = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    prices = {crypto_id: {'usd': round(rng.uniform(10, 60000), 2)} for crypto_id in SIMPLE_PRICE_IDS}
+    (FIXTURES_DIR / SIMPLE_PRICE_FILE).write_text(json.dumps(prices), encoding='utf-8')
+
+    price = 100.0
+    chart = {'prices': [], 'market_caps': [], 'total_volumes': []}
+    for offset in range(crypto_days, -1, -1):
+        price *= math.exp(rng.gauss(0.0008, 0.035))
+        ts = int((end - timedelta(days=offset)).timestamp() * 1000)
+        chart['prices'].append([ts, price])
+        chart['market_caps'].append([ts, price * 19_000_000])
+        chart['total_volumes'].append([ts, price * rng.uniform(1e5, 1e6)])
+    (FIXTURES_DIR / MARKET_CHART_FILE).write_text(json.dumps(chart), encoding='utf-8')
+
+    price = 10.0
+    lines = ["Date,Open,High,Low,Close,Volume,Dividends,Stock Splits"]
+    day = end - timedelta(days=int(stock_days * 7 / 5))
+    while day <= end:
+        if day.weekday() < 5:
+            open_price = price
+            price *= math.exp(rng.gauss(0.0003, 0.02))
+            high = max(open_price, price) * (1 + rng.uniform(0, 0.01))
+            low = min(open_price, price) * (1 - rng.uniform(0, 0.01))
+            stamp = day.strftime('%Y-%m-%d') + " 00:00:00-03:00"
+            lines.append(f"{stamp},{open_price:.6f},{high:.6f},{low:.6f},{price:.6f},{rng.randint(10**5, 10**7)},0.0,0.0")
+        day += timedelta(days=1)
+    (FIXTURES_DIR / STOCK_HISTORY_FILE).write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+    coins = [{'id': crypto_id, 'symbol': crypto_id[:3], 'name': crypto_id.title()} for crypto_id in SIMPLE_PRICE_IDS]
+    coins += [{'id': f"synthcoin-{i}", 'symbol': f"sc{i}", 'name': f"Synth Coin {i}"} for i in range(coin_count)]
+    (FIXTURES_DIR / COINS_LIST_FILE).write_text(json.dumps(coins), encoding='utf-8')
+
+    stocks = [{'stock': STOCK_TICKER.split(".")[0], 'name': "Petrobras PN", 'type': "stock"}]
+    stocks += [{'stock': f"SYN{i:05d}", 'name': f"Empresa {i}", 'type': "stock"} for i in range(stock_count)]
+    listing = {'stocks': stocks, 'currentPage': 1, 'totalPages': 1, 'hasNextPage': False}
+    (FIXTURES_DIR / B3_LISTING_FILE).write_text(json.dumps(listing), encoding='utf-8')
+    return "synthetic"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="Gera fixtures sem acessar a rede.")
+    args = parser.parse_args(argv)
+
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    source = generate_synthetic() if args.synthetic else record_live()
+    metadata = {'source': source, 'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                'stock_ticker': STOCK_TICKER, 'crypto_id': CRYPTO_ID}
+    (FIXTURES_DIR / METADATA_FILE).write_text(json.dumps(metadata, indent=2) + "\n", encoding='utf-8')
+    print(f"Fixtures gravadas em {FIXTURES_DIR} (origem: {source})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Substituto local dos provedores que reproduz as respostas gravadas.
+
+`ProviderReplay` troca `requests.get`, `requests.Session.get` e o módulo
+`yfinance` por versões que respondem a partir das fixtures, reescalando os
+preços por identificador e deslocando as datas para que o histórico termine
+hoje. Cada chamada é contada por endpoint em `calls`.
+"""
+import json
+import sys
+import time
+import types
+import zlib
+from collections import Counter
+from unittest import mock
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from .record_fixtures import (B3_LISTING_FILE, COINS_LIST_FILE, FIXTURES_DIR, MARKET_CHART_FILE, SIMPLE_PRICE_FILE,
+                              STOCK_HISTORY_FILE)
+
+def _scale(identifier):
+    """Fator de preço determinístico por identificador."""
+    return 0.5 + (zlib.crc32(identifier.encode('utf-8')) % 1000) / 100.0
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+    @property
+    def text(self):
+        return json.dumps(self._payload)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} (replay)", response=self)
+
+class ProviderReplay:
+    """Context manager que serve as fixtures no lugar da rede."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+
+        simple_price = json.loads((fixtures_dir / SIMPLE_PRICE_FILE).read_text(encoding='utf-8'))
+        self._crypto_base_price = sum(v['usd'] for v in simple_price.values()) / len(simple_price)
+        self._coins_list = json.loads((fixtures_dir / COINS_LIST_FILE).read_text(encoding='utf-8'))
+        # Listagem gravada inteira em uma página
+        self._b3_listing = dict(json.loads((fixtures_dir / B3_LISTING_FILE).read_text(encoding='utf-8')),
+                                hasNextPage=False)
+
+        chart = json.loads((fixtures_dir / MARKET_CHART_FILE).read_text(encoding='utf-8'))
+        timestamps, values = zip(*chart['prices'])
+        crypto = pd.Series(values, index=pd.to_datetime(timestamps, unit='ms'))
+        self._crypto_history = crypto.shift(freq=pd.Timestamp.today().normalize() - crypto.index[-1].normalize())
+
+        stock = pd.read_csv(fixtures_dir / STOCK_HISTORY_FILE, index_col='Date')
+        stock.index = pd.to_datetime(stock.index, utc=True).tz_convert('America/Sao_Paulo')
+        offset = pd.Timestamp.today().normalize() - stock.index[-1].tz_localize(None).normalize()
+        stock.index = stock.index + offset
+        self._stock_history = stock
+
+        self._patches = []
+
+    # --- Ciclo de vida ---
+    def __enter__(self):
+        self._patches = [
+            mock.patch('requests.get', self._requests_get),
+            # Atributo de classe: o método ligado não recebe a sessão como argumento
+            mock.patch('requests.Session.get', self._requests_get),
+            mock.patch.dict(sys.modules, {'yfinance': self._yfinance_module()}),
+        ]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for patch in reversed(self._patches):
+            patch.stop()
+        self._patches = []
+        return False
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    # --- CoinGecko e listagem da B3 ---
+    def _requests_get(self, url, params=None, timeout=None, **kwargs):
+        self._wait()
+        path = urlparse(url).path
+        params = params or {}
+
+        if path.endswith('/quote/list'):
+            self.calls['brapi.quote_list'] += 1
+            return FakeResponse(self._b3_listing)
+
+        if path.endswith('/simple/price'):
+            self.calls['coingecko.simple_price'] += 1
+            ids = params.get('ids', '').split(',')
+            return FakeResponse({crypto_id: {'usd': self._crypto_base_price * _scale(crypto_id)} for crypto_id in ids})
+
+        if path.endswith('/coins/list'):
+            self.calls['coingecko.coins_list'] += 1
+            return FakeResponse(self._coins_list)
+
+        if path.endswith('/market_chart'):
+            self.calls['coingecko.market_chart'] += 1
+            crypto_id = path.rstrip('/').split('/')[-2]
+            history = self._crypto_history
+            if params.get('days', 'max') != 'max':
+                history = history.iloc[-(int(params['days']) + 1):]
+            scale = _scale(crypto_id)
+            prices = [[int(ts.value // 10**6), value * scale] for ts, value in history.items()]
+            return FakeResponse({'prices': prices, 'market_caps': [], 'total_volumes': []})
+
+        self.calls['unknown'] += 1
+        return FakeResponse({'error': 'not found'}, status_code=404)
+
+    # --- Yahoo Finance ---
+    def _stock_window(self, period=None, start=None):
+        history = self._stock_history
+        if start is not None:
+            return history[history.index >= pd.Timestamp(start).tz_localize(history.index.tz)]
+        if period and period != "max":
+            days = int(period.rstrip('d'))
+            return history[history.index >= history.index[-1] - pd.Timedelta(days=days)]
+        return history
+
+    def _yfinance_module(self):
+        replay = self
+        module = types.ModuleType('yfinance')
+
+        def download(tickers, period="5d", **kwargs):
+            replay._wait()
+            replay.calls['yahoo.download'] += 1
+            tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+            window = replay._stock_window(period=period)
+            columns = pd.MultiIndex.from_product([['Close'], tickers], names=['Price', 'Ticker'])
+            data = {('Close', ticker): window['Close'] * _scale(ticker) for ticker in tickers}
+            return pd.DataFrame(data, index=window.index, columns=columns)
+
+        class Ticker:
+            def __init__(self, ticker):
+                self.ticker = ticker
+
+            def history(self, period=None, start=None, interval="1d", **kwargs):
+                replay._wait()
+                replay.calls['yahoo.history'] += 1
+                window = replay._stock_window(period=period, start=start).copy()
+                for column in ('Open', 'High', 'Low', 'Close'):
+                    window[column] = window[column] * _scale(self.ticker)
+                return window
+
+        module.download = download
+        module.Ticker = Ticker
+        return module
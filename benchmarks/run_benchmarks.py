@@ -0,0 +1,295 @@
+"""Benchmarks offline dos caminhos críticos, com comparação contra baseline.
+
+    python -m benchmarks.run_benchmarks                  # roda e compara com baseline.json
+    python -m benchmarks.run_benchmarks --save-baseline  # grava os resultados como baseline
+    python -m benchmarks.run_benchmarks --sizes 10 1000 --render-sizes
+
+Os provedores são substituídos por `ProviderReplay`, de modo que os tempos
+medem apenas o código do app. Para cada caminho e tamanho de carteira são
+registrados tempo de parede, chamadas aos provedores e pico de memória
+(tracemalloc). Como o tracemalloc fica ativo durante a medição, os tempos
+são mais altos que em produção, mas comparáveis entre execuções. O render
+da visão geral inclui a curva de valor do portfólio e, por ser lento em
+carteiras grandes, roda por padrão só até 1.000 ativos (`--render-sizes`).
+Caminhos acusados são medidos de novo em processos limpos (`--retries`),
+valendo o melhor tempo, para que ruído da máquina não reprove a execução;
+a baseline grava a mediana dessas rodadas.
+Termina com código 1 se houver regressão.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from ticker_tracker.cache import get_price_cache
+from ticker_tracker.config import CHART_PERIODS
+from ticker_tracker.board import QuoteBoard, set_quote_board
+from ticker_tracker.executor import FetchExecutor, set_fetch_executor
+from ticker_tracker.history import HistoryStore, set_history_store
+from ticker_tracker.portfolio import calculate_category_totals, organize_assets_by_category
+from ticker_tracker.pricing import get_portfolio_prices
+from ticker_tracker.tracker import AssetTracker
+
+from .replay import ProviderReplay
+
+BENCHMARKS_DIR = Path(__file__).parent
+BASELINE_FILE = BENCHMARKS_DIR / "baseline.json"
+MAIN_SCRIPT = BENCHMARKS_DIR.parent / "main.py"
+
+SIZES = (10, 1000, 10000)
+RENDER_SIZES = (10, 1000)
+
+# Sem limites de taxa: o replay não tem cota e os tempos devem medir o app
+UNLIMITED = {"max_concurrency": 64, "rate_per_minute": 10**9, "burst": 10**9}
+
+# Variação tolerada antes de acusar regressão
+DEFAULT_TOLERANCE = 0.25
+# Diferenças de tempo abaixo disto (segundos) são tratadas como ruído; sob o
+# tracemalloc, caminhos quentes de dezenas de ms variam ~10 ms entre execuções
+TIME_NOISE_FLOOR = 0.02
+# Rodadas extras, em processos novos, para confirmar uma regressão
+DEFAULT_RETRIES = 2
+
+CATEGORIES = ["ENERGIA", "BANCOS", "MINERIO", "SAUDE", "SANEAMENTO", "VAREJO", "TECNOLOGIA", "BIOTECH"]
+
+def synthetic_portfolio(size, seed=0):
+    """Carteira determinística com ~80% de ações da B3 e ~20% de criptomoedas."""
+    rng = random.Random(seed)
+    stocks, cryptos = [], []
+    for i in range(size):
+        if i % 5 == 4:
+            cryptos.append({"id": f"synthcoin-{i}", "display_name": f"Synth Coin {i}", "symbol": f"SC{i}",
+                            "purchase_date": "2024-01-01", "quantity": round(rng.uniform(0.01, 5), 4),
+                            "purchase_price": round(rng.uniform(1, 50000), 2)})
+        else:
+            stocks.append({"ticker": f"SYN{i:05d}.SA", "display_name": f"{rng.choice(CATEGORIES)} - Empresa {i}",
+                           "purchase_date": "2023-06-01", "quantity": float(rng.randint(1, 500)),
+                           "purchase_price": round(rng.uniform(2, 120), 2)})
+    return {"stocks": stocks, "cryptos": cryptos}
+
+def _trackers(assets):
+    trackers = [AssetTracker("yahoo_stock", s['ticker'], s['display_name']) for s in assets['stocks']]
+    trackers += [AssetTracker("coingecko", c['id'], c['display_name']) for c in assets['cryptos']]
+    return trackers
+
+def measure(name, size, fn, replay):
+    """Executa `fn` e registra tempo, chamadas aos provedores e pico de memória."""
+    replay.calls.clear()
+    # Lixo das medições anteriores não é coletado no meio desta
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'name': name,
+        'size': size,
+        'wall_s': wall,
+        'calls': sum(replay.calls.values()),
+        'calls_by_endpoint': dict(replay.calls),
+        'peak_mb': peak / 2**20,
+    }
+
+def bench_current_price(assets, size, replay, workdir):
+    trackers = _trackers(assets)
+
+    def run():
+        for tracker in trackers:
+            tracker.get_current_price()
+
+    # Quadro compartilhado vazio: a rodada fria vai de fato aos provedores
+    set_quote_board(QuoteBoard(os.path.join(workdir, f"board_{size}_prices.db")))
+    get_price_cache().clear()
+    yield measure("get_current_price[cold]", size, run, replay)
+    yield measure("get_current_price[warm]", size, run, replay)
+
+def bench_historical_data(assets, size, replay, workdir, sample):
+    trackers = _trackers(assets)[:sample]
+    for index, (period_name, days_or_period) in enumerate(CHART_PERIODS.items()):
+        # Armazenamento vazio por período: a primeira rodada mede a carga inicial
+        set_history_store(HistoryStore(os.path.join(workdir, f"history_{size}_{index}.db")))
+
+        def run(days_or_period=days_or_period):
+            for tracker in trackers:
+                tracker.get_historical_data(days_or_period)
+
+        yield measure(f"get_historical_data[{period_name}][cold]", size, run, replay)
+        yield measure(f"get_historical_data[{period_name}][warm]", size, run, replay)
+
+def bench_category_totals(assets, size, replay, workdir):
+    categories = organize_assets_by_category(assets)
+
+    def run_cold():
+        for category_assets in categories.values():
+            calculate_category_totals(category_assets)
+
+    set_quote_board(QuoteBoard(os.path.join(workdir, f"board_{size}_totals.db")))
+    get_price_cache().clear()
+    yield measure("calculate_category_totals[cold]", size, run_cold, replay)
+
+    prices = get_portfolio_prices(assets)
+
+    def run_warm():
+        for category_assets in categories.values():
+            calculate_category_totals(category_assets, prices)
+
+    yield measure("calculate_category_totals[warm]", size, run_warm, replay)
+
+def bench_overview_render(assets, size, replay, workdir):
+    from streamlit.testing.v1 import AppTest
+
+    from ticker_tracker.holdings import get_holdings_store
+    from ticker_tracker.refresher import get_quote_refresher
+    from ticker_tracker.symbols import SymbolCatalog, set_symbol_catalog
+
+    # O app lê a carteira do banco de posições do diretório atual; o snapshot é publicado antes do render
+    get_holdings_store().replace_all(assets)
+    get_quote_refresher().refresh()
+    # Índice de símbolos já carregado (cache do processo): a carga em segundo plano não cai dentro da medição
+    catalog = SymbolCatalog()
+    catalog.load()
+    if catalog.is_stale:
+        catalog.refresh()
+    set_symbol_catalog(catalog)
+
+    def run():
+        app = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=600)
+        app.session_state['page_navigation'] = "📊 Visão Geral do Portfólio"
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    yield measure("show_portfolio_overview[render]", size, run, replay)
+
+def compare(results, baseline, tolerance):
+    """Marca cada resultado com o delta para a baseline e retorna as regressões."""
+    regressions = []
+    for result in results:
+        reference = baseline.get(f"{result['name']}@{result['size']}")
+        result['status'] = "new"
+        if reference is None:
+            continue
+        result['baseline_wall_s'] = reference['wall_s']
+        problems = []
+        if (result['wall_s'] > reference['wall_s'] * (1 + tolerance)
+                and result['wall_s'] - reference['wall_s'] > TIME_NOISE_FLOOR):
+            problems.append("tempo")
+        if result['calls'] > reference['calls']:
+            problems.append("chamadas")
+        if result['peak_mb'] > reference['peak_mb'] * (1 + tolerance) and result['peak_mb'] - reference['peak_mb'] > 1:
+            problems.append("memória")
+        result['status'] = "REGRESSÃO (" + ", ".join(problems) + ")" if problems else "ok"
+        if problems:
+            regressions.append(result)
+    return regressions
+
+def remeasure(results, args):
+    """Mede de novo os tamanhos dos resultados em um processo limpo: {(nome, tamanho): resultado}.
+
+    Caches e bancos do processo já estão quentes depois da primeira rodada;
+    um subprocesso repete as condições da medição original.
+    """
+    sizes = sorted({r['size'] for r in results})
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "retry.json"
+        command = [sys.executable, "-m", "benchmarks.run_benchmarks", "--sizes", *map(str, sizes),
+                   "--render-sizes", *[str(s) for s in sizes if s in args.render_sizes],
+                   "--history-assets", str(args.history_assets), "--latency-ms", str(args.latency_ms),
+                   "--baseline", str(Path(tmp) / "none.json"), "--retries", "0", "--output", str(output)]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=BENCHMARKS_DIR.parent)
+        return {(r['name'], r['size']): r for r in json.loads(output.read_text(encoding='utf-8'))}
+
+def print_report(results):
+    header = f"{'caminho':<48} {'ativos':>6} {'tempo (s)':>10} {'baseline':>10} {'chamadas':>9} {'pico (MB)':>10}  status"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        baseline = f"{r['baseline_wall_s']:.4f}" if 'baseline_wall_s' in r else "-"
+        print(f"{r['name']:<48} {r['size']:>6} {r['wall_s']:>10.4f} {baseline:>10} {r['calls']:>9} {r['peak_mb']:>10.1f}  {r['status']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Tamanhos de carteira.")
+    parser.add_argument("--history-assets", type=int, default=25,
+                        help="Ativos por carteira usados no benchmark de histórico.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência simulada por chamada ao provedor.")
+    parser.add_argument("--render-sizes", type=int, nargs="*", default=list(RENDER_SIZES),
+                        help="Tamanhos em que o render da visão geral é medido (vazio para pular).")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Tolerância relativa.")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Rodadas extras, em processos novos, para confirmar regressões e "
+                             "para a mediana da baseline (0 para desligar).")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Arquivo de baseline.")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como nova baseline.")
+    parser.add_argument("--output", type=Path, help="Grava os resultados completos em JSON.")
+    args = parser.parse_args(argv)
+
+    set_fetch_executor(FetchExecutor(limits={"coingecko": UNLIMITED, "yahoo_stock": UNLIMITED}))
+    results = []
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, ProviderReplay(latency=args.latency_ms / 1000) as replay:
+        os.chdir(workdir)
+        try:
+            for size in args.sizes:
+                assets = synthetic_portfolio(size)
+                results += bench_current_price(assets, size, replay, workdir)
+                results += bench_historical_data(assets, size, replay, workdir, args.history_assets)
+                results += bench_category_totals(assets, size, replay, workdir)
+                if size in args.render_sizes:
+                    results += bench_overview_render(assets, size, replay, workdir)
+        finally:
+            os.chdir(original_cwd)
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))['results']
+    if args.save_baseline:
+        # Mediana das rodadas: uma medição isolada rápida demais deixaria a baseline apertada
+        samples = {(r['name'], r['size']): [r['wall_s']] for r in results}
+        for _ in range(args.retries):
+            for key, again in remeasure(results, args).items():
+                samples.setdefault(key, []).append(again['wall_s'])
+        for result in results:
+            result['wall_s'] = statistics.median(samples[(result['name'], result['size'])])
+
+    regressions = compare(results, baseline, args.tolerance)
+    for _ in range(args.retries if not args.save_baseline else 0):
+        if not regressions:
+            break
+        retry = remeasure(regressions, args)
+        for result in regressions:
+            again = retry.get((result['name'], result['size']))
+            if again is not None:
+                result['wall_s'] = min(result['wall_s'], again['wall_s'])
+        regressions = compare(results, baseline, args.tolerance)
+    print_report(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+    if args.save_baseline:
+        payload = {
+            'python': sys.version.split()[0],
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': {f"{r['name']}@{r['size']}": {k: r[k] for k in ('wall_s', 'calls', 'peak_mb')} for r in results},
+        }
+        args.baseline.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) em relação à baseline.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,234 +1,167 @@
 import streamlit as st
-import yfinance as yf
-import requests
+import functools
 import json
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 import pandas as pd
 import plotly.express as px
 
-# --- Configurações Iniciais ---
-# Períodos disponíveis para gráfico
-CHART_PERIODS = {
-    "30 dias": 30,
-    "60 dias": 60,
-    "90 dias": 90,
-    "6 meses": 180,
-    "1 ano": 365,
-    "2 anos": 730,
-    "3 anos": 1095,
-    "5 anos": 1825,
-    "Máximo": "max"
-}
-
-# Arquivo para salvar configurações
-CONFIG_FILE = "assets_config.json"
+from ticker_tracker.alerts import ABOVE, ALERT_KINDS, BELOW, get_alert_engine
+from ticker_tracker.cache import get_price_cache
+from ticker_tracker.charts import figure_nbytes, line_figure, series_signature
+from ticker_tracker.config import CHART_PERIODS, DEFAULT_REPORTING_CURRENCY, REPORTING_CURRENCIES
+from ticker_tracker.executor import get_fetch_executor
+from ticker_tracker.fx import format_money, get_fx_rates, native_currency
+from ticker_tracker.holdings import ASSET_TYPES, DuplicateAssetError, get_holdings_store
+from ticker_tracker.indicators import INDICATORS, OSCILLATORS, get_indicator_cache
+from ticker_tracker.intraday import INTRADAY_INTERVALS
+from ticker_tracker.marketdata import get_market_data_cache
+from ticker_tracker.metrics import get_metrics, start_metrics_server
+from ticker_tracker.portfolio import build_holdings_frame, compute_holdings_analytics
+from ticker_tracker.pricing import QUOTE_MAX_WAIT_SECONDS
+from ticker_tracker.refresher import get_quote_refresher
+from ticker_tracker.risk import RISK_BENCHMARKS, VAR_CONFIDENCES, get_risk_model, risk_report
+from ticker_tracker.symbols import SymbolEntry, get_symbol_catalog
+from ticker_tracker.timeseries import get_portfolio_history
+from ticker_tracker.tracker import AssetTracker, fetch_price_and_history
+
+# Opção de resolução do gráfico para o histórico diário (as demais são intradiárias)
+DAILY_RESOLUTION = "Diária"
+
+# Nível do histórico lido para o gráfico -> unidade das barras
+HISTORY_LEVEL_LABELS = {"daily": "diárias", "weekly": "semanais", "monthly": "mensais"}
+
+# Intervalos oferecidos para a atualização automática das cotações (segundos)
+AUTO_REFRESH_INTERVALS = (15, 30, 60, 120, 300)
+DEFAULT_AUTO_REFRESH_SECONDS = 60
+
+# Sugestões do índice local de símbolos exibidas na busca e no cadastro
+SYMBOL_SUGGESTIONS = 8
+
+# Regras de alerta listadas na barra lateral e avisos exibidos de uma vez
+ALERT_LIST_LIMIT = 50
+ALERT_BANNER_ITEMS = 5
+
+# Porta para expor /metrics por HTTP (desativado se a variável não existir)
+METRICS_PORT_ENV = "TICKER_TRACKER_METRICS_PORT"
+
+rerun_started = time.perf_counter()
+if os.environ.get(METRICS_PORT_ENV):
+    start_metrics_server(int(os.environ[METRICS_PORT_ENV]))
 
 # --- Funções de Carregamento/Salvamento de Ativos ---
-def load_user_assets():
-    """Carrega ativos do arquivo de configuração."""
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            pass
-    
-    # Retorna configuração padrão se arquivo não existir ou houver erro
-    return {
-        "stocks": [
-            {"ticker": "PETR4.SA", "display_name": "Petrobras", "purchase_date": "2023-01-15", "quantity": 100, "purchase_price": 25.00},
-            {"ticker": "ITSA4.SA", "display_name": "Itausa", "purchase_date": "2024-03-01", "quantity": 200, "purchase_price": 9.50},
-        ],
-        "cryptos": [
-            {"id": "bitcoin", "display_name": "Bitcoin", "symbol": "BTC", "purchase_date": "2022-06-20", "quantity": 0.05, "purchase_price": 20000.00},
-            {"id": "ethereum", "display_name": "Ethereum", "symbol": "ETH", "purchase_date": "2023-11-10", "quantity": 0.5, "purchase_price": 2000.00},
-        ]
-    }
-
-def save_user_assets(assets):
-    """Salva ativos no arquivo de configuração."""
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(assets, f, indent=2, ensure_ascii=False)
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar configurações: {e}")
-        return False
-
-# Inicializa USER_ASSETS na sessão do Streamlit
-if 'user_assets' not in st.session_state:
-    st.session_state.user_assets = load_user_assets()
-
-# Cache para preços (evita múltiplas chamadas da API)
-if 'price_cache' not in st.session_state:
-    st.session_state.price_cache = {}
-
-# Timestamp do cache (para invalidar cache antigo)
-if 'cache_timestamp' not in st.session_state:
-    st.session_state.cache_timestamp = datetime.now()
-
-def is_cache_valid():
-    """Verifica se o cache ainda é válido (5 minutos)."""
-    return (datetime.now() - st.session_state.cache_timestamp).seconds < 300
-
-def get_cached_price(cache_key):
-    """Obtém preço do cache se válido."""
-    if is_cache_valid() and cache_key in st.session_state.price_cache:
-        return st.session_state.price_cache[cache_key]
-    return None
-
-def set_cached_price(cache_key, price):
-    """Armazena preço no cache."""
-    st.session_state.price_cache[cache_key] = price
-    st.session_state.cache_timestamp = datetime.now()
-
-# --- Classe AssetTracker (adaptada para Streamlit) ---
-class AssetTracker:
-    def __init__(self, api_choice, identifier, display_symbol, purchase_date=None, quantity=None, purchase_price=None):
-        self.api_choice = api_choice
-        self.display_symbol = display_symbol
-        self.purchase_date = purchase_date
-        self.quantity = quantity
-        self.purchase_price = purchase_price
-        
-        self._setup_api_config(identifier)
-
-    def _setup_api_config(self, identifier):
-        if self.api_choice == "coingecko":
-            self.crypto_id = identifier
-            self.base_url = "https://api.coingecko.com/api/v3"
-            self.stock_ticker = None
-        elif self.api_choice == "yahoo_stock":
-            self.stock_ticker = identifier
-            self.crypto_id = None
-        else:
-            raise ValueError("API inválida. Use 'coingecko' ou 'yahoo_stock'.")
-
-    def get_current_price(self):
-        """Obtém o preço atual do ativo."""
-        # Criar chave única para cache
-        cache_key = f"{self.api_choice}_{self.stock_ticker or self.crypto_id}"
-        
-        # Verificar cache primeiro
-        cached_price = get_cached_price(cache_key)
-        if cached_price is not None:
-            return cached_price
-        
-        # Obter novo preço
-        if self.api_choice == "coingecko":
-            price = self._get_crypto_price()
-        else:
-            price = self._get_stock_price()
-        
-        # Armazenar no cache
-        if price is not None:
-            set_cached_price(cache_key, price)
-        
-        return price
-
-    def _get_crypto_price(self):
-        url = f"{self.base_url}/simple/price?ids={self.crypto_id}&vs_currencies=usd"
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return float(data[self.crypto_id]['usd'])
-        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
-            st.error(f"Erro ao obter preço de {self.display_symbol}: {e}")
-            return None
-
-    def _get_stock_price(self):
-        try:
-            ticker = yf.Ticker(self.stock_ticker)
-            price = ticker.fast_info.last_price
-            return float(price) if price else None
-        except Exception as e:
-            st.error(f"Erro ao obter preço de {self.stock_ticker}: {e}")
-            return None
-
-    def get_historical_data(self, days_or_period):
-        """Obtém dados históricos do ativo."""
-        if self.api_choice == "coingecko":
-            return self._get_crypto_history(days_or_period)
-        return self._get_stock_history(days_or_period)
-
-    def _get_crypto_history(self, days_or_period):
-        url = f"{self.base_url}/coins/{self.crypto_id}/market_chart"
-        
-        if days_or_period == "max":
-            params = {'vs_currency': 'usd', 'days': 'max', 'interval': 'daily'}
-        elif days_or_period > 90:
-            params = {'vs_currency': 'usd', 'days': days_or_period, 'interval': 'daily'}
-        else:
-            params = {'vs_currency': 'usd', 'days': days_or_period, 'interval': 'daily'}
-        
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            # Retorna um DataFrame para compatibilidade com Plotly
-            df = pd.DataFrame(data.get('prices', []), columns=['timestamp', 'price'])
-            df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df = df.set_index('date')['price']
-            return df
-        except (requests.exceptions.RequestException, KeyError) as e:
-            st.error(f"Erro ao obter histórico de {self.display_symbol}: {e}")
-            return pd.Series()
-
-    def _get_stock_history(self, days_or_period):
-        try:
-            ticker = yf.Ticker(self.stock_ticker)
-            if days_or_period == "max":
-                hist = ticker.history(period="max", interval="1d")
-            else:
-                hist = ticker.history(period=f"{days_or_period}d", interval="1d")
-            return hist['Close'] if not hist.empty else pd.Series()
-        except Exception as e:
-            st.error(f"Erro ao obter histórico de {self.stock_ticker}: {e}")
-            return pd.Series()
-
-    def format_price(self, price):
-        """Formata o preço para exibição."""
-        if price is None:
-            return "N/A"
-        if price < 1:
-            return f"${price:.6f}"
-        elif price < 100:
-            return f"${price:.2f}"
-        else:
-            return f"${price:,.2f}"
-
-    def _calculate_portfolio_metrics(self, current_price):
-        """Calcula métricas do portfólio se houver dados de compra."""
-        if not all([self.purchase_date, self.purchase_price, self.quantity]):
-            return None
-            
-        variation = ((current_price - self.purchase_price) / self.purchase_price) * 100
-        current_value = current_price * self.quantity
-        purchase_total = self.purchase_price * self.quantity
-        
-        return {
-            'variation': variation,
-            'current_value': current_value,
-            'purchase_total': purchase_total,
-            'status': "📈" if variation > 0 else "📉"
-        }
-
-    def get_chart_link(self):
-        """Retorna o link para o gráfico completo."""
-        if self.api_choice == "yahoo_stock" and self.stock_ticker:
-            return f"https://finance.yahoo.com/quote/{self.stock_ticker}/chart?p={self.stock_ticker}"
-        elif self.api_choice == "coingecko" and self.crypto_id:
-            return f"https://www.coingecko.com/en/coins/{self.crypto_id}"
-        return ""
+def sync_user_assets():
+    """Recarrega a carteira da sessão quando outra gravação mudou a versão do banco."""
+    store = get_holdings_store()
+    version = store.version()
+    if st.session_state.get('user_assets_version') != version:
+        st.session_state.user_assets = store.load_assets()
+        st.session_state.user_assets_version = version
+        # Ativos da carteira já foram validados: entram no índice de símbolos
+        get_symbol_catalog().learn([
+            SymbolEntry(api_choice, asset[id_field], asset.get('symbol') or asset[id_field].split('.')[0],
+                        asset.get('display_name', ''))
+            for json_key, id_field, api_choice in ASSET_TYPES.values()
+            for asset in st.session_state.user_assets.get(json_key, [])
+        ])
+
+# Carteira da sessão (lida do banco de posições; recarregada só quando muda)
+sync_user_assets()
+
+def symbol_label(entry):
+    return f"{entry.symbol} — {entry.name} ({entry.identifier})"
+
+def pick_symbol(query, api_choice, key):
+    """Sugestões do índice local para o texto digitado; devolve a entrada escolhida (ou None)."""
+    catalog = get_symbol_catalog()
+    match = catalog.lookup(api_choice, query.strip()) if query.strip() else None
+    if match is not None or not query.strip():
+        return match
+    options = {symbol_label(entry): entry for entry in catalog.search(query, SYMBOL_SUGGESTIONS, api_choice)}
+    if not options:
+        return None
+    selected = st.selectbox("Sugestões:", list(options), index=None, placeholder="Escolha um ativo...", key=key)
+    return options.get(selected)
+
+# --- Renderização de Gráficos ---
+def build_line_figure(data, title, labels, signature):
+    """Gráfico de linha reduzido no servidor e reutilizado entre reruns e sessões.
+
+    `signature` identifica o conteúdo (ativo, período e última barra). As
+    figuras ficam no cache de dados de mercado do processo, e não na sessão:
+    sessões que abrem o mesmo gráfico recebem a mesma figura (o Streamlit
+    não a altera ao exibir), dentro do orçamento de memória do servidor.
+    """
+    cache = get_market_data_cache()
+    key = ("figure", signature, title, tuple(sorted(labels.items())))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached[1]
+
+    fig = line_figure(data, title, labels)
+    cache.put(key, fig, nbytes=figure_nbytes(fig))
+    return fig
+
+# --- Fragmentos ---
+def fragment(name, run_every=None):
+    """`st.fragment` que também registra a duração de cada execução.
+
+    Interações com widgets de um fragmento reexecutam apenas ele, não o
+    script inteiro; com `run_every` o fragmento se reexecuta sozinho.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with get_metrics().time("fragment_render_seconds", fragment=name):
+                return fn(*args, **kwargs)
+        return st.fragment(timed, run_every=run_every)
+    return decorator
+
+def auto_refresh_interval():
+    """Intervalo da atualização automática das cotações (None se desativada)."""
+    if not st.session_state.get('auto_refresh'):
+        return None
+    return st.session_state.get('auto_refresh_interval', DEFAULT_AUTO_REFRESH_SECONDS)
+
+def latest_quotes():
+    """Snapshot de cotações, pedindo uma nova rodada se estiver mais velho que o intervalo automático."""
+    refresher = get_quote_refresher()
+    snapshot = refresher.latest()
+    interval = auto_refresh_interval()
+    if interval and (snapshot is None or snapshot.age_seconds >= interval):
+        refresher.request_refresh()
+    return snapshot
+
+def format_age(seconds):
+    """Idade de uma cotação em texto curto (ex.: 45s, 12 min, 3 h, 2 dias)."""
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.0f} h"
+    return f"{seconds / 86400:.0f} dias"
+
+def stale_quote_caption(age):
+    """Aviso de cotação servida da última conhecida."""
+    st.caption(f"⚠️ Última cotação conhecida, de {format_age(age)} atrás (provedor indisponível ou lento)")
 
 # --- Funções para a Interface Streamlit ---
-def display_asset_info(current_tracker, current_price, historical_data, current_period):
-    """Exibe informações do ativo no Streamlit."""
-    if not current_tracker:
-        st.info("Selecione um ativo na barra lateral para visualizar informações.")
-        return
+def show_price_panel(current_tracker):
+    """Exibe preço atual e análise do investimento do ativo selecionado."""
+    snapshot = latest_quotes()
+    current_price = snapshot.get(current_tracker.cache_key) if snapshot is not None else None
+    quote_age = snapshot.quote_age(current_tracker.cache_key) if current_price is not None else None
+    stale = current_price is not None and current_tracker.cache_key in snapshot.stale
+    if current_price is None:
+        errors_before = len(current_tracker.errors)
+        with st.spinner("Carregando cotação..."):
+            current_price = current_tracker.get_current_price(max_wait=QUOTE_MAX_WAIT_SECONDS)
+        quote_age, stale = current_tracker.quote_age, current_tracker.quote_age is not None
+        for message in current_tracker.errors[errors_before:]:
+            # Com a última cotação conhecida em mãos, a falha é só um aviso
+            (st.warning if current_price is not None else st.error)(message)
 
     st.subheader(current_tracker.display_symbol)
     st.write("---")
@@ -237,9 +170,13 @@ def display_asset_info(current_tracker, current_price, historical_data, current_
 
     with col1:
         st.write(f"**💰 Preço atual:** {current_tracker.format_price(current_price)}")
+        if stale:
+            stale_quote_caption(quote_age)
+        elif quote_age is not None:
+            st.caption(f"🕒 Cotação de {quote_age:.0f}s atrás")
         if current_tracker.purchase_date and current_tracker.purchase_price:
             st.write(f"**Comprado em:** {current_tracker.purchase_date}")
-            st.write(f"**Preço de compra:** {current_tracker.format_price(current_tracker.purchase_price)}")
+            st.write(f"**Preço médio de compra:** {current_tracker.format_price(current_tracker.purchase_price)}")
             st.write(f"**Quantidade:** {current_tracker.quantity}")
 
     with col2:
@@ -256,41 +193,133 @@ def display_asset_info(current_tracker, current_price, historical_data, current_
                 profit_loss = metrics['current_value'] - metrics['purchase_total']
                 profit_emoji = "💚" if profit_loss > 0 else "❤️" if profit_loss < 0 else "💛"
                 st.markdown(f"**{profit_emoji} Lucro/Prejuízo:** {current_tracker.format_price(abs(profit_loss))} {'📈' if profit_loss > 0 else '📉' if profit_loss < 0 else '➡️'}")
+                currency = current_tracker.currency
+                st.write(f"**Não realizado (FIFO):** {format_money(metrics['unrealized_pnl_fifo'], currency)}")
+                if metrics['realized_pnl'] or metrics['realized_pnl_fifo']:
+                    st.write(f"**✅ Realizado:** {format_money(metrics['realized_pnl'], currency)} (custo médio) · "
+                             f"{format_money(metrics['realized_pnl_fifo'], currency)} (FIFO)")
     
     st.write("---")
 
-    if not historical_data.empty:
-        st.write(f"📈 Histórico disponível: {len(historical_data)} dias")
-        st.write(f"📅 Período: {current_period}")
-        
-        # Criar gráfico com Plotly
-        fig = px.line(historical_data, x=historical_data.index, y=historical_data.values,
-                      title=f'{current_tracker.display_symbol} - Últimos {len(historical_data)} dias',
-                      labels={'x': 'Data', 'y': 'Preço (USD)'})
-        fig.update_layout(hovermode="x unified")
-        st.plotly_chart(fig, use_container_width=True, key=f"main_chart_{current_tracker.display_symbol}")
+def show_history_chart(current_tracker):
+    """Seletor de resolução/período e gráfico histórico do ativo selecionado."""
+    # Só os intervalos que o provedor do ativo fornece (a CoinGecko não tem barras de 1 minuto)
+    resolutions = [DAILY_RESOLUTION] + [label for label, interval in INTRADAY_INTERVALS.items()
+                                        if interval in current_tracker.intraday_intervals]
+    if st.session_state.get("chart_resolution", DAILY_RESOLUTION) not in resolutions:
+        st.session_state.chart_resolution = DAILY_RESOLUTION
+    resolution = st.radio("Resolução:", resolutions, horizontal=True, key="chart_resolution")
+    if resolution != DAILY_RESOLUTION:
+        show_intraday_chart(current_tracker, resolution)
     else:
-        st.warning("Dados históricos não disponíveis para o período selecionado.")
+        show_daily_chart(current_tracker)
 
     chart_link = current_tracker.get_chart_link()
     if chart_link:
         st.markdown(f"[Ver Gráfico Completo]({chart_link})", unsafe_allow_html=True)
 
+def show_intraday_chart(current_tracker, resolution):
+    """Gráfico das barras intradiárias lidas diretamente do buffer do ativo."""
+    interval = INTRADAY_INTERVALS[resolution]
+    errors_before = len(current_tracker.errors)
+    with st.spinner("Carregando barras intradiárias..."):
+        bars = current_tracker.get_intraday_data(interval)
+    for message in current_tracker.errors[errors_before:]:
+        st.error(message)
+
+    if bars.empty:
+        st.warning("Dados intradiários não disponíveis para este ativo.")
+        return
+
+    st.write(f"📈 {len(bars)} barras de {resolution} (horários em UTC)")
+    if current_tracker.api_choice == "coingecko":
+        st.caption("A CoinGecko fornece preços a cada ~5 minutos; cada barra é o último preço do intervalo.")
+    fig = build_line_figure(bars,
+                            title=f'{current_tracker.display_symbol} - Barras de {resolution}',
+                            labels={'x': 'Horário (UTC)', 'y': f'Preço ({current_tracker.currency})'},
+                            signature=("intraday", current_tracker.cache_key, interval,
+                                       series_signature(bars)))
+    st.plotly_chart(fig, use_container_width=True, key=f"intraday_chart_{current_tracker.display_symbol}")
+
+def show_daily_chart(current_tracker):
+    """Gráfico do histórico diário no período escolhido."""
+    current_period = st.selectbox("Período do Gráfico:", list(CHART_PERIODS.keys()), key="chart_period_select")
+
+    indicators = st.multiselect("Indicadores:", list(INDICATORS), key="chart_indicators")
+
+    errors_before = len(current_tracker.errors)
+    with st.spinner("Carregando histórico..."):
+        # Períodos longos vêm em barras semanais ou mensais, já agregadas no armazenamento
+        historical_data, level = current_tracker.get_chart_history(CHART_PERIODS[current_period])
+    # A busca antecipada do histórico pode ter registrado o mesmo erro
+    for message in dict.fromkeys(current_tracker.errors[errors_before:]):
+        st.error(message)
+
+    if not historical_data.empty:
+        st.write(f"📈 Histórico disponível: {len(historical_data)} barras {HISTORY_LEVEL_LABELS[level]}")
+        st.write(f"📅 Período: {current_period}")
+
+        columns = [column for name in indicators for column in INDICATORS[name]]
+        overlays = [column for column in columns if column not in OSCILLATORS]
+        oscillators = [column for column in columns if column in OSCILLATORS]
+        chart_data = historical_data.rename("Preço")
+        indicator_data = None
+        if columns:
+            # Calculados sobre a série inteira do nível (sem bordas vazias no início do período)
+            indicator_data = get_indicator_cache().get(current_tracker.cache_key, level,
+                                                       historical_data.index[0]).reindex(historical_data.index)
+            if overlays:
+                chart_data = pd.concat([chart_data, indicator_data[overlays]], axis=1)
+
+        # Criar gráfico com Plotly (reduzido no servidor para períodos longos)
+        fig = build_line_figure(chart_data,
+                                title=f'{current_tracker.display_symbol} - {current_period} ({len(historical_data)} barras {HISTORY_LEVEL_LABELS[level]})',
+                                labels={'x': 'Data', 'y': f'Preço ({current_tracker.currency})'},
+                                signature=("main", current_tracker.cache_key, current_period, level, tuple(overlays),
+                                           series_signature(historical_data)))
+        st.plotly_chart(fig, use_container_width=True, key=f"main_chart_{current_tracker.display_symbol}")
+        if oscillators:
+            fig_oscillators = build_line_figure(indicator_data[oscillators], title="Osciladores",
+                                                labels={'x': 'Data', 'y': 'Valor'},
+                                                signature=("oscillators", current_tracker.cache_key, current_period,
+                                                           level, tuple(oscillators),
+                                                           series_signature(historical_data)))
+            st.plotly_chart(fig_oscillators, use_container_width=True,
+                            key=f"oscillator_chart_{current_tracker.display_symbol}")
+    else:
+        st.warning("Dados históricos não disponíveis para o período selecionado.")
+
+@fragment("add_asset_form")
 def add_asset_form():
     """Formulário para adicionar novo ativo."""
     with st.expander("Adicionar Novo Ativo"):
         asset_type = st.radio("Tipo de Ativo:", ("stock", "crypto"), key="add_asset_type")
+        api_choice = "yahoo_stock" if asset_type == "stock" else "coingecko"
 
-        display_name = st.text_input("Nome de Exibição:", key="add_display_name")
         identifier = st.text_input(f"{'Ticker da Ação' if asset_type == 'stock' else 'ID da Criptomoeda'}:", key="add_identifier")
-        
+        # Sugestões do índice local: a escolha preenche identificador, símbolo e nome
+        match = pick_symbol(identifier, api_choice, key="add_suggestion")
+        if match is not None:
+            identifier = match.identifier
+            st.caption(f"✔ {symbol_label(match)}")
+        elif identifier.strip() and asset_type == "stock":
+            st.caption("Ticker fora do índice local; será validado na primeira cotação.")
+        display_name = st.text_input("Nome de Exibição:", key="add_display_name",
+                                     placeholder=match.name if match else "")
+        display_name = display_name.strip() or (match.name if match else "")
+
         symbol = None
         if asset_type == "crypto":
-            symbol = st.text_input("Símbolo (ex: BTC, ETH):", key="add_symbol")
-        
+            symbol = st.text_input("Símbolo (ex: BTC, ETH):", key="add_symbol",
+                                   placeholder=match.symbol if match else "")
+            symbol = symbol.strip() or (match.symbol if match else "")
+
         purchase_date = st.date_input("Data de Compra:", datetime.now(), key="add_purchase_date").strftime("%Y-%m-%d")
         quantity = st.number_input("Quantidade:", min_value=0.0, format="%.6f", key="add_quantity")
-        purchase_price = st.number_input("Preço de Compra (USD):", min_value=0.0, format="%.2f", key="add_price")
+        # Preços de compra ficam na moeda em que o ativo é cotado (B3 em BRL, cripto em USD)
+        currency = native_currency(api_choice, identifier.strip())
+        purchase_price = st.number_input("Preço de Compra (moeda do ativo):", min_value=0.0, format="%.2f", key="add_price")
+        st.caption(f"Moeda: {currency}")
 
         if st.button("Adicionar Ativo"):
             # Validações aprimoradas
@@ -302,21 +331,20 @@ def add_asset_form():
                 errors.append(f"{'Ticker da Ação' if asset_type == 'stock' else 'ID da Criptomoeda'} é obrigatório.")
             if asset_type == "crypto" and not symbol.strip():
                 errors.append("Símbolo é obrigatório para criptomoedas.")
+            if (asset_type == "crypto" and identifier.strip() and match is None
+                    and get_symbol_catalog().has_listing("coingecko")):
+                errors.append(f"ID '{identifier.strip()}' não consta na lista da CoinGecko. Escolha uma das sugestões.")
             if quantity <= 0:
                 errors.append("Quantidade deve ser maior que zero.")
             if purchase_price <= 0:
                 errors.append("Preço de Compra deve ser maior que zero.")
             
             # Verificar duplicatas
+            store = get_holdings_store()
             identifier_check = identifier.upper() if asset_type == "stock" else identifier.lower()
-            if asset_type == "stock":
-                existing_tickers = [s['ticker'] for s in st.session_state.user_assets['stocks']]
-                if identifier_check in existing_tickers:
-                    errors.append(f"Ação {identifier_check} já existe no portfólio.")
-            else:
-                existing_ids = [c['id'] for c in st.session_state.user_assets['cryptos']]
-                if identifier_check in existing_ids:
-                    errors.append(f"Criptomoeda {identifier_check} já existe no portfólio.")
+            if store.exists(asset_type, identifier_check):
+                errors.append(f"{'Ação' if asset_type == 'stock' else 'Criptomoeda'} {identifier_check} já existe no portfólio. "
+                              "Use 'Registrar Operação' para novas compras ou vendas.")
             
             if errors:
                 for error in errors:
@@ -332,7 +360,6 @@ def add_asset_form():
                     "quantity": quantity,
                     "purchase_price": purchase_price
                 }
-                st.session_state.user_assets['stocks'].append(new_asset)
             else:
                 new_asset = {
                     "id": identifier.lower(),
@@ -342,119 +369,281 @@ def add_asset_form():
                     "quantity": quantity,
                     "purchase_price": purchase_price
                 }
-                st.session_state.user_assets['cryptos'].append(new_asset)
-            
-            if save_user_assets(st.session_state.user_assets):
-                st.success(f"Ativo '{display_name}' adicionado com sucesso!")
-                st.rerun() # Recarrega a página para atualizar as listas
 
+            try:
+                store.add(asset_type, new_asset)
+            except DuplicateAssetError as e:
+                st.error(str(e))
+                return
+            except Exception as e:
+                st.error(f"Erro ao salvar configurações: {e}")
+                return
+            st.success(f"Ativo '{display_name}' adicionado com sucesso!")
+            get_quote_refresher().request_refresh()
+            st.rerun() # Recarrega a página para atualizar as listas
+
+@fragment("trade_form")
+def trade_form():
+    """Formulário para registrar compras e vendas de um ativo da carteira."""
+    with st.expander("Registrar Operação"):
+        asset_type = st.radio("Tipo de Ativo:", ("stock", "crypto"), key="trade_asset_type")
+
+        # Rótulo exibido -> identificador do ativo
+        if asset_type == "stock":
+            options = {f"{s['display_name']} ({s['ticker']})": s['ticker'] for s in st.session_state.user_assets['stocks']}
+        else:
+            options = {f"{c['display_name']} ({c['symbol']})": c['id'] for c in st.session_state.user_assets['cryptos']}
+
+        if not options:
+            st.info(f"Nenhuma {asset_type} cadastrada.")
+            return
+
+        selected_asset_display = st.selectbox("Ativo:", list(options), key="trade_select")
+        side = st.radio("Operação:", ("Compra", "Venda"), horizontal=True, key="trade_side")
+        trade_date = st.date_input("Data:", datetime.now(), key="trade_date").strftime("%Y-%m-%d")
+        quantity = st.number_input("Quantidade:", min_value=0.0, format="%.6f", key="trade_quantity")
+        currency = native_currency("yahoo_stock" if asset_type == "stock" else "coingecko",
+                                   options[selected_asset_display])
+        price = st.number_input("Preço (moeda do ativo):", min_value=0.0, format="%.2f", key="trade_price")
+        st.caption(f"Moeda: {currency}")
+
+        if st.button("Registrar"):
+            if quantity <= 0 or price <= 0:
+                st.error("Quantidade e preço devem ser maiores que zero.")
+                return
+            try:
+                result = get_holdings_store().record_trade(
+                    asset_type, options[selected_asset_display], "buy" if side == "Compra" else "sell",
+                    quantity, price, trade_date)
+            except (KeyError, ValueError) as e:
+                st.error(str(e))
+                return
+            except Exception as e:
+                st.error(f"Erro ao salvar configurações: {e}")
+                return
+            message = f"{side} de '{selected_asset_display}' registrada."
+            if side == "Venda":
+                message += (f" Realizado: {format_money(result['realized_pnl'], currency)} (custo médio) / "
+                            f"{format_money(result['realized_pnl_fifo'], currency)} (FIFO).")
+            st.success(message)
+            st.rerun() # Recarrega a página para atualizar posição e métricas
+
+@fragment("remove_asset_form")
 def remove_asset_form():
     """Formulário para remover ativo."""
     with st.expander("Remover Ativo"):
         asset_type_to_remove = st.radio("Tipo de Ativo a Remover:", ("stock", "crypto"), key="remove_asset_type")
         
-        options = []
+        # Rótulo exibido -> identificador do ativo
         if asset_type_to_remove == "stock":
-            options = [f"{s['display_name']} ({s['ticker']})" for s in st.session_state.user_assets['stocks']]
+            options = {f"{s['display_name']} ({s['ticker']})": s['ticker'] for s in st.session_state.user_assets['stocks']}
         else:
-            options = [f"{c['display_name']} ({c['symbol']})" for c in st.session_state.user_assets['cryptos']]
+            options = {f"{c['display_name']} ({c['symbol']})": c['id'] for c in st.session_state.user_assets['cryptos']}
         
         if not options:
             st.info(f"Nenhuma {asset_type_to_remove} para remover.")
             return
 
-        selected_asset_display = st.selectbox(f"Selecione o(a) {asset_type_to_remove} para remover:", options, key="remove_select")
+        selected_asset_display = st.selectbox(f"Selecione o(a) {asset_type_to_remove} para remover:", list(options), key="remove_select")
 
         if st.button("Remover Ativo Selecionado"):
             if selected_asset_display:
-                if asset_type_to_remove == "stock":
-                    selected_ticker = selected_asset_display.split('(')[1][:-1]
-                    st.session_state.user_assets['stocks'] = [s for s in st.session_state.user_assets['stocks'] if s['ticker'] != selected_ticker]
-                else:
-                    selected_symbol = selected_asset_display.split('(')[1][:-1]
-                    st.session_state.user_assets['cryptos'] = [c for c in st.session_state.user_assets['cryptos'] if c['symbol'] != selected_symbol]
-                
-                if save_user_assets(st.session_state.user_assets):
-                    st.success(f"Ativo '{selected_asset_display}' removido com sucesso!")
-                    st.rerun() # Recarrega a página para atualizar as listas
+                try:
+                    get_holdings_store().remove(asset_type_to_remove, options[selected_asset_display])
+                except Exception as e:
+                    st.error(f"Erro ao salvar configurações: {e}")
+                    return
+                st.success(f"Ativo '{selected_asset_display}' removido com sucesso!")
+                st.rerun() # Recarrega a página para atualizar as listas
             else:
                 st.warning("Selecione um ativo para remover.")
 
-# --- Funções para Organização do Portfólio ---
-def extract_category_from_display_name(display_name):
-    """Extrai a categoria do display_name dos ativos."""
-    if ' - ' in display_name:
-        category = display_name.split(' - ')[0]
-        # Remove texto entre parênteses se houver
-        if '(' in category:
-            category = category.split('(')[0].strip()
-        return category
-    return "SEM CATEGORIA"
-
-def organize_assets_by_category(assets):
-    """Organiza ativos por categoria."""
-    categories = {}
-    
-    # Organizar ações por categoria
-    for stock in assets.get('stocks', []):
-        category = extract_category_from_display_name(stock['display_name'])
-        if category not in categories:
-            categories[category] = {'stocks': [], 'cryptos': []}
-        categories[category]['stocks'].append(stock)
-    
-    # Organizar criptomoedas (categoria CRYPTO)
-    if assets.get('cryptos'):
-        categories['CRYPTO'] = {'stocks': [], 'cryptos': assets['cryptos']}
-    
-    return categories
+def describe_alert_rule(rule, unarmed=frozenset()):
+    sign = "≥" if rule['direction'] == ABOVE else "≤"
+    unit = "" if rule['kind'] == "price" else "%"
+    if rule['fired_at']:
+        status = "🔔 disparado"
+    elif rule['id'] in unarmed:
+        # Sem preço de compra ou fechamento anterior: não dispara até haver referência
+        status = "⚠️ sem referência, não armado"
+    else:
+        status = "armado"
+    return f"#{rule['id']} {rule['display_name']}: {ALERT_KINDS[rule['kind']]} {sign} {rule['threshold']:g}{unit} ({status})"
+
+@fragment("alerts_form")
+def alerts_form():
+    """Criação e remoção de alertas de preço das posições."""
+    with st.expander("🔔 Alertas de Preço"):
+        # Rótulo exibido -> (tipo de ativo, identificador)
+        options = {f"{s['display_name']} ({s['ticker']})": ("stock", s['ticker']) for s in st.session_state.user_assets['stocks']}
+        options.update({f"{c['display_name']} ({c['symbol']})": ("crypto", c['id']) for c in st.session_state.user_assets['cryptos']})
+        if not options:
+            st.info("Nenhum ativo na carteira.")
+            return
 
-def calculate_category_totals(category_assets):
-    """Calcula totais investidos e valores atuais por categoria."""
-    total_invested = 0
-    total_current = 0
-    asset_count = 0
-    
-    # Calcular para ações
-    for stock in category_assets['stocks']:
-        try:
-            total_invested += stock['purchase_price'] * stock['quantity']
-            asset_count += 1
-            
-            # Obter preço atual
-            tracker = AssetTracker("yahoo_stock", stock['ticker'], stock['display_name'])
-            current_price = tracker.get_current_price()
-            if current_price:
-                total_current += current_price * stock['quantity']
-            else:
-                total_current += stock['purchase_price'] * stock['quantity']  # Fallback
-        except Exception as e:
-            st.warning(f"Erro ao processar ação {stock.get('display_name', 'N/A')}: {e}")
-            total_current += stock['purchase_price'] * stock['quantity']  # Fallback
-    
-    # Calcular para criptomoedas
-    for crypto in category_assets['cryptos']:
-        try:
-            total_invested += crypto['purchase_price'] * crypto['quantity']
-            asset_count += 1
-            
-            # Obter preço atual
-            tracker = AssetTracker("coingecko", crypto['id'], crypto['display_name'])
-            current_price = tracker.get_current_price()
-            if current_price:
-                total_current += current_price * crypto['quantity']
-            else:
-                total_current += crypto['purchase_price'] * crypto['quantity']  # Fallback
-        except Exception as e:
-            st.warning(f"Erro ao processar cripto {crypto.get('display_name', 'N/A')}: {e}")
-            total_current += crypto['purchase_price'] * crypto['quantity']  # Fallback
-    
-    return {
-        'total_invested': total_invested,
-        'total_current': total_current,
-        'asset_count': asset_count,
-        'profit_loss': total_current - total_invested,
-        'profit_loss_pct': ((total_current - total_invested) / total_invested * 100) if total_invested > 0 else 0
-    }
+        selected_asset_display = st.selectbox("Ativo:", list(options), key="alert_asset")
+        kinds = {label: kind for kind, label in ALERT_KINDS.items()}
+        kind = kinds[st.selectbox("Tipo de alerta:", list(kinds), key="alert_kind")]
+        direction = st.radio("Disparar quando ficar:", ("Acima", "Abaixo"), horizontal=True, key="alert_direction")
+        threshold = st.number_input("Preço (moeda do ativo):" if kind == "price" else "Variação (%):",
+                                    format="%.2f", key="alert_threshold")
+
+        if st.button("Criar Alerta"):
+            asset_type, identifier = options[selected_asset_display]
+            try:
+                get_alert_engine().add_rule(asset_type, identifier, kind,
+                                            ABOVE if direction == "Acima" else BELOW, threshold)
+            except (KeyError, ValueError) as e:
+                st.error(str(e))
+                return
+            # A regra é avaliada na próxima foto de cotações, em segundo plano
+            get_quote_refresher().request_refresh()
+            st.success("Alerta criado.")
+
+        rules = get_holdings_store().alert_rules(limit=ALERT_LIST_LIMIT)
+        if rules:
+            unarmed = get_alert_engine().unarmed_rules()
+            rule_options = {describe_alert_rule(rule, unarmed): rule['id'] for rule in rules}
+            selected_rule = st.selectbox("Alertas cadastrados:", list(rule_options), key="alert_rule_select")
+            if st.button("Remover Alerta"):
+                get_holdings_store().remove_alert_rule(rule_options[selected_rule])
+                st.rerun()
+
+def show_alert_banner():
+    """Avisos dos alertas disparados ainda não dispensados nesta sessão."""
+    banner = get_alert_engine().banner()
+    alerts = banner.recent(st.session_state.get('alerts_seen', 0)) if banner else []
+    if not alerts:
+        return
+    for alert in alerts[-ALERT_BANNER_ITEMS:]:
+        st.warning(f"🔔 {alert.message}")
+    if st.button("Dispensar alertas", key="dismiss_alerts"):
+        st.session_state.alerts_seen = alerts[-1].seq
+        st.rerun()
+
+@fragment("portfolio_file")
+def portfolio_file_form():
+    """Importação e exportação da carteira no formato JSON (`assets_config.json`)."""
+    with st.expander("Importar/Exportar Carteira"):
+        store = get_holdings_store()
+        # A serialização percorre a carteira inteira: só é feita quando pedida
+        if st.button("Gerar JSON da carteira"):
+            st.download_button("Baixar JSON", store.to_json(), file_name="assets_config.json",
+                               mime="application/json", on_click="ignore")
+
+        uploaded = st.file_uploader("Importar JSON (substitui a carteira):", type="json", key="import_portfolio")
+        if uploaded is not None and st.button("Importar carteira"):
+            try:
+                store.replace_all(json.loads(uploaded.getvalue().decode('utf-8')))
+            except (ValueError, KeyError, TypeError) as e:
+                st.error(f"Arquivo inválido: {e}")
+                return
+            get_quote_refresher().request_refresh()
+            st.success("Carteira importada com sucesso!")
+            st.rerun()
+
+@fragment("search_panel")
+def show_search_panel():
+    """Busca de um ativo não cadastrado (usa o período do gráfico principal)."""
+    search_period_key = st.session_state.get('chart_period_select', next(iter(CHART_PERIODS)))
+
+    col_search1, col_search2, col_search3 = st.columns([0.2, 0.4, 0.2])
+
+    # Adiciona um placeholder para os resultados da busca
+    search_results_placeholder = st.empty()
+
+    with col_search1:
+        search_asset_type = st.radio("Tipo:", ("crypto", "stock"), key="search_asset_type")
+
+    api_choice_search = "coingecko" if search_asset_type == "crypto" else "yahoo_stock"
+    with col_search2:
+        search_term = st.text_input(f"{'ID da Criptomoeda' if search_asset_type == 'crypto' else 'Ticker da Ação'}:", key="search_term_input")
+        # Só identificadores conhecidos pelo índice local vão à rede (evita ida e volta por erro de digitação)
+        search_match = pick_symbol(search_term, api_choice_search, key="search_suggestion")
+        force_search = False
+        if search_term and search_match is None:
+            if not get_symbol_catalog().has_listing(api_choice_search):
+                force_search = True  # listagem do provedor ainda não carregada: o índice não decide
+            elif search_asset_type == "stock":
+                # Tickers de outras bolsas (ex.: AAPL) não constam da listagem da B3
+                force_search = st.checkbox("Fora da listagem da B3: consultar o Yahoo mesmo assim", key="search_force")
+
+    with col_search3:
+        st.write("") # Espaço para alinhar o botão
+        st.write("") # Espaço para alinhar o botão
+        if st.button("Buscar Ativo"):
+            search_results_placeholder.empty() # Limpa resultados anteriores ao iniciar nova busca
+            with search_results_placeholder.container(): # Usa o container para exibir os novos resultados
+                if search_term and search_match is None and not force_search:
+                    st.warning(f"'{search_term}' não encontrado no índice de ativos. Escolha uma das sugestões.")
+                elif search_term:
+                    if search_match is not None:
+                        identifier_search = search_match.identifier
+                        display_name_search = search_match.symbol
+                    else:
+                        identifier_search = search_term.lower() if search_asset_type == "crypto" else search_term.upper()
+                        display_name_search = search_term.upper() # Usar o próprio termo de busca como display name
+                    
+                    try:
+                        # Criar um AssetTracker temporário para a busca
+                        searched_tracker = AssetTracker(
+                            api_choice=api_choice_search,
+                            identifier=identifier_search,
+                            display_symbol=display_name_search
+                        )
+                        
+                        search_loading_placeholder = st.empty()
+                        search_loading_placeholder.info(f"Buscando informações para {display_name_search}...")
+                        
+                        searched_price, searched_historical_data = fetch_price_and_history(
+                            searched_tracker, CHART_PERIODS[search_period_key]
+                        )
+
+                        search_loading_placeholder.empty() # Limpa a mensagem de "buscando"
+                        for message in searched_tracker.errors:
+                            st.error(message)
+
+                        if searched_price is not None or not searched_historical_data.empty:
+                            if search_match is None:
+                                get_symbol_catalog().learn([SymbolEntry(api_choice_search, identifier_search,
+                                                                        identifier_search.split('.')[0].upper(),
+                                                                        display_name_search)])
+                            st.subheader(f"Resultado da Busca: {display_name_search}")
+                            st.write(f"**💰 Preço atual:** {searched_tracker.format_price(searched_price)}")
+                            if searched_tracker.quote_age is not None:
+                                stale_quote_caption(searched_tracker.quote_age)
+                            
+                            if not searched_historical_data.empty:
+                                fig_search = build_line_figure(searched_historical_data,
+                                                               title=f'{display_name_search} - Histórico',
+                                                               labels={'x': 'Data', 'y': f'Preço ({searched_tracker.currency})'},
+                                                               signature=("search", searched_tracker.cache_key, search_period_key,
+                                                                          series_signature(searched_historical_data)))
+                                st.plotly_chart(fig_search, use_container_width=True, key=f"search_chart_{search_term}")
+                            else:
+                                st.warning("Não foi possível obter dados históricos para este ativo.")
+
+                            search_chart_link = searched_tracker.get_chart_link()
+                            if search_chart_link:
+                                st.markdown(f"[Ver Gráfico Completo]({search_chart_link})", unsafe_allow_html=True)
+
+                        else:
+                            st.warning(f"Não foi possível encontrar informações para '{search_term}'. Verifique o Ticker/ID.")
+                    
+                    except Exception as e:
+                        search_loading_placeholder.empty()
+                        st.error(f"Erro ao buscar ativo '{search_term}': {str(e)}")
+                else:
+                    st.warning("Por favor, digite um Ticker/ID para buscar.")
+
+# --- Funções para Organização do Portfólio ---
+def get_holdings_frame():
+    """Frame de posições da sessão, reconstruído apenas quando a carteira muda."""
+    version = st.session_state.get('user_assets_version')
+    cached = st.session_state.get('holdings_frame')
+    if cached is None or cached[0] != version:
+        st.session_state.holdings_frame = (version, build_holdings_frame(st.session_state.user_assets))
+    return st.session_state.holdings_frame[1]
 
 def show_portfolio_overview():
     """Mostra visão geral organizada do portfólio."""
@@ -465,38 +654,93 @@ def show_portfolio_overview():
         st.info("Nenhum ativo encontrado no portfólio. Adicione alguns ativos para ver a visão geral.")
         return
     
-    categories = organize_assets_by_category(st.session_state.user_assets)
+    frame = get_holdings_frame()
     
-    if not categories:
+    if frame.empty:
         st.info("Nenhum ativo encontrado no portfólio.")
         return
-    
-    # Calcular totais gerais
-    total_portfolio_invested = 0
-    total_portfolio_current = 0
-    total_assets = 0
-    
+
+    # Ações da B3 (BRL) e criptomoedas (USD) somadas em uma única moeda
+    reporting_currency = st.sidebar.selectbox("💱 Moeda de referência:", REPORTING_CURRENCIES,
+                                              index=REPORTING_CURRENCIES.index(DEFAULT_REPORTING_CURRENCY),
+                                              key="reporting_currency")
+
+    # Métricas e gráficos de distribuição se reexecutam sozinhos com a atualização automática;
+    # a evolução do portfólio só muda quando o período escolhido muda
+    fragment("portfolio_metrics", run_every=auto_refresh_interval())(show_portfolio_metrics)(frame, reporting_currency)
+    show_portfolio_history(frame, reporting_currency)
+    show_risk_panel(frame, reporting_currency)
+
+def show_portfolio_metrics(frame, reporting_currency):
+    """Métricas gerais, posições por categoria e gráficos de distribuição."""
     # Métricas gerais
     col1, col2, col3, col4 = st.columns(4)
     
-    category_data = {}
-    for category_name, category_assets in categories.items():
-        totals = calculate_category_totals(category_assets)
-        category_data[category_name] = totals
-        total_portfolio_invested += totals['total_invested']
-        total_portfolio_current += totals['total_current']
-        total_assets += totals['asset_count']
+    # Cotações publicadas em segundo plano (a página não espera pela rede)
+    refresher = get_quote_refresher()
+    snapshot = latest_quotes()
+    prices = snapshot.prices if snapshot else {}
+    stale = snapshot.stale if snapshot else {}
+    pending = frame.loc[~frame['price_key'].isin(list(prices)), 'price_key']
+
+    if snapshot is None:
+        st.info("⏳ Cotações sendo carregadas em segundo plano; valores atuais usam o preço de compra por enquanto.")
+    else:
+        st.caption(f"🕒 Cotações de {snapshot.taken_at:%H:%M:%S} ({snapshot.age_seconds:.0f}s atrás)")
+        for message in snapshot.errors:
+            st.warning(message)
+        stale_count = frame['price_key'].isin(list(stale)).sum()
+        if stale_count:
+            st.warning(f"⚠️ {stale_count} ativo(s) avaliados pela última cotação conhecida (marcados na lista abaixo).")
+    if not pending.empty:
+        # Ativos sem cotação já tentados nesta rodada não forçam outra a cada renderização
+        refresher.request_missing(pending)
+        if snapshot is not None:
+            st.caption(f"{len(pending)} ativo(s) aguardando cotação (usando preço de compra).")
+    if st.button("🔄 Atualizar Cotações", key="overview_refresh"):
+        refresher.request_refresh()
+        st.toast("Atualização de cotações solicitada.")
+
+    # Câmbio de todas as moedas da carteira em um lote (com cache) e conversão vetorizada
+    metrics = get_metrics()
+    fx_errors = []
+    with metrics.time("render_stage_seconds", stage="fx_rates"):
+        fx_rates = get_fx_rates(frame['currency'].cat.categories, reporting_currency, fx_errors,
+                                max_wait=QUOTE_MAX_WAIT_SECONDS)
+    for message in fx_errors:
+        st.warning(message)
+
+    # Métricas de todas as posições e categorias em uma única passada vetorizada
+    with metrics.time("render_stage_seconds", stage="analytics"):
+        holdings, category_data = compute_holdings_analytics(frame, prices, fx_rates, stale)
+    snapshot_age = snapshot.age_seconds if snapshot else 0.0
+
+    def quote_marker(row):
+        """Marca de cotação desatualizada ou ausente ao lado do nome do ativo."""
+        if not row.priced:
+            return " ⏳ _sem cotação_"
+        if pd.notna(row.quote_age):
+            return f" ⚠️ _cotação de {format_age(row.quote_age + snapshot_age)} atrás_"
+        return ""
+    total_portfolio_invested = holdings['invested'].sum()
+    total_portfolio_current = holdings['current_value'].sum()
+    total_assets = len(holdings)
     
     with col1:
-        st.metric("💰 Total Investido", f"${total_portfolio_invested:,.2f}")
+        st.metric("💰 Total Investido", format_money(total_portfolio_invested, reporting_currency))
     
     with col2:
-        st.metric("📈 Valor Atual", f"${total_portfolio_current:,.2f}")
+        st.metric("📈 Valor Atual", format_money(total_portfolio_current, reporting_currency))
     
     with col3:
         portfolio_pnl = total_portfolio_current - total_portfolio_invested
         portfolio_pnl_pct = (portfolio_pnl / total_portfolio_invested * 100) if total_portfolio_invested > 0 else 0
-        st.metric("💵 P&L Total", f"${portfolio_pnl:,.2f}", f"{portfolio_pnl_pct:+.2f}%")
+        st.metric("💵 P&L Total", format_money(portfolio_pnl, reporting_currency), f"{portfolio_pnl_pct:+.2f}%")
+        # Agregados mantidos pelo livro de operações (não reprocessa as operações)
+        realized_pnl = holdings['realized_pnl'].sum()
+        if realized_pnl or holdings['realized_pnl_fifo'].sum():
+            st.caption(f"✅ Realizado: {format_money(realized_pnl, reporting_currency)} (custo médio) · "
+                       f"{format_money(holdings['realized_pnl_fifo'].sum(), reporting_currency)} (FIFO)")
     
     with col4:
         st.metric("🏢 Total de Ativos", total_assets)
@@ -504,17 +748,19 @@ def show_portfolio_overview():
     st.markdown("---")
     
     # Exibir por categoria
-    for category_name, totals in category_data.items():
-        with st.expander(f"📂 {category_name} ({totals['asset_count']} ativos)", expanded=True):
+    listing_started = time.perf_counter()
+    holdings_by_category = dict(tuple(holdings.groupby('category', observed=True, sort=False)))
+    for category_name, totals in category_data.iterrows():
+        with st.expander(f"📂 {category_name} ({int(totals['asset_count'])} ativos)", expanded=True):
             
             # Métricas da categoria
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Investido", f"${totals['total_invested']:,.2f}")
+                st.metric("Investido", format_money(totals['total_invested'], reporting_currency))
             
             with col2:
-                st.metric("Valor Atual", f"${totals['total_current']:,.2f}")
+                st.metric("Valor Atual", format_money(totals['total_current'], reporting_currency))
             
             with col3:
                 pnl_color = "normal"
@@ -522,74 +768,72 @@ def show_portfolio_overview():
                     pnl_color = "inverse"
                 elif totals['profit_loss'] < 0:
                     pnl_color = "off"
-                st.metric("P&L", f"${totals['profit_loss']:,.2f}", 
+                st.metric("P&L", format_money(totals['profit_loss'], reporting_currency), 
                          f"{totals['profit_loss_pct']:+.2f}%")
+                if totals['realized_pnl']:
+                    st.caption(f"Realizado: {format_money(totals['realized_pnl'], reporting_currency)}")
             
             with col4:
-                weight = (totals['total_invested'] / total_portfolio_invested * 100) if total_portfolio_invested > 0 else 0
-                st.metric("Peso no Portfolio", f"{weight:.1f}%")
+                st.metric("Peso no Portfolio", f"{totals['weight']:.1f}%")
             
             # Lista de ativos da categoria
-            category_assets = categories[category_name]
+            category_holdings = holdings_by_category[category_name]
+            stock_rows = category_holdings[category_holdings['api_choice'] == "yahoo_stock"]
+            crypto_rows = category_holdings[category_holdings['api_choice'] == "coingecko"]
             
-            if category_assets['stocks']:
+            if not stock_rows.empty:
                 st.write("**📈 Ações:**")
-                for stock in category_assets['stocks']:
+                for stock in stock_rows.itertuples(index=False):
                     col_name, col_ticker, col_qty, col_price, col_total = st.columns([3, 1, 1, 1, 1])
                     
                     with col_name:
-                        clean_name = stock['display_name'].split(' - ')[1] if ' - ' in stock['display_name'] else stock['display_name']
-                        st.write(f"• {clean_name}")
+                        st.write(f"• {stock.short_name}{quote_marker(stock)}")
                     
                     with col_ticker:
-                        st.write(f"`{stock['ticker']}`")
+                        st.write(f"`{stock.identifier}`")
                     
                     with col_qty:
-                        st.write(f"{stock['quantity']}")
+                        st.write(f"{stock.quantity}")
                     
                     with col_price:
-                        st.write(f"${stock['purchase_price']:.2f}")
+                        st.write(format_money(stock.purchase_price, reporting_currency))
                     
                     with col_total:
-                        total_value = stock['purchase_price'] * stock['quantity']
-                        st.write(f"${total_value:,.2f}")
+                        st.write(format_money(stock.invested, reporting_currency))
             
-            if category_assets['cryptos']:
+            if not crypto_rows.empty:
                 st.write("**₿ Criptomoedas:**")
-                for crypto in category_assets['cryptos']:
+                for crypto in crypto_rows.itertuples(index=False):
                     col_name, col_symbol, col_qty, col_price, col_total = st.columns([3, 1, 1, 1, 1])
                     
                     with col_name:
-                        st.write(f"• {crypto['display_name']}")
+                        st.write(f"• {crypto.short_name}{quote_marker(crypto)}")
                     
                     with col_symbol:
-                        st.write(f"`{crypto['symbol']}`")
+                        st.write(f"`{crypto.symbol}`")
                     
                     with col_qty:
-                        st.write(f"{crypto['quantity']}")
+                        st.write(f"{crypto.quantity}")
                     
                     with col_price:
-                        st.write(f"${crypto['purchase_price']:,.2f}")
+                        st.write(format_money(crypto.purchase_price, reporting_currency))
                     
                     with col_total:
-                        total_value = crypto['purchase_price'] * crypto['quantity']
-                        st.write(f"${total_value:,.2f}")
+                        st.write(format_money(crypto.invested, reporting_currency))
+    metrics.observe("render_stage_seconds", time.perf_counter() - listing_started, stage="category_listing")
     
     # Gráfico de distribuição do portfólio
     st.markdown("---")
     st.subheader("📊 Distribuição do Portfólio por Categoria")
     
-    if category_data:
+    charts_started = time.perf_counter()
+    if not category_data.empty:
         # Preparar dados para o gráfico
-        chart_data = []
-        for category, totals in category_data.items():
-            chart_data.append({
-                'Categoria': category,
-                'Valor Investido': totals['total_invested'],
-                'Valor Atual': totals['total_current']
-            })
-        
-        df_chart = pd.DataFrame(chart_data)
+        df_chart = pd.DataFrame({
+            'Categoria': category_data.index.astype(str),
+            'Valor Investido': category_data['total_invested'].to_numpy(),
+            'Valor Atual': category_data['total_current'].to_numpy(),
+        })
         
         # Verificar se há dados suficientes para exibir gráficos
         if not df_chart.empty and df_chart['Valor Investido'].sum() > 0:
@@ -605,12 +849,195 @@ def show_portfolio_overview():
                             barmode='group')
             fig_bar.update_layout(
                 xaxis_title="Categoria",
-                yaxis_title="Valor (USD)",
+                yaxis_title=f"Valor ({reporting_currency})",
                 legend_title="Tipo de Valor"
             )
             st.plotly_chart(fig_bar, use_container_width=True, key="portfolio_bar_chart")
         else:
             st.info("Dados insuficientes para gerar gráficos de distribuição.")
+    metrics.observe("render_stage_seconds", time.perf_counter() - charts_started, stage="distribution_charts")
+
+@fragment("portfolio_history")
+def show_portfolio_history(frame, reporting_currency):
+    """Evolução do valor do portfólio no período escolhido."""
+    st.markdown("---")
+    st.subheader("📈 Evolução do Portfólio")
+    history_period_key = st.selectbox("Período:", list(CHART_PERIODS.keys()),
+                                      index=list(CHART_PERIODS.keys()).index("1 ano"),
+                                      key="portfolio_history_period")
+
+    history_errors = []
+    with st.spinner("Calculando evolução do portfólio..."):
+        portfolio_history = get_portfolio_history(frame, CHART_PERIODS[history_period_key], history_errors,
+                                                  reporting_currency)
+    for message in dict.fromkeys(history_errors):
+        st.warning(message)
+
+    if not portfolio_history.empty:
+        fig_history = build_line_figure(portfolio_history,
+                                        title=f'Valor do Portfólio - {history_period_key}',
+                                        labels={'x': 'Data', 'value': f'Valor ({reporting_currency})', 'variable': ''},
+                                        signature=("portfolio", history_period_key, reporting_currency,
+                                                   series_signature(portfolio_history)))
+        st.plotly_chart(fig_history, use_container_width=True, key="portfolio_history_chart")
+    else:
+        st.info("Dados históricos insuficientes para montar a evolução do portfólio.")
+
+@fragment("risk_panel")
+def show_risk_panel(frame, reporting_currency):
+    """Volatilidade, correlação, beta e VaR/CVaR da carteira."""
+    st.markdown("---")
+    st.subheader("⚠️ Risco")
+    benchmark_label = st.selectbox("Benchmark:", list(RISK_BENCHMARKS), key="risk_benchmark")
+
+    risk_errors = []
+    with st.spinner("Calculando indicadores de risco..."):
+        model = get_risk_model(frame, RISK_BENCHMARKS[benchmark_label], reporting_currency, risk_errors)
+    for message in dict.fromkeys(risk_errors):
+        st.warning(message)
+    if model is None or len(model.returns) < 2:
+        st.info("Dados históricos insuficientes para calcular o risco da carteira.")
+        return
+
+    report = risk_report(model, frame.set_index('price_key')['quantity'])
+    confidence = f"{VAR_CONFIDENCES[0]:.0%}"
+    var_row = report['var'].loc[confidence]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Volatilidade anual", f"{report['portfolio_volatility']:.1%}")
+    col2.metric(f"Beta ({benchmark_label})", f"{report['portfolio_beta']:.2f}")
+    col3.metric(f"VaR 1 dia ({confidence})", format_money(var_row['VaR histórico'], reporting_currency))
+    col4.metric(f"CVaR 1 dia ({confidence})", format_money(var_row['CVaR histórico'], reporting_currency))
+    st.caption(f"{report['observations']} dias úteis de retornos, valores em {reporting_currency}; "
+               f"beta contra o {benchmark_label} na moeda do próprio benchmark.")
+
+    st.write("**VaR e CVaR de 1 dia**")
+    st.dataframe(report['var'].map(lambda value: format_money(value, reporting_currency)))
+
+    names = frame.drop_duplicates('price_key').set_index('price_key')['display_name']
+    assets = report['assets'].rename(index=names)
+    st.write("**Por ativo**")
+    st.dataframe(pd.DataFrame({
+        'Peso': assets['weight'].map("{:.1%}".format),
+        'Volatilidade anual': assets['volatility'].map("{:.1%}".format),
+        'Beta': assets['beta'].round(2),
+    }))
+
+    correlation = report['correlation'].rename(index=names, columns=names)
+    fig_corr = px.imshow(correlation, zmin=-1, zmax=1, color_continuous_scale='RdBu',
+                         title="Correlação dos Retornos Diários")
+    st.plotly_chart(fig_corr, use_container_width=True, key="risk_correlation_chart")
+
+    rolling = report['rolling_volatility'].dropna().rename('Volatilidade')
+    if not rolling.empty:
+        fig_vol = build_line_figure(rolling.to_frame(),
+                                    title="Volatilidade Anualizada (21 dias úteis)",
+                                    labels={'x': 'Data', 'value': 'Volatilidade', 'variable': ''},
+                                    signature=("risk_volatility", benchmark_label, reporting_currency,
+                                               series_signature(rolling), round(report['value'], 2)))
+        st.plotly_chart(fig_vol, use_container_width=True, key="risk_volatility_chart")
+
+# --- Diagnóstico ---
+def _timing_row(histogram):
+    """Linha da tabela de tempos a partir de um histograma exportado."""
+    return {
+        'Chamadas': histogram['count'],
+        'p50 (ms)': round(histogram['p50'] * 1000, 1),
+        'p95 (ms)': round(histogram['p95'] * 1000, 1),
+        'Máx (ms)': round(histogram['max'] * 1000, 1),
+    }
+
+def show_diagnostics_panel(rerun_seconds):
+    """Painel com latência dos provedores, caches e tempos de execução."""
+    with st.sidebar.expander("🩺 Diagnóstico"):
+        metrics = get_metrics()
+        snapshot = metrics.snapshot()
+        st.caption(f"Este rerun: {rerun_seconds * 1000:.0f} ms")
+
+        failures = {}
+        for row in snapshot['counters']:
+            if row['name'] == 'provider_errors_total':
+                labels = row['labels']
+                failures[(labels['provider'], labels['endpoint'], labels['kind'])] = row['value']
+
+        provider_rows, timing_rows = [], []
+        for histogram in snapshot['histograms']:
+            labels = histogram['labels']
+            if histogram['name'] == 'provider_request_seconds':
+                provider_rows.append({
+                    'Provedor': labels['provider'],
+                    'Endpoint': labels['endpoint'],
+                    **_timing_row(histogram),
+                    'Erros': failures.get((labels['provider'], labels['endpoint'], 'error'), 0),
+                    'Timeouts': failures.get((labels['provider'], labels['endpoint'], 'timeout'), 0),
+                })
+            else:
+                timing_rows.append({
+                    'Métrica': histogram['name'],
+                    'Rótulos': ", ".join(f"{name}={value}" for name, value in labels.items()),
+                    **_timing_row(histogram),
+                })
+
+        st.write("**Provedores**")
+        if provider_rows:
+            st.dataframe(pd.DataFrame(provider_rows), hide_index=True)
+        else:
+            st.caption("Nenhuma chamada aos provedores ainda.")
+
+        st.write("**Disjuntores**")
+        breaker_rows = []
+        for provider, breaker in get_fetch_executor().breakers().items():
+            stats = breaker.stats()
+            breaker_rows.append({
+                'Provedor': provider,
+                'Estado': stats['state'],
+                'Falhas seguidas': stats['failures'],
+                'Novo teste em (s)': round(stats['retry_in']),
+            })
+        st.dataframe(pd.DataFrame(breaker_rows), hide_index=True)
+
+        st.write("**Caches**")
+        cache_stats = {}
+        for row in snapshot['counters'] + snapshot['gauges']:
+            if 'cache' in row['labels']:
+                cache_stats.setdefault(row['labels']['cache'], {})[row['name']] = row['value']
+        st.dataframe(pd.DataFrame([{
+            'Cache': name,
+            'Itens': stats['cache_size'],
+            'Acertos': stats['cache_hits_total'],
+            'Falhas': stats['cache_misses_total'],
+            'Taxa de acerto': f"{stats['cache_hit_ratio']:.0%}",
+            'Remoções': stats['cache_evictions_total'],
+        } for name, stats in cache_stats.items()]), hide_index=True)
+        memory = get_market_data_cache().stats()
+        st.caption(
+            f"Dados de mercado em memória: {memory['bytes'] / 2**20:.1f} de {memory['budget_bytes'] / 2**20:.0f} MB "
+            f"({memory['size']} itens, {memory['axes']} eixos de datas) · "
+            f"{memory['evictions']} remoções por falta de espaço ({memory['evicted_bytes'] / 2**20:.1f} MB)"
+        )
+
+        http_stats = {}
+        for row in snapshot['counters'] + snapshot['gauges']:
+            if 'client' in row['labels'] and row['name'].startswith('http_'):
+                http_stats.setdefault(row['labels']['client'], {})[row['name']] = row['value']
+        if http_stats:
+            st.write("**Conexões HTTP**")
+            st.dataframe(pd.DataFrame([{
+                'Cliente': name,
+                'Requisições': stats.get('http_requests_total', 0),
+                'Conexões abertas': stats.get('http_connections_opened_total', 0),
+                'Reaproveitamento': f"{stats.get('http_connection_reuse_ratio', 0):.0%}",
+                '304': stats.get('http_not_modified_total', 0),
+            } for name, stats in http_stats.items()]), hide_index=True)
+
+        st.write("**Tempos**")
+        if timing_rows:
+            st.dataframe(pd.DataFrame(timing_rows), hide_index=True)
+
+        col_text, col_json = st.columns(2)
+        with col_text:
+            st.download_button("Exportar texto", metrics.to_text(), file_name="metrics.txt", mime="text/plain")
+        with col_json:
+            st.download_button("Exportar JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
 
 # --- Layout Principal do Streamlit ---
 st.set_page_config(
@@ -624,6 +1051,16 @@ page = st.sidebar.selectbox("📍 Navegar para:",
                            ["🏠 Monitor Principal", "📊 Visão Geral do Portfólio"], 
                            key="page_navigation")
 
+# Atualização automática (opcional) dos painéis de cotação
+if st.sidebar.toggle("⏱️ Atualização automática", key="auto_refresh",
+                     help="Reexecuta apenas os painéis de cotação, sem recarregar a página."):
+    st.sidebar.select_slider("Intervalo (segundos):", AUTO_REFRESH_INTERVALS,
+                             value=DEFAULT_AUTO_REFRESH_SECONDS, key="auto_refresh_interval")
+
+# Alertas avaliados em segundo plano; o aviso se atualiza junto com as cotações
+fragment("alert_banner", run_every=auto_refresh_interval())(show_alert_banner)()
+
+page_started = time.perf_counter()
 if page == "📊 Visão Geral do Portfólio":
     show_portfolio_overview()
 else:
@@ -661,17 +1098,7 @@ else:
         else:
             st.info("Nenhuma criptomoeda cadastrada.")
 
-    # Controles de período do gráfico na barra lateral
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("Configurações do Gráfico")
-    current_period_key = st.sidebar.selectbox("Período do Gráfico:", list(CHART_PERIODS.keys()), key="chart_period_select")
-    selected_period_days = CHART_PERIODS[current_period_key]
-
     # Se um ativo for selecionado, carrega e exibe os dados
-    current_tracker = None
-    current_price = None
-    historical_data = pd.Series()
-
     if selected_asset and selected_api_choice:
         identifier = selected_asset.get('ticker') or selected_asset.get('id')
         display_symbol = selected_asset.get('display_name') or selected_asset.get('symbol')
@@ -682,26 +1109,27 @@ else:
             display_symbol=display_symbol,
             purchase_date=selected_asset.get('purchase_date'),
             quantity=selected_asset.get('quantity'),
-            purchase_price=selected_asset.get('purchase_price')
+            purchase_price=selected_asset.get('purchase_price'),
+            realized_pnl=selected_asset.get('realized_pnl'),
+            realized_pnl_fifo=selected_asset.get('realized_pnl_fifo'),
+            fifo_cost=selected_asset.get('fifo_cost')
         )
         
         st.sidebar.markdown("---")
         if st.sidebar.button("Atualizar Dados"):
-            # Limpar cache ao atualizar dados
-            st.session_state.price_cache = {}
-            st.session_state.cache_timestamp = datetime.now()
-            st.rerun() # Força o recarregamento dos dados
-
-        # Placeholder para a mensagem de carregamento
-        loading_message_placeholder = st.empty()
-        loading_message_placeholder.info("Carregando dados, por favor aguarde...")
-        
-        current_price = current_tracker.get_current_price()
-        historical_data = current_tracker.get_historical_data(selected_period_days)
-        
-        loading_message_placeholder.empty() # Limpa a mensagem de "carregando"
-        
-        display_asset_info(current_tracker, current_price, historical_data, current_period_key)
+            # Pede uma atualização em segundo plano em vez de bloquear a página
+            get_quote_refresher().request_refresh()
+            st.sidebar.info("Atualização solicitada; os valores serão renovados em instantes.")
+
+        # O histórico começa a carregar em paralelo com o painel de preço; o fragmento do
+        # gráfico aguarda essa mesma busca (coalescida) ou lê o que já foi gravado
+        if st.session_state.get('chart_resolution', DAILY_RESOLUTION) == DAILY_RESOLUTION:
+            chart_period_key = st.session_state.get('chart_period_select', next(iter(CHART_PERIODS)))
+            get_fetch_executor().submit(current_tracker.get_historical_data, CHART_PERIODS[chart_period_key])
+
+        # Com a atualização automática, preço e gráfico (inclusive intradiário) se reexecutam sozinhos
+        fragment("price_panel", run_every=auto_refresh_interval())(show_price_panel)(current_tracker)
+        fragment("history_chart", run_every=auto_refresh_interval())(show_history_chart)(current_tracker)
 
     else:
         st.info("Selecione um ativo na barra lateral para visualizar informações.")
@@ -710,74 +1138,17 @@ else:
     st.markdown("---")
     st.header("Buscar Ativo Personalizado")
 
-    col_search1, col_search2, col_search3 = st.columns([0.2, 0.4, 0.2])
-
-    # Adiciona um placeholder para os resultados da busca
-    search_results_placeholder = st.empty()
-
-    with col_search1:
-        search_asset_type = st.radio("Tipo:", ("crypto", "stock"), key="search_asset_type")
-
-    with col_search2:
-        search_term = st.text_input(f"{'ID da Criptomoeda' if search_asset_type == 'crypto' else 'Ticker da Ação'}:", key="search_term_input")
-
-    with col_search3:
-        st.write("") # Espaço para alinhar o botão
-        st.write("") # Espaço para alinhar o botão
-        if st.button("Buscar Ativo"):
-            search_results_placeholder.empty() # Limpa resultados anteriores ao iniciar nova busca
-            with search_results_placeholder.container(): # Usa o container para exibir os novos resultados
-                if search_term:
-                    api_choice_search = "coingecko" if search_asset_type == "crypto" else "yahoo_stock"
-                    identifier_search = search_term.lower() if search_asset_type == "crypto" else search_term.upper()
-                    display_name_search = search_term.upper() # Usar o próprio termo de busca como display name
-                    
-                    try:
-                        # Criar um AssetTracker temporário para a busca
-                        searched_tracker = AssetTracker(
-                            api_choice=api_choice_search,
-                            identifier=identifier_search,
-                            display_symbol=display_name_search
-                        )
-                        
-                        search_loading_placeholder = st.empty()
-                        search_loading_placeholder.info(f"Buscando informações para {display_name_search}...")
-                        
-                        searched_price = searched_tracker.get_current_price()
-                        searched_historical_data = searched_tracker.get_historical_data(CHART_PERIODS[current_period_key])
-
-                        search_loading_placeholder.empty() # Limpa a mensagem de "buscando"
-
-                        if searched_price is not None or not searched_historical_data.empty:
-                            st.subheader(f"Resultado da Busca: {display_name_search}")
-                            st.write(f"**💰 Preço atual:** {searched_tracker.format_price(searched_price)}")
-                            
-                            if not searched_historical_data.empty:
-                                fig_search = px.line(searched_historical_data, x=searched_historical_data.index, y=searched_historical_data.values,
-                                                     title=f'{display_name_search} - Histórico',
-                                                     labels={'x': 'Data', 'y': 'Preço (USD)'})
-                                fig_search.update_layout(hovermode="x unified")
-                                st.plotly_chart(fig_search, use_container_width=True, key=f"search_chart_{search_term}")
-                            else:
-                                st.warning("Não foi possível obter dados históricos para este ativo.")
-
-                            search_chart_link = searched_tracker.get_chart_link()
-                            if search_chart_link:
-                                st.markdown(f"[Ver Gráfico Completo]({search_chart_link})", unsafe_allow_html=True)
-
-                        else:
-                            st.warning(f"Não foi possível encontrar informações para '{search_term}'. Verifique o Ticker/ID.")
-                    
-                    except Exception as e:
-                        search_loading_placeholder.empty()
-                        st.error(f"Erro ao buscar ativo '{search_term}': {str(e)}")
-                else:
-                    st.warning("Por favor, digite um Ticker/ID para buscar.")
+    show_search_panel()
 
     # Formulários de Adicionar/Remover Ativos
     st.sidebar.markdown("---")
     add_asset_form()
+    trade_form()
     remove_asset_form()
+    alerts_form()
+    portfolio_file_form()
+get_metrics().observe("page_render_seconds", time.perf_counter() - page_started,
+                      page="overview" if page == "📊 Visão Geral do Portfólio" else "monitor")
 
 ## Exibir visão geral do portfólio
 #st.sidebar.markdown("---")
@@ -786,12 +1157,20 @@ else:
 
 # Botão para limpar cache
 if st.sidebar.button("🔄 Limpar Cache"):
-    st.session_state.price_cache = {}
-    st.session_state.cache_timestamp = datetime.now()
+    get_price_cache().clear()
     st.sidebar.success("Cache limpo com sucesso!")
     st.rerun()
 
 # Informações do cache
-cache_age = (datetime.now() - st.session_state.cache_timestamp).seconds
-cache_items = len(st.session_state.price_cache)
-st.sidebar.caption(f"Cache: {cache_items} itens, {cache_age}s atrás")
\ No newline at end of file
+cache_stats = get_price_cache().stats()
+st.sidebar.caption(
+    f"Cache: {cache_stats['size']}/{cache_stats['max_size']} itens, "
+    f"mais antigo há {cache_stats['oldest_age']:.0f}s · "
+    f"acertos {cache_stats['hit_ratio']:.0%} ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), "
+    f"{cache_stats['evictions']} remoções"
+)
+
+# Tempo total do script (reruns interrompidos por st.rerun não são medidos)
+rerun_seconds = time.perf_counter() - rerun_started
+get_metrics().observe("script_rerun_seconds", rerun_seconds)
+show_diagnostics_panel(rerun_seconds)
@@ -0,0 +1,51 @@
+"""Alertas de variação diária: a referência vem do histórico, mesmo sem gráfico aberto."""
+import pandas as pd
+import pytest
+
+from ticker_tracker import tracker
+from ticker_tracker.alerts import ABOVE, AlertEngine
+from ticker_tracker.board import QuoteBoard, set_quote_board
+from ticker_tracker.cache import price_cache_key
+from ticker_tracker.executor import FetchExecutor, set_fetch_executor
+from ticker_tracker.history import HistoryStore, set_history_store
+from ticker_tracker.holdings import HoldingsStore
+from ticker_tracker.marketdata import MarketDataCache, set_market_data_cache
+
+UNLIMITED = {"max_concurrency": 8, "rate_per_minute": 10**9, "burst": 10**9}
+KEY = price_cache_key("yahoo_stock", "PETR4.SA")
+
+@pytest.fixture
+def holdings(tmp_path):
+    set_history_store(HistoryStore(str(tmp_path / "history.db")))
+    set_market_data_cache(MarketDataCache())
+    set_quote_board(QuoteBoard(str(tmp_path / "board.db")))
+    set_fetch_executor(FetchExecutor(limits={"yahoo_stock": UNLIMITED, "coingecko": UNLIMITED}))
+    store = HoldingsStore(str(tmp_path / "holdings.db"), seed_from=str(tmp_path / "missing.json"))
+    store.replace_all({'stocks': [{'ticker': 'PETR4.SA', 'display_name': 'Petrobras', 'purchase_date': '2024-01-02',
+                                   'quantity': 10, 'purchase_price': 30.0}], 'cryptos': []})
+    yield store
+    set_history_store(None)
+    set_quote_board(None)
+    set_fetch_executor(None)
+
+def test_daily_rule_arms_without_local_history(holdings, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    closes = pd.Series([38.0, 40.0], index=[today - pd.Timedelta(days=2), today - pd.Timedelta(days=1)])
+    calls = []
+    monkeypatch.setattr(tracker, "fetch_stock_history", lambda *args, **kwargs: calls.append(args) or closes)
+
+    rule_id = holdings.add_alert_rule("stock", "PETR4.SA", "daily_pct", ABOVE, 5)
+    engine = AlertEngine(store=holdings)
+    assert engine.evaluate({KEY: 41.0}) == []
+    assert calls and engine.unarmed_rules() == set()
+    # 5% acima do último fechamento anterior a hoje (40,00)
+    alerts = engine.evaluate({KEY: 42.5})
+    assert [alert.rule_id for alert in alerts] == [rule_id]
+    assert alerts[0].level == pytest.approx(42.0)
+
+def test_rule_without_reference_is_reported(holdings, monkeypatch):
+    monkeypatch.setattr(tracker, "fetch_stock_history", lambda *args, **kwargs: pd.Series(dtype=float))
+    rule_id = holdings.add_alert_rule("stock", "PETR4.SA", "daily_pct", ABOVE, 5)
+    engine = AlertEngine(store=holdings)
+    assert engine.evaluate({KEY: 100.0}) == []
+    assert engine.unarmed_rules() == {rule_id}
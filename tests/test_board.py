@@ -0,0 +1,43 @@
+"""Reservas exclusivas do quadro: uma thread ou processo por vez, com espera limitada."""
+import threading
+import time
+
+import pytest
+
+from ticker_tracker.board import QuoteBoard
+
+def test_threads_of_one_process_take_turns(tmp_path):
+    board = QuoteBoard(str(tmp_path / "board.db"))
+    inside, overlaps = [], []
+
+    def worker():
+        with board.exclusive("history:x"):
+            inside.append(1)
+            overlaps.append(len(inside))
+            time.sleep(0.05)
+            inside.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == [1, 1, 1, 1]
+    # Nenhuma thread liberou a reserva de outra: ao final, a chave está livre e sem locks locais
+    assert board.acquire(["history:x"]) == {"history:x"}
+    assert not board._local_locks
+
+def test_wait_is_bounded_by_timeout(tmp_path):
+    path = str(tmp_path / "board.db")
+    other, board = QuoteBoard(path), QuoteBoard(path)
+    assert other.acquire(["history:x"]) == {"history:x"}
+    ran = []
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        with board.exclusive("history:x", timeout=0.2):
+            ran.append(1)
+    assert not ran and time.monotonic() - started < 2
+    other.release(["history:x"])
+    with board.exclusive("history:x", timeout=0.2):
+        ran.append(1)
+    assert ran == [1]
@@ -0,0 +1,58 @@
+"""Cache de preços: validade por entrada e descarte do menos usado ao lotar."""
+import pytest
+
+from ticker_tracker import cache
+from ticker_tracker.cache import PriceCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+def test_entries_expire_after_their_own_ttl(clock):
+    prices = PriceCache(max_size=10)
+    prices.set("coingecko_bitcoin", 50000.0, ttl=60)
+    prices.set("yahoo_stock_PETR4.SA", 40.0, ttl=300)
+
+    clock.now += 59
+    assert prices.get("coingecko_bitcoin") == 50000.0
+    clock.now += 1
+    assert prices.get("coingecko_bitcoin") is None
+    assert prices.peek("yahoo_stock_PETR4.SA") == 40.0
+    # A entrada vencida sai do cache ao ser consultada
+    assert prices.stats()['size'] == 1
+    assert (prices.hits, prices.misses) == (1, 1)
+
+def test_least_recently_used_entry_is_evicted(clock):
+    prices = PriceCache(max_size=3)
+    for key in ("a", "b", "c"):
+        prices.set(key, 1.0)
+    # Leitura renova "a"; "b" passa a ser o menos usado
+    assert prices.get("a") == 1.0
+    prices.set("d", 1.0)
+    assert prices.peek("b") is None
+    assert [prices.peek(key) for key in ("a", "c", "d")] == [1.0, 1.0, 1.0]
+    assert prices.evictions == 1
+
+def test_peek_does_not_refresh_recency(clock):
+    prices = PriceCache(max_size=2)
+    prices.set("a", 1.0)
+    prices.set("b", 2.0)
+    assert prices.peek("a") == 1.0
+    prices.set("c", 3.0)
+    assert prices.peek("a") is None and prices.peek("b") == 2.0
+
+def test_default_size_holds_the_largest_book(monkeypatch):
+    assert PriceCache().max_size >= 10000
+    monkeypatch.setenv(cache.PRICE_CACHE_SIZE_ENV, "50000")
+    assert PriceCache().max_size == 50000
+    # A última cotação conhecida não é descartada antes das cotações válidas
+    assert cache._last_known_prices.max_size > cache._price_cache.max_size
@@ -0,0 +1,63 @@
+"""Linha de comando: avaliação de carteiras em lote e leitura estrita dos arquivos."""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from ticker_tracker import cli, pricing
+from ticker_tracker.cache import price_cache_key
+
+PORTFOLIO = {
+    'stocks': [{'ticker': 'PETR4.SA', 'display_name': 'Petrobras', 'purchase_date': '2024-01-02',
+                'quantity': 10, 'purchase_price': 30.0}],
+    'cryptos': [{'id': 'bitcoin', 'symbol': 'btc', 'display_name': 'Bitcoin', 'purchase_date': '2024-01-02',
+                 'quantity': 0.5, 'purchase_price': 40000.0}],
+}
+PRICES = {
+    price_cache_key("yahoo_stock", "PETR4.SA"): 40.0,
+    price_cache_key("coingecko", "bitcoin"): 50000.0,
+    price_cache_key("yahoo_stock", "BRLUSD=X"): 0.2,
+}
+
+@pytest.fixture
+def quotes(monkeypatch):
+    requested = []
+    def get_prices_batch(assets, errors=None, **kwargs):
+        requested.append(list(assets))
+        return {key: price for key, price in PRICES.items()
+                if key in {price_cache_key(*asset) for asset in assets}}
+    monkeypatch.setattr(pricing, "get_prices_batch", get_prices_batch)
+    return requested
+
+def test_value_converts_to_reporting_currency_in_one_batch(tmp_path, quotes, capsys):
+    config = tmp_path / "carteira.json"
+    config.write_text(json.dumps(PORTFOLIO), encoding='utf-8')
+    assert cli.main(["value", str(config), "--currency", "USD"]) == 0
+
+    assert len(quotes) == 1 and ("yahoo_stock", "BRLUSD=X") in quotes[0]
+    summary = json.loads(capsys.readouterr().out)['portfolios'][0]
+    # PETR4: 10 x 30 BRL investidos e 10 x 40 BRL atuais, a 0,2 USD/BRL; BTC já em USD
+    assert summary['total_invested'] == pytest.approx(10 * 30 * 0.2 + 0.5 * 40000)
+    assert summary['total_current'] == pytest.approx(10 * 40 * 0.2 + 0.5 * 50000)
+    assert summary['unpriced_count'] == 0
+
+def test_invalid_config_is_rejected_without_valuing(tmp_path, quotes, capsys):
+    bad = tmp_path / "bad.json"
+    bad.write_text('{"stocks": [', encoding='utf-8')
+    assert cli.main(["value", str(bad), "--format", "csv"]) == 2
+    captured = capsys.readouterr()
+    assert captured.out == "" and str(bad) in captured.err
+    assert quotes == []
+
+def test_config_must_be_an_object(tmp_path, quotes, capsys):
+    config = tmp_path / "list.json"
+    config.write_text("[]", encoding='utf-8')
+    assert cli.main(["value", str(config)]) == 2
+    assert "list.json" in capsys.readouterr().err
+
+def test_help_does_not_import_pandas():
+    # Processo novo: aqui o pandas já foi importado por outros testes
+    code = "import sys; from ticker_tracker import cli; cli.build_parser(); print('pandas' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,70 @@
+"""Câmbio: moeda nativa por provedor e conversão vetorizada para a moeda de referência."""
+import pandas as pd
+import pytest
+
+from ticker_tracker import fx
+from ticker_tracker.fx import get_fx_rates, native_currencies, native_currency, rates_from_prices
+from ticker_tracker.portfolio import build_holdings_frame, compute_holdings_analytics
+
+ASSETS = {
+    "stocks": [
+        {"ticker": "PETR4.SA", "display_name": "ENERGIA - Petrobras", "purchase_date": "2023-01-10",
+         "quantity": 10.0, "purchase_price": 30.0},
+        {"ticker": "AAPL", "display_name": "TECNOLOGIA - Apple", "purchase_date": "2023-01-10",
+         "quantity": 2.0, "purchase_price": 150.0},
+    ],
+    "cryptos": [
+        {"id": "bitcoin", "display_name": "Bitcoin", "symbol": "BTC", "purchase_date": "2022-06-20",
+         "quantity": 0.1, "purchase_price": 20000.0},
+    ],
+}
+
+def test_native_currency_by_provider_and_suffix():
+    assert native_currency("yahoo_stock", "petr4.sa") == "BRL"
+    assert native_currency("yahoo_stock", "AAPL") == "USD"
+    assert native_currency("coingecko", "bitcoin") == "USD"
+    vectorized = native_currencies(pd.Series(["yahoo_stock", "yahoo_stock", "coingecko"]),
+                                   pd.Series(["PETR4.SA", "AAPL", "bitcoin.sa"]))
+    assert vectorized.tolist() == ["BRL", "USD", "USD"]
+
+def test_rates_come_from_one_batch(monkeypatch):
+    batches = []
+
+    def batch(assets, errors=None, use_cache=True, max_wait=None):
+        batches.append(list(assets))
+        return {"yahoo_stock_BRLEUR=X": 0.18, "yahoo_stock_USDEUR=X": 0.9}
+
+    monkeypatch.setattr(fx, "get_prices_batch", batch)
+    assert get_fx_rates(["BRL", "USD", "EUR"], "EUR") == {"EUR": 1.0, "BRL": 0.18, "USD": 0.9}
+    assert batches == [[("yahoo_stock", "BRLEUR=X"), ("yahoo_stock", "USDEUR=X")]]
+
+    # Só a própria moeda de referência: nada a cotar
+    assert get_fx_rates(["EUR"], "EUR") == {"EUR": 1.0}
+    assert len(batches) == 1
+
+def test_missing_rate_is_reported_and_left_unconverted():
+    errors = []
+    assert rates_from_prices({}, ["BRL", "USD"], "USD", errors) == {"USD": 1.0}
+    assert errors and "BRL/USD" in errors[0]
+
+def test_holdings_are_converted_before_totals():
+    frame = build_holdings_frame(ASSETS)
+    prices = {"yahoo_stock_PETR4.SA": 40.0, "yahoo_stock_AAPL": 200.0, "coingecko_bitcoin": 50000.0}
+    holdings, by_category = compute_holdings_analytics(frame, prices, {"USD": 1.0, "BRL": 0.2})
+
+    petr = holdings.set_index('identifier').loc["PETR4.SA"]
+    # Cotação e custo em BRL convertidos pelo mesmo fator
+    assert petr['current_price'] == pytest.approx(8.0)
+    assert petr['invested'] == pytest.approx(60.0)
+    assert petr['current_value'] == pytest.approx(80.0)
+    # A variação não depende da moeda
+    assert petr['variation'] == pytest.approx(100 * (40.0 - 30.0) / 30.0)
+    assert by_category.loc["TECNOLOGIA", 'total_current'] == pytest.approx(400.0)
+    assert by_category.loc["CRYPTO", 'total_invested'] == pytest.approx(2000.0)
+    assert by_category['total_current'].sum() == pytest.approx(80.0 + 400.0 + 5000.0)
+
+def test_currency_without_rate_keeps_native_values():
+    frame = build_holdings_frame(ASSETS)
+    prices = {"yahoo_stock_PETR4.SA": 40.0}
+    holdings, _ = compute_holdings_analytics(frame, prices, {"USD": 1.0})
+    assert holdings.set_index('identifier').loc["PETR4.SA", 'current_value'] == pytest.approx(400.0)
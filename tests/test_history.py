@@ -0,0 +1,75 @@
+"""Histórico incremental: depois da carga inicial só as barras novas vão à rede."""
+import pandas as pd
+import pytest
+
+from ticker_tracker import tracker
+from ticker_tracker.board import QuoteBoard, set_quote_board
+from ticker_tracker.history import HistoryStore, set_history_store
+from ticker_tracker.marketdata import MarketDataCache, set_market_data_cache
+from ticker_tracker.tracker import AssetTracker
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    set_history_store(store)
+    set_quote_board(QuoteBoard(str(tmp_path / "board.db")))
+    set_market_data_cache(MarketDataCache())
+    yield store
+    set_history_store(None)
+    set_quote_board(None)
+
+def closes(dates, start_price):
+    return pd.Series([start_price + i for i in range(len(dates))], index=pd.DatetimeIndex(dates), dtype=float)
+
+def test_only_bars_after_last_stored_date_are_fetched(store, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    initial_days = pd.date_range(today - pd.Timedelta(days=9), today - pd.Timedelta(days=2))
+    calls = []
+
+    def fetch(ticker, period=None, start=None):
+        calls.append({'period': period, 'start': start})
+        if start is None:
+            return closes(initial_days, 10.0)
+        # O pregão da última barra gravada foi revisto e há uma barra nova
+        return closes(pd.date_range(start, today - pd.Timedelta(days=1)), 50.0)
+
+    monkeypatch.setattr(tracker, "fetch_stock_history", fetch)
+    asset = AssetTracker("yahoo_stock", "PETR4.SA", "Petrobras")
+
+    first = asset.get_historical_data(30)
+    assert calls == [{'period': "30d", 'start': None}]
+    assert len(first) == len(initial_days)
+
+    # Dentro do intervalo de atualização: lido só do armazenamento
+    asset.get_historical_data(30)
+    assert len(calls) == 1
+
+    monkeypatch.setattr(tracker, "HISTORY_REFRESH_SECONDS", 0)
+    updated = asset.get_historical_data(30)
+    last_stored = initial_days[-1]
+    # A busca começa na última data gravada (inclusive), não na janela inteira
+    assert calls[1] == {'period': None, 'start': last_stored.strftime('%Y-%m-%d')}
+    assert updated.index.is_unique
+    assert updated.index[-1] == today - pd.Timedelta(days=1)
+    assert updated[last_stored] == 50.0
+    assert updated[initial_days[0]] == 10.0
+    assert len(updated) == len(initial_days) + 1
+    assert store.get_meta(asset.cache_key)['last_date'] == (today - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+def test_longer_period_than_stored_reloads_full_window(store, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    calls = []
+
+    def fetch(ticker, period=None, start=None):
+        calls.append(period)
+        days = int(period.rstrip('d'))
+        return closes(pd.date_range(today - pd.Timedelta(days=days), today), 1.0)
+
+    monkeypatch.setattr(tracker, "fetch_stock_history", fetch)
+    asset = AssetTracker("yahoo_stock", "VALE3.SA", "Vale")
+    asset.get_historical_data(30)
+    # Período menor já está coberto; o maior exige a janela completa
+    asset.get_historical_data(10)
+    asset.get_historical_data(90)
+    assert calls == ["30d", "90d"]
+    assert store.get_meta(asset.cache_key)['coverage_start'] == (today - pd.Timedelta(days=90)).strftime('%Y-%m-%d')
@@ -0,0 +1,62 @@
+"""Carteira em SQLite: importação do JSON na primeira abertura e ida e volta pela exportação."""
+import json
+
+import pytest
+
+from ticker_tracker.holdings import DuplicateAssetError, HoldingsStore
+
+ASSETS = {
+    "stocks": [
+        {"ticker": "PETR4.SA", "display_name": "ENERGIA - Petrobras", "purchase_date": "2023-01-10",
+         "quantity": 10.0, "purchase_price": 10.0, "notes": "longo prazo"},
+    ],
+    "cryptos": [
+        {"id": "bitcoin", "display_name": "Bitcoin", "symbol": "BTC", "purchase_date": "2022-06-20",
+         "quantity": 0.5, "purchase_price": 20000.0},
+    ],
+}
+
+@pytest.fixture
+def store(tmp_path):
+    config = tmp_path / "assets_config.json"
+    config.write_text(json.dumps(ASSETS), encoding='utf-8')
+    return HoldingsStore(str(tmp_path / "holdings.db"), seed_from=str(config))
+
+def test_first_open_imports_the_json_portfolio(store):
+    assets = store.load_assets()
+    stock, crypto = assets['stocks'][0], assets['cryptos'][0]
+    assert (stock['ticker'], stock['quantity'], stock['purchase_price']) == ("PETR4.SA", 10.0, 10.0)
+    # Campos sem coluna própria são preservados
+    assert stock['notes'] == "longo prazo"
+    assert crypto['symbol'] == "BTC"
+    # A posição importada vira a compra inicial do livro
+    assert stock['fifo_cost'] == 100.0 and stock['realized_pnl'] == 0.0
+    assert store.transactions("stock", "PETR4.SA") == [
+        {'date': "2023-01-10", 'side': "buy", 'quantity': 10.0, 'price': 10.0,
+         'realized_pnl': 0.0, 'realized_pnl_fifo': 0.0}]
+
+def test_reopening_does_not_import_again(store, tmp_path):
+    store.remove("crypto", "bitcoin")
+    reopened = HoldingsStore(store.path, seed_from=str(tmp_path / "assets_config.json"))
+    assert reopened.count() == 1
+
+def test_export_and_import_round_trip(store, tmp_path):
+    exported = tmp_path / "export.json"
+    store.export_json(str(exported))
+
+    other = HoldingsStore(str(tmp_path / "other.db"), seed_from=str(tmp_path / "missing.json"))
+    other.import_json(str(exported))
+    assert other.load_assets() == store.load_assets()
+    assert other.load_assets()['stocks'][0]['notes'] == "longo prazo"
+
+def test_add_and_remove_single_positions(store):
+    version = store.version()
+    store.add("stock", {"ticker": "VALE3.SA", "display_name": "MINERIO - Vale",
+                        "purchase_date": "2023-05-02", "quantity": 4, "purchase_price": 60.0})
+    with pytest.raises(DuplicateAssetError):
+        store.add("stock", {"ticker": "VALE3.SA", "display_name": "MINERIO - Vale"})
+    assert store.exists("stock", "VALE3.SA") and store.version() == version + 1
+    assert store.price_assets() == [("yahoo_stock", "PETR4.SA"), ("coingecko", "bitcoin"),
+                                    ("yahoo_stock", "VALE3.SA")]
+    assert store.remove("stock", "VALE3.SA") and not store.remove("stock", "VALE3.SA")
+    assert store.count() == 2
@@ -0,0 +1,33 @@
+"""Novas tentativas do cliente HTTP: o limitador do provedor vale por tentativa, não durante as esperas."""
+import json
+
+import requests
+
+from ticker_tracker import httpclient
+from ticker_tracker.executor import ProviderLimiter
+
+def response(status, body=None, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    resp._content = json.dumps(body).encode() if body is not None else b""
+    return resp
+
+def test_backoff_sleeps_outside_the_limiter(monkeypatch):
+    client = httpclient.HttpClient("test")
+    limiter = ProviderLimiter(max_concurrency=1, rate_per_minute=10**6, burst=10**6, name="test")
+    replies = [response(503, headers={'Retry-After': '2'}), response(200, {'ok': True})]
+    monkeypatch.setattr(client._session, "get", lambda *args, **kwargs: replies.pop(0))
+
+    sleeps = []
+    def sleep(seconds):
+        # A vaga do limitador está livre e a falha já foi contada pelo disjuntor
+        free = limiter._semaphore.acquire(blocking=False)
+        if free:
+            limiter._semaphore.release()
+        sleeps.append((seconds, free, limiter.breaker.stats()['failures']))
+    monkeypatch.setattr(httpclient.time, "sleep", sleep)
+
+    assert client.get_json("https://example.invalid/x", guard=limiter) == {'ok': True}
+    assert sleeps == [(2.0, True, 1)]
+    assert limiter.breaker.stats()['failures'] == 0 and client.retries == 1
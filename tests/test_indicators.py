@@ -0,0 +1,49 @@
+"""Indicadores: a atualização incremental deve igualar o recálculo completo."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ticker_tracker.history import FULL_HISTORY_START, HistoryStore, set_history_store
+from ticker_tracker.indicators import INDICATOR_COLUMNS, IndicatorCache, compute_indicators
+from ticker_tracker.marketdata import MarketDataCache, get_market_data_cache, set_market_data_cache
+
+KEY = "yahoo_stock_PETR4.SA"
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    set_history_store(store)
+    set_market_data_cache(MarketDataCache())
+    yield store
+    set_history_store(None)
+
+def test_incremental_updates_match_full_recompute(store, monkeypatch):
+    rng = np.random.default_rng(11)
+    dates = pd.date_range("2024-01-01", periods=600)
+    closes = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))), index=dates)
+    store.write(KEY, closes.iloc[:300], FULL_HISTORY_START)
+    indicators = IndicatorCache()
+    indicators.get(KEY, "daily")
+    extended = []
+    extend = IndicatorCache._extend
+    monkeypatch.setattr(IndicatorCache, "_extend",
+                        staticmethod(lambda *args: extended.append(1) or extend(*args)))
+
+    # Barras novas uma a uma (a última também é regravada com outro preço), como ao longo dos pregões
+    for end in range(301, 600, 3):
+        store.write(KEY, closes.iloc[end - 2:end] * (1 + 1e-3), FULL_HISTORY_START)
+        store.write(KEY, closes.iloc[end - 2:end + 1], FULL_HISTORY_START)
+        table = indicators.get(KEY, "daily")
+
+    series = store.read(KEY)
+    full = compute_indicators(series.to_numpy())
+    expected = pd.DataFrame(full, index=series.index)[list(INDICATOR_COLUMNS)].astype(np.float32).astype(np.float64)
+    pd.testing.assert_frame_equal(table, expected, check_freq=False, rtol=1e-6)
+    # O estado das médias exponenciais não acumula o arredondamento da tabela compacta
+    assert len(extended) == 100
+    seeds = get_market_data_cache().get(("indicator_seeds", store.path, KEY, "daily"))[1]
+    for name, value in seeds.items():
+        assert value == pytest.approx(full[name][-2], rel=1e-12)
+
+    window = indicators.get(KEY, "daily", series.index[-30])
+    pd.testing.assert_frame_equal(window, expected.iloc[-30:], check_freq=False, rtol=1e-6)
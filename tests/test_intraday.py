@@ -0,0 +1,31 @@
+"""Barras intradiárias de criptomoedas: só intervalos que a CoinGecko fornece, buscadas a partir da última barra gravada."""
+import pandas as pd
+import pytest
+
+from ticker_tracker import tracker
+from ticker_tracker.intraday import IntradayStore
+from ticker_tracker.tracker import AssetTracker
+
+def test_crypto_intraday_uses_provider_intervals_and_last_bar(tmp_path, monkeypatch):
+    store = IntradayStore(str(tmp_path / "intraday"))
+    monkeypatch.setattr(tracker, "get_intraday_store", lambda: store)
+    points = pd.date_range("2026-01-05 10:00", periods=12, freq="5min", tz="UTC")
+    calls = []
+
+    def fetch(crypto_id, since=None):
+        calls.append(since)
+        series = pd.Series(range(len(points)), index=points, dtype=float)
+        return series[series.index >= since] if since is not None else series
+    monkeypatch.setattr(tracker, "fetch_crypto_intraday", fetch)
+
+    asset = AssetTracker("coingecko", "bitcoin", "BTC")
+    assert "1m" not in asset.intraday_intervals
+    with pytest.raises(ValueError):
+        asset.get_intraday_data("1m")
+
+    bars = asset.get_intraday_data("15m")
+    assert list(bars.index) == list(pd.date_range("2026-01-05 10:00", periods=4, freq="15min"))
+    store._fetched_at.clear()
+    asset.get_intraday_data("15m")
+    # A segunda busca parte da última barra gravada
+    assert calls == [None, pd.Timestamp("2026-01-05 10:45", tz="UTC")]
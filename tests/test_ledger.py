@@ -0,0 +1,96 @@
+"""Livro de operações: custo médio e FIFO em vendas parciais e migração de bancos antigos."""
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from ticker_tracker.holdings import HoldingsStore
+
+ASSETS = {
+    "stocks": [
+        {"ticker": "PETR4.SA", "display_name": "ENERGIA - Petrobras", "purchase_date": "2023-01-10",
+         "quantity": 10.0, "purchase_price": 10.0},
+    ],
+    "cryptos": [
+        {"id": "bitcoin", "display_name": "Bitcoin", "symbol": "BTC", "purchase_date": "2022-06-20",
+         "quantity": 0.5, "purchase_price": 20000.0},
+    ],
+}
+
+@pytest.fixture
+def store(tmp_path):
+    config = tmp_path / "assets_config.json"
+    config.write_text(json.dumps(ASSETS), encoding='utf-8')
+    return HoldingsStore(str(tmp_path / "holdings.db"), seed_from=str(config))
+
+def lots(store, identifier):
+    with closing(sqlite3.connect(store.path)) as conn:
+        return conn.execute(
+            "SELECT l.quantity, l.price FROM lots AS l JOIN holdings AS h ON h.id = l.holding_id"
+            " WHERE h.identifier = ? ORDER BY l.id", (identifier,)).fetchall()
+
+def test_average_cost_and_fifo_across_partial_sells(store):
+    store.record_trade("stock", "PETR4.SA", "buy", 10, 20.0, "2023-02-01")
+    assert lots(store, "PETR4.SA") == [(10.0, 10.0), (10.0, 20.0)]
+
+    # Custo médio 15; FIFO consome metade do primeiro lote (a 10)
+    first = store.record_trade("stock", "PETR4.SA", "sell", 5, 30.0, "2023-03-01")
+    assert first['realized_pnl'] == pytest.approx(75.0)
+    assert first['realized_pnl_fifo'] == pytest.approx(100.0)
+    assert lots(store, "PETR4.SA") == [(5.0, 10.0), (10.0, 20.0)]
+
+    # Atravessa lotes: fecha o primeiro e consome metade do segundo
+    second = store.record_trade("stock", "PETR4.SA", "sell", 10, 25.0, "2023-04-01")
+    assert second['realized_pnl'] == pytest.approx(100.0)
+    assert second['realized_pnl_fifo'] == pytest.approx(5 * 15.0 + 5 * 5.0)
+    assert lots(store, "PETR4.SA") == [(5.0, 20.0)]
+
+    stock = store.load_assets()['stocks'][0]
+    assert stock['quantity'] == pytest.approx(5.0)
+    # Vendas não mudam o preço médio; o custo FIFO é o do lote restante
+    assert stock['purchase_price'] == pytest.approx(15.0)
+    assert stock['fifo_cost'] == pytest.approx(100.0)
+    assert stock['realized_pnl'] == pytest.approx(175.0)
+    assert stock['realized_pnl_fifo'] == pytest.approx(200.0)
+
+    with pytest.raises(ValueError):
+        store.record_trade("stock", "PETR4.SA", "sell", 6, 25.0)
+    closing_sell = store.record_trade("stock", "PETR4.SA", "sell", 5, 20.0)
+    assert closing_sell['quantity'] == 0.0
+    assert lots(store, "PETR4.SA") == []
+    # Posição zerada: os dois métodos realizam o mesmo total
+    stock = store.load_assets()['stocks'][0]
+    assert stock['realized_pnl'] == pytest.approx(stock['realized_pnl_fifo']) == pytest.approx(200.0)
+    assert stock['fifo_cost'] == 0.0
+
+def test_database_without_ledger_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(
+            "CREATE TABLE holdings (id INTEGER PRIMARY KEY, asset_type TEXT NOT NULL, identifier TEXT NOT NULL,"
+            " display_name TEXT NOT NULL, symbol TEXT, category TEXT NOT NULL, purchase_date TEXT,"
+            " quantity REAL, purchase_price REAL, extra TEXT)")
+        conn.execute("CREATE TABLE holdings_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT INTO holdings_meta VALUES ('seeded', 1)")
+        conn.execute("INSERT INTO holdings (asset_type, identifier, display_name, category, purchase_date,"
+                     " quantity, purchase_price) VALUES ('stock', 'VALE3.SA', 'MINERIO - Vale', 'MINERIO',"
+                     " '2023-05-02', 4, 60)")
+
+    store = HoldingsStore(path, seed_from=str(tmp_path / "missing.json"))
+    stock = store.load_assets()['stocks'][0]
+    assert stock['fifo_cost'] == 240.0 and stock['realized_pnl'] == 0.0
+    assert lots(store, "VALE3.SA") == [(4.0, 60.0)]
+    result = store.record_trade("stock", "VALE3.SA", "sell", 4, 70.0)
+    assert result['realized_pnl'] == result['realized_pnl_fifo'] == pytest.approx(40.0)
+
+def test_json_export_replays_the_ledger(store, tmp_path):
+    store.record_trade("stock", "PETR4.SA", "buy", 10, 20.0, "2023-02-01")
+    store.record_trade("stock", "PETR4.SA", "sell", 15, 30.0, "2023-03-01")
+    exported = tmp_path / "export.json"
+    store.export_json(str(exported))
+
+    other = HoldingsStore(str(tmp_path / "other.db"), seed_from=str(tmp_path / "missing.json"))
+    other.import_json(str(exported))
+    assert other.load_assets() == store.load_assets()
+    assert lots(other, "PETR4.SA") == lots(store, "PETR4.SA") == [(5.0, 20.0)]
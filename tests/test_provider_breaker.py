@@ -0,0 +1,72 @@
+"""Disjuntor do Yahoo: o yfinance devolve tabelas vazias em vez de levantar erros de rede."""
+import pandas as pd
+import pytest
+import yfinance as yf
+from yfinance.exceptions import YFPricesMissingError
+
+from ticker_tracker.executor import CIRCUIT_FAILURE_THRESHOLD, CircuitOpenError, FetchExecutor, set_fetch_executor
+from ticker_tracker.providers import fetch_stock_history, fetch_stock_prices_chunk
+
+UNLIMITED = {"max_concurrency": 8, "rate_per_minute": 10**9, "burst": 10**9}
+
+class StubTicker:
+    error = ConnectionError("Could not resolve host: query2.finance.yahoo.com")
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, **kwargs):
+        raise self.error
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = FetchExecutor(limits={"yahoo_stock": UNLIMITED})
+    set_fetch_executor(executor)
+    calls = []
+
+    def download(tickers, **kwargs):
+        calls.append(tickers)
+        return pd.DataFrame()
+
+    monkeypatch.setattr(yf, "download", download)
+    monkeypatch.setattr(yf, "Ticker", StubTicker)
+    executor.download_calls = calls
+    yield executor
+    set_fetch_executor(None)
+
+def test_empty_downloads_open_the_breaker(executor):
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(ConnectionError):
+            fetch_stock_prices_chunk(["PETR4.SA", "VALE3.SA"])
+    assert executor.breakers()["yahoo_stock"].stats()["state"] == "aberto"
+
+    # Aberto, o disjuntor recusa a chamada sem ir ao provedor
+    with pytest.raises(CircuitOpenError):
+        fetch_stock_prices_chunk(["PETR4.SA"])
+    assert len(executor.download_calls) == CIRCUIT_FAILURE_THRESHOLD
+
+def test_history_network_errors_count_as_failures(executor):
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(ConnectionError):
+            fetch_stock_history("PETR4.SA", period="30d")
+    assert executor.breakers()["yahoo_stock"].stats()["state"] == "aberto"
+
+class CurlConnectionError(OSError):
+    """Como as falhas de conexão do curl_cffi: resposta vazia com status 0."""
+
+    class response:
+        status_code = 0
+
+def test_connection_errors_with_empty_response_count_as_failures(executor, monkeypatch):
+    monkeypatch.setattr(StubTicker, "error", CurlConnectionError("curl: (6) Could not resolve host"))
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(CurlConnectionError):
+            fetch_stock_prices_chunk(["PETR4.SA"])
+    assert executor.breakers()["yahoo_stock"].stats()["state"] == "aberto"
+
+def test_missing_tickers_do_not_open_the_breaker(executor, monkeypatch):
+    monkeypatch.setattr(StubTicker, "error", YFPricesMissingError("XXXX3.SA", "(period=5d)"))
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD + 1):
+        assert fetch_stock_prices_chunk(["XXXX3.SA"]) == {}
+        assert fetch_stock_history("XXXX3.SA", period="30d").empty
+    assert executor.breakers()["yahoo_stock"].stats()["state"] == "fechado"
@@ -0,0 +1,30 @@
+"""Atualizador de cotações: ativos sem cotação não forçam uma rodada a cada renderização."""
+import time
+
+from ticker_tracker import refresher
+from ticker_tracker.refresher import QuoteRefresher
+
+class StubStore:
+    def price_assets(self):
+        return [("yahoo_stock", "DELISTED.SA")]
+
+def test_missing_quotes_are_requested_once_per_interval(monkeypatch):
+    rounds = []
+    monkeypatch.setattr(refresher, "get_prices_batch", lambda assets, *args, **kwargs: rounds.append(assets) or {})
+    quotes = QuoteRefresher(interval=3600, store=StubStore())
+    wait_for(lambda: quotes.latest() is not None)
+
+    # Já tentado na rodada inicial: continua sem cotação, mas não pede outra rodada
+    assert not quotes.request_missing(["yahoo_stock_DELISTED.SA"])
+    # Ativo novo (ainda fora das rodadas): pede uma vez e aguarda a rodada
+    assert quotes.request_missing(["yahoo_stock_NEW.SA"])
+    assert not quotes.request_missing(["yahoo_stock_NEW.SA", "yahoo_stock_DELISTED.SA"])
+    wait_for(lambda: len(rounds) == 2)
+    time.sleep(0.1)
+    assert len(rounds) == 2
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
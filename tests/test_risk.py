@@ -0,0 +1,122 @@
+"""Modelo de risco: a atualização incremental deve igualar o recálculo completo."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ticker_tracker import risk
+from ticker_tracker.cache import price_cache_key
+from ticker_tracker.executor import FetchExecutor, set_fetch_executor
+from ticker_tracker.fx import FX_API_CHOICE, fx_ticker
+from ticker_tracker.history import FULL_HISTORY_START, HistoryStore, set_history_store
+from ticker_tracker.marketdata import MarketDataCache, set_market_data_cache
+from ticker_tracker.portfolio import build_holdings_frame
+from ticker_tracker.risk import RiskModel, return_matrix
+
+def full_model(returns):
+    model = RiskModel(returns.columns)
+    model.update(returns)
+    return model
+
+def assert_same_model(incremental, returns):
+    full = full_model(returns)
+    np.testing.assert_allclose(incremental.covariance(), full.covariance(), rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(incremental.means(), full.means(), rtol=1e-9, atol=1e-15)
+    # A covariância por pares coincide com a do pandas (pares com as datas comuns)
+    np.testing.assert_allclose(incremental.covariance(), returns.cov().to_numpy(), rtol=1e-9, atol=1e-15)
+
+def price_matrix(days=320, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2025-01-01", periods=days)
+    steps = rng.normal(0, 0.01, size=(days, 3))
+    return pd.DataFrame(100 * np.exp(np.cumsum(steps, axis=0)), index=dates, columns=["a", "b", "benchmark"])
+
+def test_window_slide_matches_full_recompute():
+    prices = price_matrix()
+    model = full_model(return_matrix(prices.iloc[:260]).iloc[-252:])
+    for end in range(261, 300, 3):
+        returns = return_matrix(prices.iloc[:end]).iloc[-252:]
+        model.update(returns)
+        assert_same_model(model, returns)
+
+def test_late_bars_replace_forward_filled_returns():
+    prices = price_matrix()
+    # "a" fica 4 dias úteis sem barras (provedor fora do ar) e depois as recebe
+    lagging = prices.iloc[:280].copy()
+    lagging.iloc[-4:, 0] = np.nan
+    model = full_model(return_matrix(lagging).iloc[-252:])
+
+    returns = return_matrix(prices.iloc[:281]).iloc[-252:]
+    model.update(returns)
+    assert_same_model(model, returns)
+
+def test_missing_values_only_drop_their_pairs():
+    prices = price_matrix()
+    prices.iloc[100:120, 1] = np.nan
+    model = full_model(return_matrix(prices.iloc[:270]).iloc[-252:])
+    returns = return_matrix(prices.iloc[:275]).iloc[-252:]
+    model.update(returns)
+    assert_same_model(model, returns)
+
+# --- get_risk_model: atualização incremental contra releitura completa ---
+BENCHMARK = ("yahoo_stock", "^BVSP")
+UNLIMITED = {"max_concurrency": 8, "rate_per_minute": 10**9, "burst": 10**9}
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    set_history_store(store)
+    set_market_data_cache(MarketDataCache())
+    set_fetch_executor(FetchExecutor(limits={"yahoo_stock": UNLIMITED, "coingecko": UNLIMITED}))
+    risk._risk_model_cache.clear()
+    yield store
+    set_history_store(None)
+    set_fetch_executor(None)
+
+def series(dates, seed):
+    rng = np.random.default_rng(seed)
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates)))), index=dates)
+
+def test_incremental_refresh_matches_full_reload(store, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    days = pd.date_range(today - pd.Timedelta(days=400), today)
+    bdays = days[days.dayofweek < 5]
+    full = {
+        "yahoo_stock_PETR4.SA": series(bdays, 1),
+        "yahoo_stock_VALE3.SA": series(bdays, 2),
+        "coingecko_bitcoin": series(days, 3),
+        price_cache_key(*BENCHMARK): series(bdays, 4),
+        price_cache_key(FX_API_CHOICE, fx_ticker("USD", "BRL")): series(bdays, 5) / 20,
+    }
+    # Primeira leitura: faltam os 3 últimos dias de todos e VALE3 está atrasada desde uma
+    # segunda-feira (a releitura precisa do fechamento de sexta das demais)
+    lag_from = bdays[(bdays.dayofweek == 0) & (bdays <= bdays[-5])][-1]
+    for key, values in full.items():
+        cut = lag_from + pd.Timedelta(hours=1) if key == "yahoo_stock_VALE3.SA" else days[-3]
+        store.write(key, values[values.index < cut], FULL_HISTORY_START)
+
+    frame = build_holdings_frame({
+        'stocks': [{'ticker': 'PETR4.SA', 'display_name': 'Petrobras', 'purchase_date': '2024-01-02',
+                    'quantity': 10, 'purchase_price': 30.0},
+                   {'ticker': 'VALE3.SA', 'display_name': 'Vale', 'purchase_date': '2024-01-02',
+                    'quantity': 5, 'purchase_price': 60.0}],
+        'cryptos': [{'id': 'bitcoin', 'symbol': 'btc', 'display_name': 'Bitcoin', 'purchase_date': '2024-01-02',
+                     'quantity': 0.1, 'purchase_price': 40000.0}],
+    })
+    first = risk.get_risk_model(frame, BENCHMARK, "BRL")
+
+    for key, values in full.items():
+        store.write(key, values, FULL_HISTORY_START)
+    lookbacks = []
+    load = risk.load_risk_prices
+    monkeypatch.setattr(risk, "load_risk_prices",
+                        lambda *args, **kwargs: lookbacks.append(args[4] if len(args) > 4 else None) or load(*args, **kwargs))
+    incremental = risk.get_risk_model(frame, BENCHMARK, "BRL")
+    assert incremental is not first and lookbacks and lookbacks[0] < 30
+    # O modelo publicado antes não foi alterado
+    assert first.returns.index[-1] < incremental.returns.index[-1]
+
+    risk._risk_model_cache.clear()
+    reloaded = risk.get_risk_model(frame, BENCHMARK, "BRL")
+    pd.testing.assert_frame_equal(incremental.returns, reloaded.returns)
+    pd.testing.assert_series_equal(incremental.last_prices, reloaded.last_prices)
+    np.testing.assert_allclose(incremental.covariance(), reloaded.covariance(), rtol=1e-9, atol=1e-15)
@@ -0,0 +1,59 @@
+"""Índice de símbolos: listagens da B3 e da CoinGecko persistidas, com a base fixa como reserva."""
+import json
+
+import pytest
+
+from ticker_tracker import providers
+from ticker_tracker.symbols import B3_TICKERS, SymbolCatalog
+
+STOCKS = [("PETR4.SA", "PETROBRAS PN"), ("KEPL3.SA", "KEPLER WEBER ON")]
+COINS = [("bitcoin", "btc", "Bitcoin")]
+
+@pytest.fixture
+def listings(monkeypatch):
+    monkeypatch.setattr(providers, "fetch_stock_symbols", lambda: STOCKS)
+    monkeypatch.setattr(providers, "fetch_crypto_symbols", lambda: COINS)
+
+def test_refresh_indexes_the_full_b3_listing(tmp_path, listings):
+    catalog = SymbolCatalog(str(tmp_path / "symbols.json"))
+    assert catalog.lookup("yahoo_stock", "KEPL3.SA") is None
+    catalog.refresh()
+
+    # Ticker fora da base fixa, vindo da listagem
+    assert catalog.lookup("yahoo_stock", "kepl3.sa").name == "KEPLER WEBER ON"
+    assert catalog.search("kepler", api_choice="yahoo_stock")[0].identifier == "KEPL3.SA"
+    # A listagem prevalece sobre a base fixa, que completa o que faltar
+    assert catalog.lookup("yahoo_stock", "PETR4.SA").name == "PETROBRAS PN"
+    assert catalog.lookup("yahoo_stock", "VALE3.SA") is not None
+    assert catalog.has_listing("yahoo_stock") and catalog.has_listing("coingecko")
+    assert not catalog.is_stale
+
+    reloaded = SymbolCatalog(catalog.path)
+    reloaded.load()
+    assert reloaded.lookup("yahoo_stock", "KEPL3.SA") is not None
+    assert reloaded.has_listing("yahoo_stock") and not reloaded.is_stale
+
+def test_failed_b3_listing_keeps_the_seed_and_stays_stale(tmp_path, monkeypatch, listings):
+    def unavailable():
+        raise ConnectionError("sem rede")
+
+    monkeypatch.setattr(providers, "fetch_stock_symbols", unavailable)
+    catalog = SymbolCatalog(str(tmp_path / "symbols.json"))
+    catalog.refresh()
+    assert catalog.has_listing("coingecko") and not catalog.has_listing("yahoo_stock")
+    assert catalog.lookup("yahoo_stock", B3_TICKERS[0][0]) is not None
+    # Tentada de novo na próxima atualização, sem esperar o intervalo normal
+    assert catalog.is_stale
+
+    monkeypatch.setattr(providers, "fetch_crypto_symbols", unavailable)
+    with pytest.raises(ConnectionError):
+        catalog.refresh()
+
+def test_index_saved_before_the_b3_listing_is_refreshed(tmp_path, listings):
+    path = tmp_path / "symbols.json"
+    path.write_text(json.dumps({'updated_at': 4102444800, 'learned': [],
+                                'entries': [["coingecko", "bitcoin", "BTC", "Bitcoin"]]}), encoding='utf-8')
+    catalog = SymbolCatalog(str(path))
+    catalog.load()
+    assert catalog.has_listing("coingecko") and not catalog.has_listing("yahoo_stock")
+    assert catalog.is_stale
@@ -0,0 +1,64 @@
+"""Núcleo do Monitor de Ativos, independente do Streamlit.
+
+Reúne cotações em lote, cache, histórico persistente e análise da carteira.
+Os submódulos são importados sob demanda, de modo que `import ticker_tracker`
+(e a linha de comando) iniciam rápido; pandas e yfinance só são carregados
+quando usados.
+"""
+import importlib
+
+# Nome público -> submódulo que o define
+_EXPORTS = {
+    'CHART_PERIODS': 'config',
+    'CONFIG_FILE': 'config',
+    'load_user_assets': 'config',
+    'save_user_assets': 'config',
+    'AlertEngine': 'alerts',
+    'get_alert_engine': 'alerts',
+    'PriceCache': 'cache',
+    'get_price_cache': 'cache',
+    'price_cache_key': 'cache',
+    'FetchExecutor': 'executor',
+    'QuoteBoard': 'board',
+    'get_quote_board': 'board',
+    'CircuitBreaker': 'executor',
+    'CircuitOpenError': 'executor',
+    'get_fetch_executor': 'executor',
+    'get_prices_batch': 'pricing',
+    'get_portfolio_prices': 'pricing',
+    'HistoryStore': 'history',
+    'get_history_store': 'history',
+    'HoldingsStore': 'holdings',
+    'get_holdings_store': 'holdings',
+    'SymbolCatalog': 'symbols',
+    'get_symbol_catalog': 'symbols',
+    'IndicatorCache': 'indicators',
+    'get_indicator_cache': 'indicators',
+    'IntradayStore': 'intraday',
+    'MarketDataCache': 'marketdata',
+    'get_market_data_cache': 'marketdata',
+    'get_intraday_store': 'intraday',
+    'MetricsRegistry': 'metrics',
+    'get_metrics': 'metrics',
+    'AssetTracker': 'tracker',
+    'fetch_price_and_history': 'tracker',
+    'PriceSnapshot': 'refresher',
+    'QuoteRefresher': 'refresher',
+    'get_quote_refresher': 'refresher',
+    'build_holdings_frame': 'portfolio',
+    'compute_holdings_analytics': 'portfolio',
+    'calculate_category_totals': 'portfolio',
+    'get_portfolio_history': 'timeseries',
+    'RiskModel': 'risk',
+    'get_risk_model': 'risk',
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
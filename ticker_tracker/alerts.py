@@ -0,0 +1,343 @@
+"""Alertas de preço avaliados a cada nova foto de cotações, fora das páginas.
+
+Cada regra (preço absoluto, % sobre o preço de compra ou % no dia) vira um
+nível de preço do ativo. Os níveis ficam em listas ordenadas por ativo e
+direção: a cada cotação, uma busca binária entre o preço anterior e o novo
+encontra só as regras cruzadas, de modo que o custo por rodada depende das
+regras atravessadas, não do total cadastrado. Um alerta dispara uma vez e
+só é rearmado depois que o preço volta além de uma faixa de histerese.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from itertools import count
+
+import pandas as pd
+import requests
+
+from .cache import price_cache_key
+from .executor import get_fetch_executor
+from .holdings import ASSET_TYPES, get_holdings_store
+from .refresher import get_quote_refresher
+from .tracker import AssetTracker
+
+logger = logging.getLogger(__name__)
+
+# Tipos de regra -> descrição exibida
+ALERT_KINDS = {
+    "price": "Preço",
+    "purchase_pct": "% sobre o preço de compra",
+    "daily_pct": "% no dia",
+}
+ABOVE, BELOW = "above", "below"
+
+# Fração do nível que o preço precisa recuar para rearmar um alerta disparado
+ALERT_HYSTERESIS = 0.01
+# Intervalo máximo entre releituras das regras (ex.: referência diária que faltava)
+ALERT_REBUILD_SECONDS = 900
+# Dias de histórico diário sincronizados para achar o fechamento anterior
+ALERT_REFERENCE_DAYS = 10
+
+# Destinos padrão: arquivo de log e, se a variável existir, um webhook
+ALERT_LOG_FILE = "alerts.log"
+ALERT_WEBHOOK_ENV = "TICKER_TRACKER_ALERT_WEBHOOK"
+ALERT_WEBHOOK_TIMEOUT_SECONDS = 5
+# Alertas recentes mantidos para o aviso na página
+BANNER_SIZE = 50
+
+@dataclass(frozen=True)
+class Alert:
+    """Alerta disparado por uma regra."""
+    seq: int
+    rule_id: int
+    asset_type: str
+    identifier: str
+    display_name: str
+    kind: str
+    direction: str
+    threshold: float
+    level: float
+    price: float
+    fired_at: str
+
+    @property
+    def message(self):
+        side = "acima de" if self.direction == ABOVE else "abaixo de"
+        target = f"{self.level:,.2f}" if self.kind == "price" else f"{self.threshold:+.2f}% ({self.level:,.2f})"
+        return f"{self.display_name}: {self.price:,.2f} {side} {target} [{ALERT_KINDS[self.kind]}]"
+
+def trigger_level(kind, threshold, purchase_price=None, previous_close=None):
+    """Preço que dispara a regra, ou None se faltar a referência (preço de compra ou fechamento anterior)."""
+    if kind == "price":
+        return threshold
+    reference = purchase_price if kind == "purchase_pct" else previous_close
+    if not reference:
+        return None
+    return reference * (1 + threshold / 100)
+
+class ThresholdIndex:
+    """Níveis de disparo de um ativo, ordenados por direção.
+
+    Os níveis de rearme são os de disparo deslocados pela histerese, na
+    mesma ordem, então as duas buscas usam as mesmas listas de ids.
+    """
+
+    def __init__(self, levels, hysteresis=ALERT_HYSTERESIS):
+        above = sorted((level, rule_id) for rule_id, direction, level in levels if direction == ABOVE)
+        below = sorted((level, rule_id) for rule_id, direction, level in levels if direction == BELOW)
+        self.above_levels = [level for level, _ in above]
+        self.above_ids = [rule_id for _, rule_id in above]
+        self.above_rearm = [level * (1 - hysteresis) for level in self.above_levels]
+        self.below_levels = [level for level, _ in below]
+        self.below_ids = [rule_id for _, rule_id in below]
+        self.below_rearm = [level * (1 + hysteresis) for level in self.below_levels]
+
+    def crossed(self, previous, price):
+        """Ids (a disparar, a rearmar) cruzados entre `previous` e `price`.
+
+        Sem preço anterior, considera todas as regras cuja condição já vale.
+        """
+        if previous is None:
+            fire = self.above_ids[:bisect_right(self.above_levels, price)]
+            fire += self.below_ids[bisect_left(self.below_levels, price):]
+            rearm = self.above_ids[bisect_right(self.above_rearm, price):]
+            rearm += self.below_ids[:bisect_left(self.below_rearm, price)]
+        elif price > previous:
+            fire = self.above_ids[bisect_right(self.above_levels, previous):bisect_right(self.above_levels, price)]
+            rearm = self.below_ids[bisect_right(self.below_rearm, previous):bisect_right(self.below_rearm, price)]
+        elif price < previous:
+            fire = self.below_ids[bisect_left(self.below_levels, price):bisect_left(self.below_levels, previous)]
+            rearm = self.above_ids[bisect_left(self.above_rearm, price):bisect_left(self.above_rearm, previous)]
+        else:
+            fire, rearm = [], []
+        return fire, rearm
+
+# --- Destinos dos alertas ---
+class LogFileSink:
+    """Acrescenta cada alerta como uma linha JSON em um arquivo."""
+
+    def __init__(self, path=ALERT_LOG_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, alert):
+        line = json.dumps(asdict(alert) | {'message': alert.message}, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+class WebhookSink:
+    """Envia cada alerta por POST (JSON) para uma URL."""
+
+    def __init__(self, url, timeout=ALERT_WEBHOOK_TIMEOUT_SECONDS):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, alert):
+        requests.post(self.url, json=asdict(alert) | {'message': alert.message},
+                      timeout=self.timeout).raise_for_status()
+
+class BannerSink:
+    """Mantém os alertas recentes em memória para o aviso exibido nas páginas."""
+
+    def __init__(self, size=BANNER_SIZE):
+        self._alerts = deque(maxlen=size)
+
+    def emit(self, alert):
+        self._alerts.append(alert)
+
+    def recent(self, after_seq=0):
+        """Alertas com número de sequência maior que `after_seq`, do mais antigo ao mais novo."""
+        return [alert for alert in list(self._alerts) if alert.seq > after_seq]
+
+class AlertEngine:
+    """Avalia as regras de alerta a cada foto de cotações, em uma thread própria.
+
+    `submit` só guarda a foto mais recente e acorda a thread, então quem
+    publica as cotações não espera pela avaliação nem pelos destinos.
+    """
+
+    def __init__(self, store=None, sinks=(), hysteresis=ALERT_HYSTERESIS):
+        self.store = store
+        self.sinks = list(sinks)
+        self.hysteresis = hysteresis
+        self._seq = count(1)
+        self._rules = {}        # id -> regra (dicionário de `HoldingsStore.alert_rules`) com `level`
+        self._indexes = {}      # chave de preço -> ThresholdIndex
+        self._fired = set()
+        self._unchecked = set()  # regras novas: conferidas contra o preço atual na próxima rodada
+        self._last_prices = {}
+        self._built = (None, None, 0.0)  # (versão da carteira, dia, instante)
+        self._lock = threading.Lock()
+        self._pending = None
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="alert-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot):
+        """Agenda a avaliação de uma foto de cotações (descarta a anterior, se ainda pendente)."""
+        self._pending = snapshot
+        self._wakeup.set()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            snapshot, self._pending = self._pending, None
+            if snapshot is None:
+                continue
+            try:
+                self.evaluate(snapshot.prices)
+            except Exception:
+                logger.exception("Falha ao avaliar alertas")
+
+    def add_rule(self, asset_type, identifier, kind, direction, threshold):
+        """Valida e grava uma regra; ela é conferida na próxima foto de cotações."""
+        if kind not in ALERT_KINDS:
+            raise ValueError(f"Tipo de alerta inválido: {kind!r}.")
+        if direction not in (ABOVE, BELOW):
+            raise ValueError(f"Direção inválida: {direction!r} (use '{ABOVE}' ou '{BELOW}').")
+        if kind == "price" and not threshold > 0:
+            raise ValueError("O preço do alerta deve ser maior que zero.")
+        return (self.store or get_holdings_store()).add_alert_rule(asset_type, identifier, kind, direction, threshold)
+
+    @staticmethod
+    def _previous_closes(assets, today):
+        """{chave de preço: último fechamento diário anterior a hoje, ou None}.
+
+        `assets` é {chave de preço: (api, identificador)}. O histórico de cada
+        ativo é sincronizado pelo pool (só baixa o que falta ou ficou velho),
+        então ativos nunca abertos no gráfico também ganham a referência.
+        """
+        executor = get_fetch_executor()
+        trackers = {key: AssetTracker(api_choice, identifier, identifier)
+                    for key, (api_choice, identifier) in assets.items()}
+        futures = {key: executor.submit(tracker.get_historical_data, ALERT_REFERENCE_DAYS)
+                   for key, tracker in trackers.items()}
+        references = {}
+        for key, future in futures.items():
+            closes = future.result()
+            if not closes.empty:
+                closes = closes[closes.index < pd.Timestamp(today)]
+            references[key] = float(closes.iloc[-1]) if not closes.empty else None
+            for message in trackers[key].errors:
+                logger.warning("Alertas: %s", message)
+        return references
+
+    def _sync_rules(self, store):
+        """Relê as regras quando a carteira muda, o dia vira ou a última leitura ficou velha."""
+        version, today = store.version(), date.today()
+        built_version, built_day, built_at = self._built
+        if (version, today) == (built_version, built_day) and time.time() - built_at < ALERT_REBUILD_SECONDS:
+            return
+
+        rules = {rule['id']: rule for rule in store.alert_rules()}
+        daily_assets = {}
+        for rule in rules.values():
+            api_choice = ASSET_TYPES[rule['asset_type']][2]
+            rule['price_key'] = price_cache_key(api_choice, rule['identifier'])
+            if rule['kind'] == "daily_pct":
+                daily_assets[rule['price_key']] = (api_choice, rule['identifier'])
+        references = self._previous_closes(daily_assets, today)
+        levels = {}
+        for rule in rules.values():
+            key = rule['price_key']
+            rule['level'] = trigger_level(rule['kind'], rule['threshold'], rule['purchase_price'], references.get(key))
+            if rule['level'] is not None:
+                levels.setdefault(key, []).append((rule['id'], rule['direction'], rule['level']))
+
+        fired = {rule_id for rule_id, rule in rules.items() if rule['fired_at']}
+        rearmed = []
+        if built_day is not None and today != built_day:
+            # Alertas de variação diária valem para um pregão: rearmam na virada do dia
+            rearmed = [rule_id for rule_id in fired if rules[rule_id]['kind'] == "daily_pct"]
+            fired.difference_update(rearmed)
+        with self._lock:
+            if built_version is not None:
+                self._unchecked |= rules.keys() - self._rules.keys()
+            self._unchecked &= rules.keys()
+            self._rules, self._fired = rules, fired
+            self._indexes = {key: ThresholdIndex(entries, self.hysteresis) for key, entries in levels.items()}
+            self._built = (version, today, time.time())
+        if rearmed:
+            store.set_alert_states([], rearmed, None)
+
+    def evaluate(self, prices):
+        """Confere as regras contra novos preços ({chave de preço: preço}) e retorna os alertas disparados."""
+        store = self.store or get_holdings_store()
+        self._sync_rules(store)
+        fired_at = datetime.now().isoformat(timespec='seconds')
+        alerts, rearmed = [], []
+        with self._lock:
+            # Regras novas: a condição já pode valer antes de qualquer cruzamento
+            for rule_id in list(self._unchecked):
+                rule = self._rules[rule_id]
+                price = prices.get(rule['price_key'], self._last_prices.get(rule['price_key']))
+                if price is None or rule['level'] is None:
+                    continue
+                self._unchecked.discard(rule_id)
+                above = rule['direction'] == ABOVE
+                if (price >= rule['level'] if above else price <= rule['level']) and rule_id not in self._fired:
+                    self._fired.add(rule_id)
+                    alerts.append(self._alert(rule, price, fired_at))
+
+            for key, index in self._indexes.items():
+                price = prices.get(key)
+                if price is None:
+                    continue
+                previous = self._last_prices.get(key)
+                self._last_prices[key] = price
+                fire, rearm = index.crossed(previous, price)
+                for rule_id in fire:
+                    if rule_id not in self._fired:
+                        self._fired.add(rule_id)
+                        alerts.append(self._alert(self._rules[rule_id], price, fired_at))
+                for rule_id in rearm:
+                    if rule_id in self._fired:
+                        self._fired.discard(rule_id)
+                        rearmed.append(rule_id)
+
+        if alerts or rearmed:
+            store.set_alert_states([alert.rule_id for alert in alerts], rearmed, fired_at)
+        for alert in alerts:
+            for sink in self.sinks:
+                try:
+                    sink.emit(alert)
+                except Exception:
+                    logger.exception("Falha ao enviar alerta para %s", type(sink).__name__)
+        return alerts
+
+    def _alert(self, rule, price, fired_at):
+        return Alert(next(self._seq), rule['id'], rule['asset_type'], rule['identifier'], rule['display_name'],
+                     rule['kind'], rule['direction'], rule['threshold'], rule['level'], price, fired_at)
+
+    def unarmed_rules(self):
+        """Ids das regras sem nível de disparo (falta o preço de compra ou o fechamento anterior)."""
+        with self._lock:
+            return {rule_id for rule_id, rule in self._rules.items() if rule['level'] is None}
+
+    def banner(self):
+        """Destino de avisos na página, se configurado."""
+        return next((sink for sink in self.sinks if isinstance(sink, BannerSink)), None)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_alert_engine():
+    """Motor de alertas do processo, assinando as fotos do atualizador de cotações."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                sinks = [BannerSink(), LogFileSink()]
+                if os.environ.get(ALERT_WEBHOOK_ENV):
+                    sinks.append(WebhookSink(os.environ[ALERT_WEBHOOK_ENV]))
+                engine = AlertEngine(sinks=sinks)
+                get_quote_refresher().subscribe(engine.submit)
+                _engine = engine
+    return _engine
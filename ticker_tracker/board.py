@@ -0,0 +1,216 @@
+"""Quadro de cotações compartilhado entre os processos do app na mesma máquina.
+
+Várias réplicas do servidor Streamlit leem e gravam o mesmo arquivo SQLite
+(modo WAL): a última cotação de cada ativo, com o instante em que foi
+obtida, e as reservas ("leases") de quem está buscando cada chave agora.
+Só o processo que reserva uma chave vai ao provedor; os demais aguardam a
+reserva ser liberada e leem o resultado no quadro. Os históricos já ficam
+em um SQLite compartilhado (`history.py`); as reservas também evitam que
+duas réplicas baixem o mesmo histórico ao mesmo tempo.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+# Banco SQLite compartilhado pelos processos
+QUOTE_BOARD_DB_FILE = "quote_board.db"
+
+# Validade de uma reserva (segundos): cobre uma busca com todas as novas tentativas;
+# a reserva de um processo que morreu expira sozinha
+QUOTE_BOARD_LEASE_SECONDS = 60
+# Intervalo entre consultas de quem aguarda a reserva de outro processo (segundos)
+QUOTE_BOARD_POLL_SECONDS = 0.05
+
+# Chaves por comando SQL (limite de parâmetros do SQLite)
+_SQL_BATCH_SIZE = 500
+
+def _batches(keys):
+    keys = list(keys)
+    for start in range(0, len(keys), _SQL_BATCH_SIZE):
+        yield keys[start:start + _SQL_BATCH_SIZE]
+
+class QuoteBoard:
+    """Cotações e reservas de busca em SQLite, compartilhadas entre processos.
+
+    Gravações são transações atômicas: um leitor vê o lote anterior ou o
+    novo, nunca metade. Cada processo se identifica por `owner`.
+    """
+
+    def __init__(self, path=QUOTE_BOARD_DB_FILE, lease_seconds=QUOTE_BOARD_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # A reserva é do processo: threads dele se revezam por um lock local por chave
+        self._local_locks = {}  # chave -> [Lock, usuários]
+        self._local_locks_lock = threading.Lock()
+        self._local = threading.local()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quotes ("
+                " key TEXT PRIMARY KEY,"
+                " price REAL NOT NULL,"
+                " fetched_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " key TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " expires_at REAL NOT NULL) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        # O quadro é um cache: sem fsync a cada transação (WAL continua consistente após uma queda)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self):
+        """Conexão da thread atual, aberta na primeira consulta e reaproveitada.
+
+        Cada busca de cotação passa pelo quadro; abrir uma conexão custaria
+        mais que a própria transação.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # --- Cotações ---
+    def get_many(self, keys, max_age=None):
+        """Cotações {chave: (preço, fetched_at)}, opcionalmente só as mais novas que `max_age` segundos."""
+        since = time.time() - max_age if max_age is not None else 0.0
+        quotes = {}
+        conn = self._connection()
+        for batch in _batches(keys):
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, price, fetched_at FROM quotes WHERE key IN ({placeholders}) AND fetched_at >= ?",
+                (*batch, since)
+            ).fetchall()
+            quotes.update((key, (price, fetched_at)) for key, price, fetched_at in rows)
+        return quotes
+
+    def put_many(self, prices, fetched_at=None, release=()):
+        """Grava {chave: preço} e libera as reservas `release` em uma transação.
+
+        Cotações mais novas já gravadas por outro processo são mantidas.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO quotes (key, price, fetched_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET price = excluded.price, fetched_at = excluded.fetched_at"
+                " WHERE excluded.fetched_at >= quotes.fetched_at",
+                [(key, float(price), fetched_at) for key, price in prices.items()]
+            )
+            self._release(conn, release)
+
+    # --- Reservas ---
+    def acquire(self, keys):
+        """Reserva as chaves livres (ou vencidas) para este processo e retorna o conjunto reservado."""
+        keys = list(keys)
+        if not keys:
+            return set()
+        now = time.time()
+        acquired = set()
+        with self._connection() as conn:
+            # Transação de escrita desde o início: dois processos não reservam a mesma chave
+            conn.execute("BEGIN IMMEDIATE")
+            for batch in _batches(keys):
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(f"DELETE FROM leases WHERE key IN ({placeholders}) AND expires_at < ?", (*batch, now))
+                conn.executemany("INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                                 [(key, self.owner, now + self.lease_seconds) for key in batch])
+                acquired.update(key for (key,) in conn.execute(
+                    f"SELECT key FROM leases WHERE key IN ({placeholders}) AND owner = ?", (*batch, self.owner)))
+        return acquired
+
+    def release(self, keys):
+        """Libera as reservas deste processo."""
+        with self._connection() as conn:
+            self._release(conn, keys)
+
+    def _release(self, conn, keys):
+        for batch in _batches(keys):
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(f"DELETE FROM leases WHERE key IN ({placeholders}) AND owner = ?", (*batch, self.owner))
+
+    def wait_released(self, keys, timeout):
+        """Aguarda outros processos liberarem (ou deixarem vencer) as reservas; False se o prazo acabar."""
+        deadline = time.monotonic() + timeout
+        pending = list(keys)
+        conn = self._connection()
+        while pending:
+            now = time.time()
+            held = set()
+            for batch in _batches(pending):
+                placeholders = ",".join("?" * len(batch))
+                held.update(key for (key,) in conn.execute(
+                    f"SELECT key FROM leases WHERE key IN ({placeholders}) AND owner != ? AND expires_at >= ?",
+                    (*batch, self.owner, now)))
+            pending = [key for key in pending if key in held]
+            if not pending:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(QUOTE_BOARD_POLL_SECONDS)
+        return True
+
+    def _local_lock(self, key, delta):
+        """Lock local de `key`, contando quem o usa (removido quando ninguém mais usa)."""
+        with self._local_locks_lock:
+            entry = self._local_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += delta
+            if not entry[1]:
+                del self._local_locks[key]
+            return entry[0]
+
+    @contextmanager
+    def exclusive(self, key, timeout=None):
+        """Executa o bloco com a reserva de `key`, esperando outra thread ou processo que a tenha.
+
+        A espera total é limitada a `timeout` segundos (padrão: a validade de
+        uma reserva, dentro da qual a de um processo que morreu vence); se
+        passar disso, levanta TimeoutError sem executar o bloco.
+        """
+        deadline = time.monotonic() + (self.lease_seconds if timeout is None else timeout)
+        lock = self._local_lock(key, 1)
+        try:
+            if not lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise TimeoutError(f"Reserva de {key} em uso por outra thread")
+            try:
+                while not self.acquire([key]):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.wait_released([key], remaining):
+                        raise TimeoutError(f"Reserva de {key} em uso por outro processo")
+                try:
+                    yield
+                finally:
+                    self.release([key])
+            finally:
+                lock.release()
+        finally:
+            self._local_lock(key, -1)
+
+_board = None
+_board_lock = threading.Lock()
+
+def get_quote_board():
+    """Quadro de cotações do processo (aberto sob demanda)."""
+    global _board
+    if _board is None:
+        with _board_lock:
+            if _board is None:
+                _board = QuoteBoard()
+    return _board
+
+def set_quote_board(board):
+    """Substitui o quadro de cotações do processo (ex.: outro arquivo)."""
+    global _board
+    with _board_lock:
+        _board = board
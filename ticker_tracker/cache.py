@@ -0,0 +1,140 @@
+"""Cache de preços em memória compartilhado por todo o processo.
+
+Além das cotações válidas (com TTL), guarda a última cotação obtida de cada
+ativo e o instante em que chegou, para servi-la, marcada como desatualizada,
+quando o provedor falha ou demora.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import get_metrics
+
+# Validade das cotações por classe de ativo (segundos)
+CACHE_TTL_SECONDS = {
+    "coingecko": 60,
+    "yahoo_stock": 300,
+}
+DEFAULT_CACHE_TTL_SECONDS = 300
+
+# Número máximo de cotações mantidas em memória (padrão com folga para carteiras de 10.000 ativos)
+PRICE_CACHE_SIZE_ENV = "TICKER_TRACKER_PRICE_CACHE_SIZE"
+DEFAULT_PRICE_CACHE_SIZE = 20000
+
+# Por quanto tempo a última cotação conhecida ainda pode ser servida (segundos)
+LAST_KNOWN_PRICE_TTL_SECONDS = 7 * 24 * 3600
+# Capacidade das últimas cotações conhecidas, em múltiplos do cache de cotações
+LAST_KNOWN_PRICE_SIZE_FACTOR = 5
+
+def price_cache_max_size():
+    """Capacidade do cache de cotações: `TICKER_TRACKER_PRICE_CACHE_SIZE` ou o padrão."""
+    return int(os.environ.get(PRICE_CACHE_SIZE_ENV, DEFAULT_PRICE_CACHE_SIZE))
+
+def price_cache_key(api_choice, identifier):
+    """Monta a chave de cache/preço de um ativo."""
+    return f"{api_choice}_{identifier}"
+
+class PriceCache:
+    """Cache LRU thread-safe com validade (TTL) individual por entrada."""
+
+    def __init__(self, max_size=None):
+        self.max_size = price_cache_max_size() if max_size is None else max_size
+        self._entries = OrderedDict()  # chave -> (valor, inserido_em, ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Retorna o valor se presente e dentro da validade; caso contrário None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, inserted_at, ttl = entry
+            if time.monotonic() - inserted_at >= ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Como `get`, mas sem alterar contadores nem a ordem do LRU."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= entry[2]:
+                return None
+            return entry[0]
+
+    def set(self, key, value, ttl=DEFAULT_CACHE_TTL_SECONDS):
+        """Armazena um valor com seu próprio instante de inserção."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic(), ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Remove uma entrada específica do cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Esvazia o cache (os contadores são mantidos)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Retorna tamanho, contadores e idade da entrada mais antiga."""
+        with self._lock:
+            now = time.monotonic()
+            oldest_age = max((now - inserted_at for _, inserted_at, _ in self._entries.values()), default=0)
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'oldest_age': oldest_age,
+            }
+
+_price_cache = PriceCache()
+get_metrics().register_cache("prices", _price_cache)
+# chave -> (preço, time.time() da cotação)
+_last_known_prices = PriceCache(max_size=_price_cache.max_size * LAST_KNOWN_PRICE_SIZE_FACTOR)
+get_metrics().register_cache("last_known_prices", _last_known_prices)
+
+def get_price_cache():
+    """Cache de preços único para o processo (compartilhado entre sessões)."""
+    return _price_cache
+
+def get_cached_price(cache_key):
+    """Obtém preço do cache se válido."""
+    return _price_cache.get(cache_key)
+
+def set_cached_price(cache_key, price, api_choice=None, age=0.0):
+    """Armazena preço no cache com o TTL da classe do ativo.
+
+    `age` é a idade da cotação quando ela já vem de outro processo (quadro
+    compartilhado); a validade restante é descontada dela.
+    """
+    ttl = CACHE_TTL_SECONDS.get(api_choice, DEFAULT_CACHE_TTL_SECONDS)
+    _price_cache.set(cache_key, price, ttl - age)
+    _last_known_prices.set(cache_key, (price, time.time() - age), LAST_KNOWN_PRICE_TTL_SECONDS)
+
+def get_last_known_price(cache_key):
+    """Última cotação obtida do ativo, mesmo vencida, como (preço, idade em segundos) ou None."""
+    entry = _last_known_prices.get(cache_key)
+    if entry is None:
+        return None
+    price, fetched_at = entry
+    return price, time.time() - fetched_at
@@ -0,0 +1,89 @@
+"""Preparação de gráficos: redução de pontos no servidor e figuras Plotly.
+
+O Plotly só é importado quando uma figura é de fato construída.
+"""
+import numpy as np
+import pandas as pd
+
+# Pontos enviados ao navegador por gráfico (~2 por pixel de um gráfico largo)
+CHART_TARGET_POINTS = 2000
+
+# Acima deste número de pontos (antes da redução) o traço usa WebGL
+WEBGL_POINT_THRESHOLD = 1000
+
+# Estimativa de memória de uma figura além dos arrays dos traços (layout, objetos Plotly)
+FIGURE_OVERHEAD_BYTES = 32 * 1024
+
+def lttb_indices(x, y, threshold):
+    """Índices selecionados pelo algoritmo Largest-Triangle-Three-Buckets.
+
+    Mantém o primeiro e o último ponto e, em cada balde intermediário, o
+    ponto que forma o maior triângulo com o ponto anterior escolhido e a
+    média do balde seguinte, preservando picos e vales da série.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def downsample_for_chart(data, target_points=CHART_TARGET_POINTS):
+    """Reduz uma Series/DataFrame indexado por data para no máximo `target_points`.
+
+    Em DataFrames, os pontos são escolhidos pela primeira coluna.
+    """
+    if len(data) <= target_points:
+        return data
+    values = data if isinstance(data, pd.Series) else data.iloc[:, 0]
+    x = data.index.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    y = values.to_numpy(dtype=np.float64)
+    return data.iloc[lttb_indices(x, y, target_points)]
+
+def line_figure(data, title, labels):
+    """Gráfico de linha de uma Series/DataFrame, reduzido no servidor.
+
+    Séries longas passam por LTTB e, acima de `WEBGL_POINT_THRESHOLD`
+    pontos, o traço é desenhado com WebGL.
+    """
+    import plotly.express as px
+
+    render_mode = "webgl" if len(data) > WEBGL_POINT_THRESHOLD else "svg"
+    data = downsample_for_chart(data.dropna() if isinstance(data, pd.Series) else data)
+    y = data.values if isinstance(data, pd.Series) else list(data.columns)
+    fig = px.line(data, x=data.index, y=y, title=title, labels=labels, render_mode=render_mode)
+    fig.update_layout(hovermode="x unified")
+    return fig
+
+def figure_nbytes(fig):
+    """Estimativa dos bytes de uma figura: arrays x/y dos traços mais o layout."""
+    total = FIGURE_OVERHEAD_BYTES
+    for trace in fig.data:
+        for values in (trace.x, trace.y):
+            if values is not None:
+                values = np.asarray(values)
+                # Objetos Python (ex.: rótulos) contam como um ponteiro mais um float
+                total += values.nbytes if values.dtype != object else values.size * 32
+    return total
+
+def series_signature(data):
+    """Identifica o conteúdo de uma série pelo tamanho e pela última barra."""
+    if data.empty:
+        return (0,)
+    last = data.iloc[-1]
+    return (len(data), data.index[-1], tuple(last) if isinstance(last, pd.Series) else last)
@@ -0,0 +1,206 @@
+"""Linha de comando para avaliar carteiras sem iniciar o Streamlit.
+
+Exemplo::
+
+    python -m ticker_tracker value carteira_a.json carteira_b.json --format csv
+    python -m ticker_tracker export -o assets_config.json
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+# Só constantes no topo: pandas e os provedores são importados pelos comandos que os usam
+from .config import CONFIG_FILE, DEFAULT_REPORTING_CURRENCY, HOLDINGS_DB_FILE, REPORTING_CURRENCIES
+
+# Colunas exportadas por posição
+HOLDING_COLUMNS = [
+    'identifier', 'api_choice', 'display_name', 'category', 'purchase_date', 'quantity',
+    'purchase_price', 'current_price', 'priced', 'quote_age', 'invested', 'current_value',
+    'profit_loss', 'variation', 'weight', 'realized_pnl', 'realized_pnl_fifo', 'unrealized_pnl_fifo',
+]
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ticker_tracker",
+                                     description="Ferramentas de linha de comando do Monitor de Ativos.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    value = subparsers.add_parser("value", help="Avalia uma ou mais carteiras com uma única rodada de cotações.")
+    value.add_argument("configs", nargs="*", metavar="CONFIG",
+                       help=f"Arquivos de carteira no formato de {CONFIG_FILE} (padrão: a carteira em {HOLDINGS_DB_FILE}).")
+    value.add_argument("--format", choices=("json", "csv"), default="json", help="Formato de saída.")
+    value.add_argument("--currency", choices=REPORTING_CURRENCIES, default=DEFAULT_REPORTING_CURRENCY,
+                       help=f"Moeda de referência dos valores (padrão: {DEFAULT_REPORTING_CURRENCY}).")
+    value.add_argument("-o", "--output", help="Arquivo de saída (padrão: saída padrão).")
+    value.add_argument("--strict", action="store_true",
+                       help="Termina com código 1 se algum ativo ficar sem cotação.")
+
+    export = subparsers.add_parser("export", help=f"Exporta a carteira de {HOLDINGS_DB_FILE} em JSON.")
+    export.add_argument("-o", "--output", help="Arquivo de saída (padrão: saída padrão).")
+
+    import_ = subparsers.add_parser("import", help=f"Substitui a carteira de {HOLDINGS_DB_FILE} por um arquivo JSON.")
+    import_.add_argument("config", metavar="CONFIG", help=f"Arquivo de carteira no formato de {CONFIG_FILE}.")
+    return parser
+
+def value_portfolios(portfolios, reporting_currency=DEFAULT_REPORTING_CURRENCY):
+    """Avalia as carteiras [(rótulo, ativos)] buscando todas as cotações em um único lote.
+
+    As taxas de câmbio para `reporting_currency` entram no mesmo lote.
+    Retorna ([(rótulo, posições, totais_por_categoria)], erros).
+    """
+    from .fx import fx_assets, rates_from_prices
+    from .portfolio import build_holdings_frame, compute_holdings_analytics
+    from .pricing import get_prices_batch
+
+    frames = [(label, build_holdings_frame(assets)) for label, assets in portfolios]
+    assets_to_price = []
+    currencies = set()
+    for _, frame in frames:
+        assets_to_price.extend(zip(frame['api_choice'].astype(str), frame['identifier']))
+        currencies.update(frame['currency'].astype(object))
+    assets_to_price.extend(fx_assets(currencies, reporting_currency))
+
+    errors, stale = [], {}
+    prices = get_prices_batch(assets_to_price, errors, stale=stale)
+    fx_rates = rates_from_prices(prices, currencies, reporting_currency, errors)
+
+    results = []
+    for path, frame in frames:
+        holdings, by_category = compute_holdings_analytics(frame, prices, fx_rates, stale)
+        results.append((path, holdings, by_category))
+    return results, errors
+
+def _holding_records(holdings):
+    records = holdings[HOLDING_COLUMNS].astype({'api_choice': str, 'category': str, 'quote_age': object})
+    # Cotação atual: sem idade (null no JSON, vazio no CSV)
+    records['quote_age'] = records['quote_age'].where(records['quote_age'].notna(), None)
+    return records.to_dict('records')
+
+def _portfolio_summary(path, holdings, by_category):
+    total_invested = float(holdings['invested'].sum())
+    total_current = float(holdings['current_value'].sum())
+    profit_loss = total_current - total_invested
+    categories = by_category.reset_index().astype({'category': str})
+    return {
+        'config': path,
+        'asset_count': len(holdings),
+        'unpriced_count': int((~holdings['priced']).sum()),
+        'stale_count': int(holdings['quote_age'].notna().sum()),
+        'total_invested': total_invested,
+        'total_current': total_current,
+        'profit_loss': profit_loss,
+        'profit_loss_pct': (profit_loss / total_invested * 100) if total_invested > 0 else 0,
+        'realized_pnl': float(holdings['realized_pnl'].sum()),
+        'realized_pnl_fifo': float(holdings['realized_pnl_fifo'].sum()),
+        'categories': categories.to_dict('records'),
+        'holdings': _holding_records(holdings),
+    }
+
+def write_json(results, errors, out, currency=DEFAULT_REPORTING_CURRENCY):
+    payload = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'currency': currency,
+        'portfolios': [_portfolio_summary(path, holdings, by_category) for path, holdings, by_category in results],
+        'errors': errors,
+    }
+    json.dump(payload, out, indent=2, ensure_ascii=False, default=str)
+    out.write("\n")
+
+def write_csv(results, out):
+    writer = csv.DictWriter(out, fieldnames=['config'] + HOLDING_COLUMNS)
+    writer.writeheader()
+    for path, holdings, _ in results:
+        for record in _holding_records(holdings):
+            writer.writerow({'config': path, **record})
+
+def load_config(path):
+    """Lê uma carteira em JSON; erros de leitura ou de formato são propagados.
+
+    Ao contrário do app, a linha de comando nunca troca um arquivo inválido
+    pela carteira padrão.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        assets = json.load(f)
+    if not isinstance(assets, dict):
+        raise ValueError("esperado um objeto com as listas 'stocks' e 'cryptos'")
+    return assets
+
+def cmd_value(args):
+    from .holdings import get_holdings_store
+
+    missing = [path for path in args.configs if not os.path.exists(path)]
+    if missing:
+        for path in missing:
+            print(f"Arquivo de carteira não encontrado: {path}", file=sys.stderr)
+        return 2
+
+    if args.configs:
+        portfolios, invalid = [], False
+        for path in args.configs:
+            try:
+                portfolios.append((path, load_config(path)))
+            except (OSError, ValueError) as e:
+                print(f"Arquivo de carteira inválido: {path} ({e})", file=sys.stderr)
+                invalid = True
+        if invalid:
+            return 2
+    else:
+        portfolios = [(HOLDINGS_DB_FILE, get_holdings_store().load_assets())]
+    results, errors = value_portfolios(portfolios, args.currency)
+    for message in errors:
+        print(message, file=sys.stderr)
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            write_csv(results, out)
+        else:
+            write_json(results, errors, out, args.currency)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    stale = sum(int(holdings['quote_age'].notna().sum()) for _, holdings, _ in results)
+    if stale:
+        print(f"{stale} ativo(s) avaliados pela última cotação conhecida (provedor indisponível).", file=sys.stderr)
+    unpriced = sum(int((~holdings['priced']).sum()) for _, holdings, _ in results)
+    if unpriced:
+        print(f"{unpriced} ativo(s) sem cotação avaliados pelo preço de compra.", file=sys.stderr)
+    return 1 if args.strict and unpriced else 0
+
+def cmd_export(args):
+    from .holdings import get_holdings_store
+
+    store = get_holdings_store()
+    if args.output:
+        store.export_json(args.output)
+    else:
+        sys.stdout.write(store.to_json() + "\n")
+    return 0
+
+def cmd_import(args):
+    from .holdings import get_holdings_store
+
+    if not os.path.exists(args.config):
+        print(f"Arquivo de carteira não encontrado: {args.config}", file=sys.stderr)
+        return 2
+    store = get_holdings_store()
+    try:
+        store.import_json(args.config)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Arquivo de carteira inválido: {args.config} ({e})", file=sys.stderr)
+        return 2
+    print(f"{store.count()} ativo(s) importado(s) para {HOLDINGS_DB_FILE}.", file=sys.stderr)
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "value":
+        return cmd_value(args)
+    if args.command == "export":
+        return cmd_export(args)
+    if args.command == "import":
+        return cmd_import(args)
+    return 0
@@ -0,0 +1,55 @@
+"""Configurações e persistência da carteira em `assets_config.json`."""
+import copy
+import json
+import os
+
+# Períodos disponíveis para gráfico
+CHART_PERIODS = {
+    "30 dias": 30,
+    "60 dias": 60,
+    "90 dias": 90,
+    "6 meses": 180,
+    "1 ano": 365,
+    "2 anos": 730,
+    "3 anos": 1095,
+    "5 anos": 1825,
+    "Máximo": "max"
+}
+
+# Arquivo para salvar configurações
+CONFIG_FILE = "assets_config.json"
+# Banco SQLite da carteira
+HOLDINGS_DB_FILE = "holdings.db"
+
+# Moedas oferecidas como referência para os totais (fora de `fx`: a linha de comando não importa o pandas)
+REPORTING_CURRENCIES = ("USD", "BRL", "EUR")
+DEFAULT_REPORTING_CURRENCY = "USD"
+
+# Carteira usada quando o arquivo de configuração não existe ou é inválido
+DEFAULT_ASSETS = {
+    "stocks": [
+        {"ticker": "PETR4.SA", "display_name": "Petrobras", "purchase_date": "2023-01-15", "quantity": 100, "purchase_price": 25.00},
+        {"ticker": "ITSA4.SA", "display_name": "Itausa", "purchase_date": "2024-03-01", "quantity": 200, "purchase_price": 9.50},
+    ],
+    "cryptos": [
+        {"id": "bitcoin", "display_name": "Bitcoin", "symbol": "BTC", "purchase_date": "2022-06-20", "quantity": 0.05, "purchase_price": 20000.00},
+        {"id": "ethereum", "display_name": "Ethereum", "symbol": "ETH", "purchase_date": "2023-11-10", "quantity": 0.5, "purchase_price": 2000.00},
+    ]
+}
+
+def load_user_assets(path=CONFIG_FILE):
+    """Carrega ativos do arquivo de configuração."""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+    
+    # Retorna configuração padrão se arquivo não existir ou houver erro
+    return copy.deepcopy(DEFAULT_ASSETS)
+
+def save_user_assets(assets, path=CONFIG_FILE):
+    """Salva ativos no arquivo de configuração (erros de E/S são propagados)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(assets, f, indent=2, ensure_ascii=False)
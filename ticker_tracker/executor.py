@@ -0,0 +1,243 @@
+"""Execução concorrente de requisições com limites por provedor.
+
+Cada provedor tem um limitador (concorrência e taxa) e um disjuntor: depois
+de falhas seguidas, as chamadas falham na hora, sem esperar timeouts, até
+que uma chamada de teste (meio-aberto) volte a funcionar.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .metrics import get_metrics
+
+# Limites por provedor: requisições simultâneas e taxa sustentada (token bucket).
+# O plano gratuito da CoinGecko admite cerca de 30 chamadas por minuto.
+PROVIDER_LIMITS = {
+    "coingecko": {"max_concurrency": 2, "rate_per_minute": 25, "burst": 5},
+    "yahoo_stock": {"max_concurrency": 4, "rate_per_minute": 120, "burst": 10},
+}
+
+# Número de threads do executor de requisições
+FETCH_MAX_WORKERS = 8
+
+# Disjuntor por provedor: falhas seguidas até abrir e espera (dobrada a cada
+# teste que falha, até o máximo) antes da chamada de teste
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_SECONDS = 30
+CIRCUIT_MAX_RESET_SECONDS = 300
+
+# Estados do disjuntor (valor exportado no medidor `circuit_state`)
+CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN = "fechado", "meio-aberto", "aberto"
+_CIRCUIT_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o disjuntor do provedor está aberto."""
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} indisponível; nova tentativa em {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+class TokenBucket:
+    """Limitador de taxa: libera até `burst` chamadas e repõe `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver uma ficha disponível e a consome."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def _is_provider_failure(exc):
+    """Erros que indicam provedor fora do ar (não conta 4xx, exceto 429)."""
+    # Erros HTTP do requests e do curl_cffi (usado pelo yfinance) trazem a resposta;
+    # falhas de conexão do curl_cffi trazem uma resposta vazia com status 0
+    status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    if isinstance(status, int) and status >= 100:
+        return status == 429 or status >= 500
+    return isinstance(exc, Exception)
+
+class CircuitBreaker:
+    """Disjuntor de um provedor: fechado, aberto ou meio-aberto.
+
+    Fechado, conta falhas seguidas; ao atingir `failure_threshold`, abre e
+    recusa chamadas por `reset_seconds`. Depois disso, uma única chamada de
+    teste passa (meio-aberto): se der certo, fecha; se falhar, reabre com
+    o dobro da espera.
+    """
+
+    def __init__(self, name=None, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds=CIRCUIT_RESET_SECONDS, max_reset_seconds=CIRCUIT_MAX_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self._state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._cooldown = reset_seconds
+        self._probing = False
+        self._lock = threading.Lock()
+        get_metrics().set_gauge("circuit_state", 0, provider=name)
+
+    def _set_state(self, state):
+        self._state = state
+        get_metrics().set_gauge("circuit_state", _CIRCUIT_STATE_VALUES[state], provider=self.name)
+
+    def allow(self, claim=True):
+        """Libera a chamada ou levanta `CircuitOpenError`; retorna True se for a chamada de teste.
+
+        Com `claim=False` só confere, sem reservar a chamada de teste.
+        """
+        with self._lock:
+            if self._state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self._cooldown:
+                self._set_state(CIRCUIT_HALF_OPEN)
+            if self._state == CIRCUIT_CLOSED:
+                return False
+            if self._state == CIRCUIT_HALF_OPEN and not self._probing:
+                self._probing = claim
+                return claim
+            retry_in = max(0.0, self._cooldown - (time.monotonic() - self._opened_at))
+        get_metrics().inc("circuit_rejections_total", provider=self.name)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record(self, exc=None, probe=False):
+        """Registra o resultado de uma chamada liberada por `allow`."""
+        failed = exc is not None and _is_provider_failure(exc)
+        with self._lock:
+            if probe:
+                self._probing = False
+            if not failed:
+                self._failures = 0
+                if self._state != CIRCUIT_CLOSED:
+                    self._cooldown = self.reset_seconds
+                    self._set_state(CIRCUIT_CLOSED)
+                return
+            self._failures += 1
+            if probe or self._state == CIRCUIT_HALF_OPEN:
+                self._cooldown = min(self._cooldown * 2, self.max_reset_seconds)
+            elif self._state == CIRCUIT_OPEN or self._failures < self.failure_threshold:
+                return
+            self._opened_at = time.monotonic()
+            self._set_state(CIRCUIT_OPEN)
+
+    def stats(self):
+        """Estado, falhas seguidas e segundos até a próxima chamada de teste."""
+        with self._lock:
+            retry_in = 0.0
+            if self._state == CIRCUIT_OPEN:
+                retry_in = max(0.0, self._cooldown - (time.monotonic() - self._opened_at))
+            return {'state': self._state, 'failures': self._failures, 'retry_in': retry_in}
+
+class ProviderLimiter:
+    """Context manager que limita concorrência e taxa de chamadas a um provedor.
+
+    Passa também pelo disjuntor do provedor: com ele aberto, a entrada
+    levanta `CircuitOpenError` sem esperar pela vez nem pela taxa.
+    """
+
+    def __init__(self, max_concurrency, rate_per_minute, burst, name=None, breaker=None):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_minute, burst)
+        self._local = threading.local()
+
+    def __enter__(self):
+        self.breaker.allow(claim=False)
+        started = time.perf_counter()
+        self._semaphore.acquire()
+        try:
+            self._bucket.acquire()
+            # O disjuntor pode ter aberto enquanto a chamada esperava a sua vez
+            self._local.probe = self.breaker.allow()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        get_metrics().observe("limiter_wait_seconds", time.perf_counter() - started, provider=self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+        self.breaker.record(exc, self._local.probe)
+        return False
+
+class FetchExecutor:
+    """Pool de threads para requisições com limites por provedor."""
+
+    def __init__(self, limits=PROVIDER_LIMITS, max_workers=FETCH_MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._limiters = {provider: ProviderLimiter(name=provider, **config) for provider, config in limits.items()}
+        self._local = threading.local()
+
+    def limit(self, provider):
+        """Limitador a ser usado em volta de cada chamada de rede ao provedor."""
+        return self._limiters[provider]
+
+    def breakers(self):
+        """{provedor: CircuitBreaker} de todos os provedores."""
+        return {provider: limiter.breaker for provider, limiter in self._limiters.items()}
+
+    def submit(self, fn, *args, **kwargs):
+        """Agenda `fn` no pool e retorna um Future.
+
+        Chamadas feitas de dentro de uma tarefa do pool são executadas na
+        própria thread, evitando que tarefas aninhadas esgotem o pool.
+        """
+        if getattr(self._local, 'in_worker', False):
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._pool.submit(self._run, fn, args, kwargs)
+
+    def result(self, future, fn, *args, **kwargs):
+        """Resultado de uma tarefa enviada com `submit(fn, ...)`.
+
+        Se a tarefa ainda estiver na fila, é executada na thread de quem
+        chama; assim o resultado não depende de haver thread livre no pool
+        (threads do pool podem estar aguardando buscas coalescidas).
+        """
+        if future.cancel():
+            return fn(*args, **kwargs)
+        return future.result()
+
+    def _run(self, fn, args, kwargs):
+        self._local.in_worker = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._local.in_worker = False
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_fetch_executor():
+    """Executor de requisições compartilhado pelo processo (criado sob demanda)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = FetchExecutor()
+    return _executor
+
+def set_fetch_executor(executor):
+    """Substitui o executor do processo (ex.: limites próprios em benchmarks)."""
+    global _executor
+    with _executor_lock:
+        _executor = executor
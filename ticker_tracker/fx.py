@@ -0,0 +1,80 @@
+"""Moedas: moeda nativa de cada posição e câmbio em lote para a moeda de referência.
+
+Ações da B3 (`.SA`) são cotadas em BRL e a CoinGecko é consultada em USD.
+As taxas de câmbio são cotações do Yahoo (`BRLUSD=X`) obtidas pelo mesmo
+motor de cotações em lote, com cache e coalescência; os históricos de
+câmbio ficam no mesmo armazenamento dos históricos de preço. A conversão
+do frame de posições é feita em uma única operação vetorizada.
+"""
+import pandas as pd
+
+from .cache import price_cache_key
+from .pricing import get_prices_batch
+
+CURRENCY_SYMBOLS = {"USD": "$", "BRL": "R$", "EUR": "€"}
+
+# Sufixo do ticker no Yahoo -> moeda de negociação (demais tickers: USD)
+TICKER_SUFFIX_CURRENCIES = {".SA": "BRL"}
+YAHOO_DEFAULT_CURRENCY = "USD"
+# Moeda pedida à CoinGecko (`vs_currency`)
+COINGECKO_CURRENCY = "USD"
+
+# Provedor das taxas de câmbio (pares do Yahoo, ex.: BRLUSD=X)
+FX_API_CHOICE = "yahoo_stock"
+
+def native_currency(api_choice, identifier):
+    """Moeda em que o ativo é cotado pelo seu provedor."""
+    if api_choice == "coingecko":
+        return COINGECKO_CURRENCY
+    for suffix, currency in TICKER_SUFFIX_CURRENCIES.items():
+        if str(identifier).upper().endswith(suffix):
+            return currency
+    return YAHOO_DEFAULT_CURRENCY
+
+def native_currencies(api_choice, identifier):
+    """Versão vetorizada de `native_currency` para colunas de um frame."""
+    currency = pd.Series(YAHOO_DEFAULT_CURRENCY, index=identifier.index, dtype=object)
+    upper = identifier.astype(str).str.upper()
+    for suffix, suffix_currency in TICKER_SUFFIX_CURRENCIES.items():
+        currency = currency.mask(upper.str.endswith(suffix), suffix_currency)
+    return currency.mask(api_choice.astype(str) == "coingecko", COINGECKO_CURRENCY)
+
+def fx_ticker(source, target):
+    """Ticker do Yahoo com a cotação de 1 `source` em `target`."""
+    return f"{source}{target}=X"
+
+def currency_symbol(currency):
+    return CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+
+def format_money(value, currency, decimals=2):
+    """Valor monetário com o símbolo da moeda (ex.: R$1,234.56)."""
+    return f"{currency_symbol(currency)}{value:,.{decimals}f}"
+
+def fx_assets(currencies, reporting_currency):
+    """Pares (api_choice, ticker) das taxas necessárias, para incluir em um lote de cotações."""
+    return [(FX_API_CHOICE, fx_ticker(currency, reporting_currency))
+            for currency in sorted(set(currencies) - {reporting_currency})]
+
+def rates_from_prices(prices, currencies, reporting_currency, errors=None):
+    """Taxas {moeda: fator para a moeda de referência} a partir de um lote já cotado.
+
+    Moedas sem cotação de câmbio ficam fora do resultado (e geram uma
+    mensagem em `errors`, se fornecida).
+    """
+    rates = {reporting_currency: 1.0}
+    for currency in sorted(set(currencies) - {reporting_currency}):
+        rate = prices.get(price_cache_key(FX_API_CHOICE, fx_ticker(currency, reporting_currency)))
+        if rate:
+            rates[currency] = rate
+        elif errors is not None:
+            errors.append(f"Câmbio {currency}/{reporting_currency} indisponível; valores em {currency} não convertidos.")
+    return rates
+
+def get_fx_rates(currencies, reporting_currency, errors=None, use_cache=True, max_wait=None):
+    """Taxas {moeda: fator para a moeda de referência} com um único lote de cotações.
+
+    Com o provedor fora do ar (ou além de `max_wait`), usa as últimas taxas conhecidas.
+    """
+    pairs = fx_assets(currencies, reporting_currency)
+    prices = get_prices_batch(pairs, errors, use_cache, max_wait=max_wait) if pairs else {}
+    return rates_from_prices(prices, currencies, reporting_currency, errors)
@@ -0,0 +1,256 @@
+"""Histórico diário persistente em disco (SQLite), atualizado incrementalmente.
+
+As barras diárias também são agregadas em níveis semanal e mensal (OHLC dos
+fechamentos); cada gravação reagrega só os períodos que recebeu barras novas.
+As séries lidas ficam no cache compacto de dados de mercado (`marketdata.py`)
+até o ativo ser gravado de novo, por qualquer processo.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from .marketdata import get_market_data_cache
+
+# Banco SQLite com uma tabela de barras diárias por ativo
+HISTORY_DB_FILE = "history_cache.db"
+
+# Intervalo mínimo entre atualizações incrementais de um mesmo ativo (segundos)
+HISTORY_REFRESH_SECONDS = 900
+
+# Cobertura registrada quando o histórico completo ("Máximo") foi baixado
+FULL_HISTORY_START = "0001-01-01"
+
+# Níveis da pirâmide de histórico e dias corridos cobertos por barra
+HISTORY_LEVELS = {"daily": 1, "weekly": 7, "monthly": 30}
+# Barras mínimas para um gráfico parecer contínuo (escolha do nível mais grosso)
+HISTORY_LEVEL_MIN_BARS = 250
+
+def level_for_span(span_days):
+    """Nível mais grosso que ainda rende `HISTORY_LEVEL_MIN_BARS` barras no intervalo."""
+    level = "daily"
+    for name, days in HISTORY_LEVELS.items():
+        if span_days / days >= HISTORY_LEVEL_MIN_BARS:
+            level = name
+    return level
+
+# Início do período (segunda-feira ou dia 1º) de cada data, em SQL
+_PERIOD_START_SQL = {
+    "weekly": "date(date, '-6 days', 'weekday 1')",
+    "monthly": "substr(date, 1, 8) || '01'",
+}
+
+class HistoryStore:
+    """Armazena séries diárias de preço em SQLite, uma tabela por ativo.
+
+    A tabela `history_meta` registra, por ativo, desde quando o histórico foi
+    baixado (`coverage_start`), a última barra armazenada e o instante da
+    última atualização, permitindo buscar apenas as barras novas.
+    """
+
+    def __init__(self, path=HISTORY_DB_FILE):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history_meta ("
+                " asset_key TEXT PRIMARY KEY,"
+                " table_name TEXT NOT NULL,"
+                " coverage_start TEXT NOT NULL,"
+                " last_date TEXT,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history_levels ("
+                " asset_key TEXT NOT NULL,"
+                " level TEXT NOT NULL,"
+                " period_start TEXT NOT NULL,"
+                " last_date TEXT NOT NULL,"
+                " open REAL NOT NULL, high REAL NOT NULL, low REAL NOT NULL, close REAL NOT NULL,"
+                " PRIMARY KEY (asset_key, level, period_start)) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _table_name(asset_key):
+        """Nome de tabela seguro e único para um ativo."""
+        slug = re.sub(r'[^0-9a-z]+', '_', asset_key.lower())
+        digest = hashlib.sha1(asset_key.encode('utf-8')).hexdigest()[:8]
+        return f"hist_{slug}_{digest}"
+
+    def get_meta(self, asset_key):
+        """Retorna os metadados armazenados do ativo ou None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT coverage_start, last_date, updated_at FROM history_meta WHERE asset_key = ?",
+                (asset_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'coverage_start': row[0], 'last_date': row[1], 'updated_at': row[2]}
+
+    def write(self, asset_key, series, coverage_start):
+        """Insere/atualiza barras diárias e amplia a cobertura registrada."""
+        table = self._table_name(asset_key)
+        series = series.dropna()
+        rows = list(zip(series.index.strftime('%Y-%m-%d'), series.astype(float).tolist()))
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (date TEXT PRIMARY KEY, price REAL NOT NULL)')
+            conn.executemany(f'INSERT OR REPLACE INTO "{table}" (date, price) VALUES (?, ?)', rows)
+            if rows:
+                self._aggregate_levels(conn, asset_key, table, min(date for date, _ in rows))
+            last_date = conn.execute(f'SELECT MAX(date) FROM "{table}"').fetchone()[0]
+            conn.execute(
+                "INSERT INTO history_meta (asset_key, table_name, coverage_start, last_date, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(asset_key) DO UPDATE SET"
+                "  coverage_start = MIN(coverage_start, excluded.coverage_start),"
+                "  last_date = excluded.last_date,"
+                "  updated_at = excluded.updated_at",
+                (asset_key, table, coverage_start, last_date, time.time())
+            )
+
+    def _aggregate_levels(self, conn, asset_key, table, since=None):
+        """Recalcula as barras semanais e mensais dos períodos a partir de `since`."""
+        if since is not None:
+            # Começa no início da semana ou do mês de `since`, o que vier antes
+            day = pd.Timestamp(since)
+            since = min(day - pd.Timedelta(days=day.dayofweek), day.replace(day=1)).strftime('%Y-%m-%d')
+        for level, period_start in _PERIOD_START_SQL.items():
+            # Agregado no próprio SQLite; abertura e fechamento vêm da primeira e da última data do período
+            conn.execute(
+                "INSERT OR REPLACE INTO history_levels"
+                " (asset_key, level, period_start, last_date, open, high, low, close)"
+                " SELECT ?, ?, g.period_start, g.last_date, o.price, g.high, g.low, c.price FROM ("
+                f"  SELECT {period_start} AS period_start, MIN(date) AS first_date, MAX(date) AS last_date,"
+                "   MAX(price) AS high, MIN(price) AS low"
+                f'  FROM "{table}" WHERE date >= ? GROUP BY period_start) AS g'
+                f' JOIN "{table}" AS o ON o.date = g.first_date'
+                f' JOIN "{table}" AS c ON c.date = g.last_date'
+                # Um período iniciado antes de `since` foi lido só em parte
+                " WHERE g.period_start >= ?",
+                (asset_key, level, since or "", since or "")
+            )
+
+    def date_range(self, asset_key, start=None):
+        """Primeira e última data diária armazenadas a partir de `start` (ou (None, None))."""
+        table = self._table_name(asset_key)
+        query = f'SELECT MIN(date), MAX(date) FROM "{table}"'
+        with closing(self._connect()) as conn:
+            try:
+                return conn.execute(query + (" WHERE date >= ?" if start else ""),
+                                    (start,) if start else ()).fetchone()
+            except sqlite3.OperationalError:
+                return (None, None)
+
+    def read_bars(self, asset_key, level, start=None):
+        """Barras OHLC semanais/mensais terminadas a partir de `start`, indexadas pela última data."""
+        query = ("SELECT last_date, open, high, low, close FROM history_levels"
+                 " WHERE asset_key = ? AND level = ?")
+        params = (asset_key, level)
+        if start is not None:
+            query += " AND last_date >= ?"
+            params += (start,)
+        query += " ORDER BY period_start"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+            if (not rows and self.get_meta(asset_key) is not None
+                    and conn.execute("SELECT 1 FROM history_levels WHERE asset_key = ? AND level = ? LIMIT 1",
+                                     (asset_key, level)).fetchone() is None):
+                # Histórico gravado antes da pirâmide existir: agrega uma vez
+                with conn:
+                    self._aggregate_levels(conn, asset_key, self._table_name(asset_key))
+                rows = conn.execute(query, params).fetchall()
+        columns = ['open', 'high', 'low', 'close']
+        if not rows:
+            return pd.DataFrame(columns=columns, dtype=float)
+        dates, *values = zip(*rows)
+        return pd.DataFrame(dict(zip(columns, values)),
+                            index=pd.DatetimeIndex(pd.to_datetime(dates), name='date'))
+
+    def read_level(self, asset_key, level, start=None):
+        """Fechamentos do nível pedido ("daily", "weekly" ou "monthly") a partir de `start`."""
+        compact = self._cached_level(asset_key, level)
+        if compact is None:
+            return pd.Series(dtype=float)
+        return compact.to_pandas(start)
+
+    def _cached_level(self, asset_key, level):
+        """Série completa do nível em memória compacta, relida só quando o ativo é gravado de novo."""
+        meta = self.get_meta(asset_key)
+        if meta is None:
+            return None
+        cache = get_market_data_cache()
+        key = ("history", self.path, asset_key, level)
+        stamp = (meta['last_date'], meta['updated_at'])
+        cached = cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        if level == "daily":
+            series = self._read_daily(asset_key)
+        else:
+            series = self.read_bars(asset_key, level)['close'].rename('price')
+        return cache.put(key, series, stamp)
+
+    def last_prices(self, asset_keys):
+        """Último fechamento armazenado de cada ativo e quando foi gravado: {asset_key: (preço, updated_at)}."""
+        prices = {}
+        with closing(self._connect()) as conn:
+            for asset_key in asset_keys:
+                meta = conn.execute("SELECT table_name, last_date, updated_at FROM history_meta WHERE asset_key = ?",
+                                    (asset_key,)).fetchone()
+                if meta is None or meta[1] is None:
+                    continue
+                row = conn.execute(f'SELECT price FROM "{meta[0]}" WHERE date = ?', (meta[1],)).fetchone()
+                if row is not None:
+                    prices[asset_key] = (row[0], meta[2])
+        return prices
+
+    def get_last_dates(self):
+        """Retorna {asset_key: última data armazenada} de todos os ativos."""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT asset_key, last_date FROM history_meta").fetchall())
+
+    def read(self, asset_key, start=None):
+        """Lê a série diária armazenada a partir de `start` (inclusive)."""
+        return self.read_level(asset_key, "daily", start)
+
+    def _read_daily(self, asset_key):
+        """Série diária completa, direto do SQLite."""
+        table = self._table_name(asset_key)
+        with closing(self._connect()) as conn:
+            try:
+                rows = conn.execute(f'SELECT date, price FROM "{table}" ORDER BY date').fetchall()
+            except sqlite3.OperationalError:
+                # Tabela ainda não criada para este ativo
+                rows = []
+        if not rows:
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([], name='date'), name='price')
+        dates, values = zip(*rows)
+        return pd.Series(values, index=pd.DatetimeIndex(pd.to_datetime(dates), name='date'), name='price')
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_history_store():
+    """Armazenamento de histórico compartilhado pelo processo (aberto sob demanda)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore()
+    return _store
+
+def set_history_store(store):
+    """Substitui o armazenamento de histórico do processo (ex.: outro arquivo)."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,473 @@
+"""Carteira persistida em SQLite, com uma linha por posição.
+
+Inclusões e remoções são transações de uma única linha, localizadas pelos
+índices de identificador e categoria, de modo que o custo não cresce com o
+tamanho da carteira. No modo WAL, leitores não são bloqueados por quem
+grava, e gravações concorrentes de sessões diferentes são serializadas
+pelo SQLite em vez de uma sobrescrever a outra. O formato JSON de
+`assets_config.json` continua disponível para importação e exportação.
+
+Cada posição tem um livro de operações (compras e vendas). Quantidade,
+custo médio, custo FIFO e lucro realizado ficam gravados na própria linha
+da posição e são atualizados a cada operação registrada, sem reprocessar o
+histórico; os lotes FIFO ainda abertos ficam na tabela `lots`. Regras de
+alerta de preço ficam em `alert_rules`, ligadas à posição.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+from .config import CONFIG_FILE, HOLDINGS_DB_FILE, load_user_assets
+from .portfolio import extract_category_from_display_name
+
+# Tipo de ativo -> (chave no JSON, campo identificador, api_choice)
+ASSET_TYPES = {
+    "stock": ("stocks", "ticker", "yahoo_stock"),
+    "crypto": ("cryptos", "id", "coingecko"),
+}
+
+# Campos com coluna própria; os demais são preservados em `extra`
+_COLUMNS = ('display_name', 'symbol', 'purchase_date', 'quantity', 'purchase_price')
+# Agregados mantidos pelo livro de operações (derivados, nunca importados)
+LEDGER_FIELDS = ('realized_pnl', 'realized_pnl_fifo', 'fifo_cost')
+
+# Lados de uma operação
+BUY, SELL = "buy", "sell"
+# Tolerância para vender a posição inteira apesar de arredondamentos
+_QUANTITY_EPSILON = 1e-9
+
+class DuplicateAssetError(ValueError):
+    """O ativo já existe na carteira."""
+
+class HoldingsStore:
+    """Posições da carteira em SQLite (uma linha por ativo, na ordem de inclusão).
+
+    Na primeira abertura, a carteira é importada de `seed_from` (ou da
+    carteira padrão, se o arquivo não existir). A tabela `holdings_meta`
+    guarda um número de versão incrementado a cada gravação, que as sessões
+    usam para saber quando recarregar a carteira.
+    """
+
+    def __init__(self, path=HOLDINGS_DB_FILE, seed_from=CONFIG_FILE):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with self._transaction(conn):
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS holdings ("
+                    " id INTEGER PRIMARY KEY,"
+                    " asset_type TEXT NOT NULL,"
+                    " identifier TEXT NOT NULL,"
+                    " display_name TEXT NOT NULL,"
+                    " symbol TEXT,"
+                    " category TEXT NOT NULL,"
+                    " purchase_date TEXT,"
+                    " quantity REAL,"
+                    " purchase_price REAL,"
+                    " extra TEXT,"
+                    " realized_pnl REAL NOT NULL DEFAULT 0,"
+                    " realized_pnl_fifo REAL NOT NULL DEFAULT 0,"
+                    " fifo_cost REAL NOT NULL DEFAULT 0)"
+                )
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS holdings_identifier ON holdings (asset_type, identifier)")
+                conn.execute("CREATE INDEX IF NOT EXISTS holdings_category ON holdings (category)")
+                conn.execute("CREATE TABLE IF NOT EXISTS holdings_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS transactions ("
+                    " id INTEGER PRIMARY KEY,"
+                    " holding_id INTEGER NOT NULL,"
+                    " trade_date TEXT,"
+                    " side TEXT NOT NULL,"
+                    " quantity REAL NOT NULL,"
+                    " price REAL NOT NULL,"
+                    " realized_pnl REAL NOT NULL DEFAULT 0,"
+                    " realized_pnl_fifo REAL NOT NULL DEFAULT 0)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS transactions_holding ON transactions (holding_id, id)")
+                # Lotes FIFO ainda abertos (quantidade restante de cada compra)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS lots ("
+                    " id INTEGER PRIMARY KEY,"
+                    " holding_id INTEGER NOT NULL,"
+                    " trade_date TEXT,"
+                    " quantity REAL NOT NULL,"
+                    " price REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS lots_holding ON lots (holding_id, id)")
+                # Regras de alerta de preço (`fired_at` preenchido enquanto o alerta estiver disparado)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS alert_rules ("
+                    " id INTEGER PRIMARY KEY,"
+                    " holding_id INTEGER NOT NULL,"
+                    " kind TEXT NOT NULL,"
+                    " direction TEXT NOT NULL,"
+                    " threshold REAL NOT NULL,"
+                    " fired_at TEXT)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS alert_rules_holding ON alert_rules (holding_id)")
+                self._migrate(conn)
+                seeded = conn.execute("SELECT value FROM holdings_meta WHERE key = 'seeded'").fetchone()
+                if seeded is None:
+                    self._insert_assets(conn, load_user_assets(seed_from))
+                    conn.execute("INSERT INTO holdings_meta (key, value) VALUES ('seeded', 1)")
+                    self._bump_version(conn)
+
+    def _connect(self):
+        # Transações controladas explicitamente (BEGIN IMMEDIATE nas gravações)
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn):
+        """Transação de escrita: reserva o banco já no início para evitar conflitos entre gravadores."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @classmethod
+    def _migrate(cls, conn):
+        """Bancos anteriores ao livro de operações: cria as colunas e uma compra inicial por posição."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(holdings)")}
+        missing = [name for name in LEDGER_FIELDS if name not in columns]
+        for name in missing:
+            conn.execute(f"ALTER TABLE holdings ADD COLUMN {name} REAL NOT NULL DEFAULT 0")
+        if missing:
+            conn.execute("UPDATE holdings SET fifo_cost = COALESCE(quantity, 0) * COALESCE(purchase_price, 0)")
+            cls._open_initial_lots(conn)
+
+    @staticmethod
+    def _open_initial_lots(conn):
+        """Registra a compra inicial (data, quantidade e preço da posição) das posições sem operações."""
+        without_trades = ("FROM holdings WHERE quantity > 0"
+                          " AND NOT EXISTS (SELECT 1 FROM transactions WHERE holding_id = holdings.id)")
+        conn.execute(
+            "INSERT INTO lots (holding_id, trade_date, quantity, price)"
+            f" SELECT id, purchase_date, quantity, COALESCE(purchase_price, 0) {without_trades}"
+        )
+        conn.execute(
+            "INSERT INTO transactions (holding_id, trade_date, side, quantity, price)"
+            f" SELECT id, purchase_date, '{BUY}', quantity, COALESCE(purchase_price, 0) {without_trades}"
+        )
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute(
+            "INSERT INTO holdings_meta (key, value) VALUES ('version', 1)"
+            " ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    @staticmethod
+    def _row(asset_type, asset):
+        """Linha da tabela a partir de um ativo no formato do JSON."""
+        _, id_field, _ = ASSET_TYPES[asset_type]
+        display_name = asset['display_name']
+        category = extract_category_from_display_name(display_name) if asset_type == "stock" else "CRYPTO"
+        extra = {k: v for k, v in asset.items()
+                 if k != id_field and k not in _COLUMNS and k not in LEDGER_FIELDS and k != 'transactions'}
+        quantity, purchase_price = asset.get('quantity'), asset.get('purchase_price')
+        if asset.get('transactions'):
+            # A posição é reconstruída pelas operações importadas
+            quantity, purchase_price = 0.0, 0.0
+        fifo_cost = (quantity or 0) * (purchase_price or 0)
+        return (asset_type, asset[id_field], display_name, asset.get('symbol'), category,
+                asset.get('purchase_date'), quantity, purchase_price,
+                json.dumps(extra, ensure_ascii=False) if extra else None, fifo_cost)
+
+    _HOLDING_VALUES = ("holdings (asset_type, identifier, display_name, symbol, category,"
+                       " purchase_date, quantity, purchase_price, extra, fifo_cost)"
+                       " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+    def _insert_assets(self, conn, assets):
+        rows, replays = [], []
+        for asset_type, (json_key, id_field, _) in ASSET_TYPES.items():
+            for asset in assets.get(json_key, []):
+                rows.append(self._row(asset_type, asset))
+                if asset.get('transactions'):
+                    replays.append((asset_type, asset[id_field], asset['transactions']))
+        # Duplicatas no JSON mantêm a primeira ocorrência
+        conn.executemany(f"INSERT OR IGNORE INTO {self._HOLDING_VALUES}", rows)
+        self._open_initial_lots(conn)
+        for asset_type, identifier, trades in replays:
+            holding_id = self._holding_id(conn, asset_type, identifier)
+            if conn.execute("SELECT 1 FROM transactions WHERE holding_id = ?", (holding_id,)).fetchone():
+                continue  # duplicata já importada
+            for trade in trades:
+                self._apply_trade(conn, holding_id, trade['side'], float(trade['quantity']),
+                                  float(trade['price']), trade.get('date'))
+
+    @staticmethod
+    def _holding_id(conn, asset_type, identifier):
+        row = conn.execute(
+            "SELECT id FROM holdings WHERE asset_type = ? AND identifier = ?", (asset_type, identifier)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{identifier} não está no portfólio.")
+        return row[0]
+
+    @staticmethod
+    def _apply_trade(conn, holding_id, side, quantity, price, trade_date):
+        """Grava uma operação e atualiza os agregados da posição em O(lotes consumidos).
+
+        Custo médio: compras recalculam o preço médio, vendas realizam
+        (preço - médio) por unidade. FIFO: compras abrem um lote, vendas
+        consomem os lotes mais antigos.
+        """
+        if side not in (BUY, SELL):
+            raise ValueError(f"Operação inválida: {side!r} (use '{BUY}' ou '{SELL}').")
+        if not quantity > 0 or price < 0:
+            raise ValueError("Quantidade deve ser maior que zero e preço não pode ser negativo.")
+        held, average, realized, realized_fifo, fifo_cost = conn.execute(
+            "SELECT COALESCE(quantity, 0), COALESCE(purchase_price, 0), realized_pnl, realized_pnl_fifo, fifo_cost"
+            " FROM holdings WHERE id = ?", (holding_id,)
+        ).fetchone()
+
+        trade_realized = trade_realized_fifo = 0.0
+        if side == BUY:
+            new_held = held + quantity
+            average = (held * average + quantity * price) / new_held
+            fifo_cost += quantity * price
+            conn.execute("INSERT INTO lots (holding_id, trade_date, quantity, price) VALUES (?, ?, ?, ?)",
+                         (holding_id, trade_date, quantity, price))
+        else:
+            if quantity > held + _QUANTITY_EPSILON:
+                raise ValueError(f"Quantidade vendida ({quantity:g}) maior que a posição ({held:g}).")
+            quantity = min(quantity, held)
+            new_held = held - quantity
+            trade_realized = quantity * (price - average)
+            # Lê só os lotes necessários; as alterações são gravadas depois de fechar a leitura
+            remaining, consumed, partial = quantity, [], None
+            for lot_id, lot_quantity, lot_price in conn.execute(
+                    "SELECT id, quantity, price FROM lots WHERE holding_id = ? ORDER BY id", (holding_id,)):
+                used = min(lot_quantity, remaining)
+                trade_realized_fifo += used * (price - lot_price)
+                fifo_cost -= used * lot_price
+                remaining -= used
+                if lot_quantity - used <= _QUANTITY_EPSILON:
+                    consumed.append((lot_id,))
+                else:
+                    partial = (lot_quantity - used, lot_id)
+                if remaining <= _QUANTITY_EPSILON:
+                    break
+            conn.executemany("DELETE FROM lots WHERE id = ?", consumed)
+            if partial is not None:
+                conn.execute("UPDATE lots SET quantity = ? WHERE id = ?", partial)
+            if new_held <= _QUANTITY_EPSILON:
+                new_held, fifo_cost = 0.0, 0.0
+
+        conn.execute(
+            "INSERT INTO transactions (holding_id, trade_date, side, quantity, price, realized_pnl, realized_pnl_fifo)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (holding_id, trade_date, side, quantity, price, trade_realized, trade_realized_fifo)
+        )
+        conn.execute(
+            "UPDATE holdings SET quantity = ?, purchase_price = ?, realized_pnl = ?, realized_pnl_fifo = ?,"
+            " fifo_cost = ?, purchase_date = COALESCE(purchase_date, ?) WHERE id = ?",
+            (new_held, average, realized + trade_realized, realized_fifo + trade_realized_fifo,
+             fifo_cost, trade_date, holding_id)
+        )
+        return {'realized_pnl': trade_realized, 'realized_pnl_fifo': trade_realized_fifo,
+                'quantity': new_held, 'average_price': average}
+
+    def version(self):
+        """Número de versão da carteira (muda a cada gravação)."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM holdings_meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM holdings").fetchone()[0]
+
+    def exists(self, asset_type, identifier):
+        """Indica se o ativo já está na carteira (consulta pelo índice)."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT 1 FROM holdings WHERE asset_type = ? AND identifier = ?", (asset_type, identifier)
+            ).fetchone() is not None
+
+    def add(self, asset_type, asset):
+        """Inclui um ativo (dicionário no formato do JSON); levanta DuplicateAssetError se já existir."""
+        row = self._row(asset_type, asset)
+        with closing(self._connect()) as conn, self._transaction(conn):
+            try:
+                cursor = conn.execute(f"INSERT INTO {self._HOLDING_VALUES}", row)
+            except sqlite3.IntegrityError:
+                raise DuplicateAssetError(f"{row[1]} já existe no portfólio.") from None
+            if row[6]:
+                # A posição inicial vira a primeira compra do livro
+                conn.execute("INSERT INTO lots (holding_id, trade_date, quantity, price) VALUES (?, ?, ?, ?)",
+                             (cursor.lastrowid, row[5], row[6], row[7] or 0))
+                conn.execute("INSERT INTO transactions (holding_id, trade_date, side, quantity, price)"
+                             " VALUES (?, ?, ?, ?, ?)", (cursor.lastrowid, row[5], BUY, row[6], row[7] or 0))
+            self._bump_version(conn)
+
+    def remove(self, asset_type, identifier):
+        """Remove um ativo (com o livro de operações e os alertas); retorna False se ele não estava na carteira."""
+        with closing(self._connect()) as conn, self._transaction(conn):
+            try:
+                holding_id = self._holding_id(conn, asset_type, identifier)
+            except KeyError:
+                return False
+            conn.execute("DELETE FROM lots WHERE holding_id = ?", (holding_id,))
+            conn.execute("DELETE FROM transactions WHERE holding_id = ?", (holding_id,))
+            conn.execute("DELETE FROM alert_rules WHERE holding_id = ?", (holding_id,))
+            conn.execute("DELETE FROM holdings WHERE id = ?", (holding_id,))
+            self._bump_version(conn)
+        return True
+
+    def record_trade(self, asset_type, identifier, side, quantity, price, trade_date=None):
+        """Registra uma compra ou venda de um ativo da carteira.
+
+        Retorna o lucro realizado pela operação (custo médio e FIFO), a nova
+        quantidade e o novo preço médio. Levanta KeyError se o ativo não
+        estiver na carteira e ValueError para operações inválidas (por
+        exemplo, vender mais do que a posição).
+        """
+        with closing(self._connect()) as conn, self._transaction(conn):
+            holding_id = self._holding_id(conn, asset_type, identifier)
+            result = self._apply_trade(conn, holding_id, side, float(quantity), float(price), trade_date)
+            self._bump_version(conn)
+        return result
+
+    def transactions(self, asset_type, identifier):
+        """Operações de um ativo, da mais antiga para a mais recente."""
+        with closing(self._connect()) as conn:
+            holding_id = self._holding_id(conn, asset_type, identifier)
+            rows = conn.execute(
+                "SELECT trade_date, side, quantity, price, realized_pnl, realized_pnl_fifo FROM transactions"
+                " WHERE holding_id = ? ORDER BY id", (holding_id,)
+            ).fetchall()
+        return [{'date': date, 'side': side, 'quantity': quantity, 'price': price,
+                 'realized_pnl': realized, 'realized_pnl_fifo': realized_fifo}
+                for date, side, quantity, price, realized, realized_fifo in rows]
+
+    def add_alert_rule(self, asset_type, identifier, kind, direction, threshold):
+        """Cria uma regra de alerta para um ativo da carteira e retorna o seu id."""
+        with closing(self._connect()) as conn, self._transaction(conn):
+            holding_id = self._holding_id(conn, asset_type, identifier)
+            cursor = conn.execute(
+                "INSERT INTO alert_rules (holding_id, kind, direction, threshold) VALUES (?, ?, ?, ?)",
+                (holding_id, kind, direction, float(threshold))
+            )
+            self._bump_version(conn)
+        return cursor.lastrowid
+
+    def remove_alert_rule(self, rule_id):
+        """Remove uma regra de alerta; retorna False se ela não existia."""
+        with closing(self._connect()) as conn, self._transaction(conn):
+            removed = conn.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,)).rowcount
+            if removed:
+                self._bump_version(conn)
+        return bool(removed)
+
+    def alert_rules(self, limit=None):
+        """Regras de alerta com os dados da posição (identificador, nome e preço médio)."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT r.id, h.asset_type, h.identifier, h.display_name, h.purchase_price,"
+                " r.kind, r.direction, r.threshold, r.fired_at"
+                " FROM alert_rules AS r JOIN holdings AS h ON h.id = r.holding_id ORDER BY r.id"
+                + (" LIMIT ?" if limit is not None else ""), (limit,) if limit is not None else ()
+            ).fetchall()
+        fields = ('id', 'asset_type', 'identifier', 'display_name', 'purchase_price',
+                  'kind', 'direction', 'threshold', 'fired_at')
+        return [dict(zip(fields, row)) for row in rows]
+
+    def set_alert_states(self, fired, rearmed, fired_at):
+        """Marca regras como disparadas (em `fired_at`) ou rearmadas, sem mudar a versão da carteira."""
+        with closing(self._connect()) as conn, self._transaction(conn):
+            conn.executemany("UPDATE alert_rules SET fired_at = ? WHERE id = ?",
+                             [(fired_at, rule_id) for rule_id in fired])
+            conn.executemany("UPDATE alert_rules SET fired_at = NULL WHERE id = ?",
+                             [(rule_id,) for rule_id in rearmed])
+
+    def replace_all(self, assets):
+        """Substitui a carteira inteira (importação de JSON) em uma única transação.
+
+        Ativos com a lista `transactions` têm a posição reconstruída pelas
+        operações; os demais viram uma compra inicial com os dados de compra.
+        As regras de alerta da carteira anterior são descartadas.
+        """
+        with closing(self._connect()) as conn, self._transaction(conn):
+            conn.execute("DELETE FROM lots")
+            conn.execute("DELETE FROM transactions")
+            conn.execute("DELETE FROM alert_rules")
+            conn.execute("DELETE FROM holdings")
+            self._insert_assets(conn, assets)
+            self._bump_version(conn)
+
+    def load_assets(self, with_transactions=False):
+        """Carteira completa no formato do JSON ({'stocks': [...], 'cryptos': [...]}).
+
+        Cada ativo traz também os agregados do livro (`LEDGER_FIELDS`) e, se
+        pedido, a lista `transactions` com as suas operações.
+        """
+        assets = {json_key: [] for json_key, _, _ in ASSET_TYPES.values()}
+        trades = {}
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, asset_type, identifier, display_name, symbol, purchase_date, quantity,"
+                " purchase_price, extra, realized_pnl, realized_pnl_fifo, fifo_cost FROM holdings ORDER BY id"
+            ).fetchall()
+            if with_transactions:
+                for holding_id, date, side, quantity, price in conn.execute(
+                        "SELECT holding_id, trade_date, side, quantity, price FROM transactions ORDER BY holding_id, id"):
+                    trades.setdefault(holding_id, []).append(
+                        {'date': date, 'side': side, 'quantity': quantity, 'price': price})
+        for (holding_id, asset_type, identifier, display_name, symbol, purchase_date, quantity,
+             purchase_price, extra, realized_pnl, realized_pnl_fifo, fifo_cost) in rows:
+            json_key, id_field, _ = ASSET_TYPES[asset_type]
+            asset = {id_field: identifier, 'display_name': display_name}
+            if symbol is not None:
+                asset['symbol'] = symbol
+            asset.update(purchase_date=purchase_date, quantity=quantity, purchase_price=purchase_price)
+            if extra:
+                asset.update(json.loads(extra))
+            asset.update(realized_pnl=realized_pnl, realized_pnl_fifo=realized_pnl_fifo, fifo_cost=fifo_cost)
+            if with_transactions:
+                asset['transactions'] = trades.get(holding_id, [])
+            assets[json_key].append(asset)
+        return assets
+
+    def price_assets(self):
+        """Pares (api_choice, identificador) de todas as posições, para cotação em lote."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT asset_type, identifier FROM holdings ORDER BY id").fetchall()
+        return [(ASSET_TYPES[asset_type][2], identifier) for asset_type, identifier in rows]
+
+    def import_json(self, path):
+        """Substitui a carteira pelo conteúdo de um arquivo no formato de `assets_config.json`."""
+        with open(path, 'r', encoding='utf-8') as f:
+            self.replace_all(json.load(f))
+
+    def to_json(self):
+        """Carteira serializada no formato de `assets_config.json`, com o livro de operações."""
+        return json.dumps(self.load_assets(with_transactions=True), indent=2, ensure_ascii=False)
+
+    def export_json(self, path):
+        """Grava a carteira em um arquivo no formato de `assets_config.json`."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_holdings_store():
+    """Carteira compartilhada pelo processo (aberta sob demanda)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HoldingsStore()
+    return _store
+
+def set_holdings_store(store):
+    """Substitui a carteira do processo (ex.: outro arquivo)."""
+    global _store
+    with _store_lock:
+        _store = store
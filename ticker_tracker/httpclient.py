@@ -0,0 +1,169 @@
+"""Cliente HTTP compartilhado: conexões persistentes, novas tentativas e requisições condicionais.
+
+Todas as chamadas à CoinGecko passam por uma única `requests.Session`, que
+mantém as conexões TLS abertas entre requisições. Falhas transitórias (429
+e 5xx, erros de conexão e timeouts) são repetidas com espera exponencial,
+respeitando `Retry-After`; a espera acontece fora do `guard` de quem
+chama (ex.: o limitador do provedor), que envolve só cada tentativa.
+Respostas com `ETag`/`Last-Modified` são guardadas e revalidadas com
+`If-None-Match`/`If-Modified-Since`; um 304 devolve o corpo já conhecido.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import get_metrics
+
+# Conexões mantidas abertas por host
+HTTP_POOL_SIZE = 10
+# Novas tentativas após a primeira requisição e espera base/máxima entre elas (segundos)
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_SECONDS = 0.5
+HTTP_MAX_BACKOFF_SECONDS = 30.0
+HTTP_TIMEOUT_SECONDS = 10
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Respostas guardadas para revalidação condicional
+HTTP_VALIDATOR_CACHE_SIZE = 512
+
+def _retry_after_seconds(response):
+    """Espera pedida pelo servidor em `Retry-After` (segundos ou data HTTP)."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HttpClient:
+    """Sessão HTTP com pool de conexões, novas tentativas e cache de validadores."""
+
+    def __init__(self, name, pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES,
+                 backoff=HTTP_BACKOFF_SECONDS, max_backoff=HTTP_MAX_BACKOFF_SECONDS,
+                 timeout=HTTP_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        # As novas tentativas são feitas aqui, não pelo urllib3, para respeitar Retry-After e contar cada uma
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+        self._lock = threading.Lock()
+        self._validated = OrderedDict()  # url com parâmetros -> (etag, last_modified, corpo JSON)
+        self.requests = 0
+        self.retries = 0
+        self.not_modified = 0
+
+    def _delay(self, attempt, response=None):
+        retry_after = _retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        # Espera exponencial com variação aleatória, para as sessões não repetirem juntas
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def get_json(self, url, params=None, guard=None):
+        """GET com novas tentativas e revalidação; retorna o corpo JSON.
+
+        `guard` (context manager reutilizável, ex.: `FetchExecutor.limit`)
+        envolve cada tentativa, não as esperas entre elas; respostas 429/5xx
+        saem dele como `HTTPError`, contando como falha do provedor.
+        """
+        guard = nullcontext() if guard is None else guard
+        cache_key = f"{url}?{urlencode(sorted((params or {}).items()))}"
+        with self._lock:
+            validated = self._validated.get(cache_key)
+        headers = {}
+        if validated is not None:
+            etag, last_modified, _ = validated
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        metrics = get_metrics()
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.requests += 1
+            try:
+                with guard:
+                    response = self._session.get(url, params=params, headers=headers, timeout=self.timeout)
+                    if response.status_code in RETRY_STATUS_CODES:
+                        response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                reason = "connection"
+                delay = self._delay(attempt)
+            except requests.HTTPError as e:
+                if attempt == self.max_retries:
+                    raise
+                reason = str(e.response.status_code)
+                delay = self._delay(attempt, e.response)
+            else:
+                break
+            with self._lock:
+                self.retries += 1
+            metrics.inc("http_retries_total", client=self.name, reason=reason)
+            time.sleep(delay)
+
+        if response.status_code == 304 and validated is not None:
+            with self._lock:
+                self.not_modified += 1
+                self._validated.move_to_end(cache_key)
+            return validated[2]
+
+        response.raise_for_status()
+        data = response.json()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            with self._lock:
+                self._validated[cache_key] = (etag, last_modified, data)
+                self._validated.move_to_end(cache_key)
+                while len(self._validated) > HTTP_VALIDATOR_CACHE_SIZE:
+                    self._validated.popitem(last=False)
+        return data
+
+    def stats(self):
+        """Requisições, conexões abertas e taxa de reaproveitamento de conexões."""
+        pools = self._adapter.poolmanager.pools
+        connections = sum(pools[key].num_connections for key in pools.keys())
+        with self._lock:
+            requests_made = self.requests
+            return {
+                'requests': requests_made,
+                'connections_opened': connections,
+                'connection_reuse_ratio': (1 - connections / requests_made) if requests_made else 0.0,
+                'retries': self.retries,
+                'not_modified': self.not_modified,
+                'validators': len(self._validated),
+            }
+
+_coingecko_client = None
+_client_lock = threading.Lock()
+
+def get_coingecko_client():
+    """Cliente HTTP da CoinGecko compartilhado pelo processo (criado sob demanda)."""
+    global _coingecko_client
+    if _coingecko_client is None:
+        with _client_lock:
+            if _coingecko_client is None:
+                _coingecko_client = HttpClient("coingecko")
+                get_metrics().register_http_client("coingecko", _coingecko_client)
+    return _coingecko_client
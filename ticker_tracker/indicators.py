@@ -0,0 +1,173 @@
+"""Indicadores técnicos (SMA, EMA, RSI e Bandas de Bollinger) vetorizados.
+
+Os indicadores de cada ativo e nível do histórico ficam em memória, no
+cache compacto de dados de mercado (`marketdata.py`). Quando
+chegam barras novas, só o trecho final é recalculado: as médias móveis
+reaproveitam a janela anterior e as exponenciais (EMA e médias do RSI)
+partem do último estado calculado, guardado à parte em float64 para não
+acumular o arredondamento da tabela compacta. As leituras materializam
+só o período exibido.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .history import get_history_store
+from .marketdata import get_market_data_cache
+
+SMA_WINDOWS = (20, 50)
+EMA_SPAN = 20
+RSI_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_STDS = 2.0
+
+# Indicadores oferecidos no gráfico: rótulo -> colunas calculadas
+INDICATORS = {
+    "SMA 20": ("sma_20",),
+    "SMA 50": ("sma_50",),
+    "EMA 20": ("ema_20",),
+    "Bollinger (20, 2σ)": ("bb_upper", "bb_lower"),
+    "RSI 14": ("rsi_14",),
+}
+INDICATOR_COLUMNS = tuple(column for columns in INDICATORS.values() for column in columns)
+# Osciladores (0 a 100) vão em um gráfico próprio, abaixo do preço
+OSCILLATORS = ("rsi_14",)
+
+# Barras necessárias antes de o estado anterior servir de ponto de partida
+_WARMUP = max(*SMA_WINDOWS, EMA_SPAN, RSI_PERIOD, BOLLINGER_WINDOW)
+# Estado das médias exponenciais, guardado em float64 entre atualizações
+_SEED_COLUMNS = (f"ema_{EMA_SPAN}", "avg_gain", "avg_loss")
+
+def _rolling(close, start, window, std=False):
+    """Média (ou desvio padrão) móvel das posições `start:`, lendo só a janela anterior."""
+    lo = max(0, start - window + 1)
+    rolling = pd.Series(close[lo:]).rolling(window)
+    values = rolling.std(ddof=0) if std else rolling.mean()
+    return values.to_numpy()[start - lo:]
+
+def _ewm(values, alpha, min_periods, seed=None):
+    """Média exponencial (recursiva) de `values`, continuando de `seed` quando informado."""
+    if seed is None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False, min_periods=min_periods).mean().to_numpy()
+    seeded = np.concatenate(([seed], values))
+    return pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+def compute_indicators(close, start=0, seeds=None):
+    """Indicadores das posições `start:` de `close`.
+
+    Com `start > 0`, as médias exponenciais continuam de `seeds`
+    ({coluna: valor na posição `start - 1`}, para `_SEED_COLUMNS`).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    seed = (lambda name: seeds[name]) if start else (lambda name: None)
+    values = {f"sma_{window}": _rolling(close, start, window) for window in SMA_WINDOWS}
+    values[f"ema_{EMA_SPAN}"] = _ewm(close[start:], 2.0 / (EMA_SPAN + 1), EMA_SPAN, seed(f"ema_{EMA_SPAN}"))
+
+    middle = _rolling(close, start, BOLLINGER_WINDOW)
+    spread = BOLLINGER_STDS * _rolling(close, start, BOLLINGER_WINDOW, std=True)
+    values["bb_upper"] = middle + spread
+    values["bb_lower"] = middle - spread
+
+    # RSI de Wilder: médias exponenciais (alfa = 1/período) de altas e baixas
+    change = np.diff(close[max(start - 1, 0):])
+    gains, losses = np.clip(change, 0, None), np.clip(-change, 0, None)
+    alpha = 1.0 / RSI_PERIOD
+    avg_gain = _ewm(gains, alpha, RSI_PERIOD, seed("avg_gain"))
+    avg_loss = _ewm(losses, alpha, RSI_PERIOD, seed("avg_loss"))
+    if not start:
+        # A primeira barra não tem variação
+        avg_gain = np.concatenate(([np.nan], avg_gain))
+        avg_loss = np.concatenate(([np.nan], avg_loss))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values[f"rsi_{RSI_PERIOD}"] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    values["avg_gain"], values["avg_loss"] = avg_gain, avg_loss
+    return values
+
+class IndicatorCache:
+    """Indicadores por (ativo, nível do histórico), atualizados só nas barras novas.
+
+    Cada entrada guarda fechamentos e indicadores como uma tabela compacta e,
+    à parte, o estado das médias exponenciais na penúltima barra, em
+    float64. Se o ativo foi gravado depois do cálculo, busca apenas as barras
+    a partir da última já calculada (que pode ter mudado no pregão ou na
+    semana/mês em andamento) e recalcula só esse trecho final.
+    """
+
+    def get(self, asset_key, level, start=None):
+        """DataFrame com os indicadores do ativo no nível, a partir de `start` (inclusive).
+
+        Os indicadores são calculados sobre a série armazenada inteira; só o
+        trecho pedido é convertido para pandas.
+        """
+        store = get_history_store()
+        meta = store.get_meta(asset_key)
+        if meta is None:
+            return pd.DataFrame(columns=INDICATOR_COLUMNS, dtype=float)
+        cache = get_market_data_cache()
+        key = ("indicators", store.path, asset_key, level)
+        seeds_key = ("indicator_seeds", store.path, asset_key, level)
+        stamp = (meta['coverage_start'], meta['last_date'], meta['updated_at'])
+        cached = cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1].to_pandas(start)[list(INDICATOR_COLUMNS)]
+
+        table = None
+        cached_seeds = cache.get(seeds_key) if cached is not None else None
+        if (cached_seeds is not None and cached_seeds[0] == cached[0]
+                and cached[0][0] == meta['coverage_start'] and len(cached[1]) > _WARMUP):
+            table, seeds = self._extend(store, asset_key, level, cached[1], cached_seeds[1])
+        if table is None:
+            series = store.read_level(asset_key, level)
+            if series.empty:
+                return pd.DataFrame(columns=INDICATOR_COLUMNS, dtype=float)
+            close = series.to_numpy(dtype=np.float64)
+            values = compute_indicators(close)
+            seeds = {name: values[name][-2] for name in _SEED_COLUMNS} if len(close) > 1 else None
+            table = pd.DataFrame({'close': close, **values}, index=series.index)
+
+        compact = cache.put(key, table, stamp)
+        if seeds is not None:
+            cache.put(seeds_key, seeds, stamp, nbytes=8 * len(seeds))
+        return compact.to_pandas(start)[list(INDICATOR_COLUMNS)]
+
+    @staticmethod
+    def _extend(store, asset_key, level, previous, seeds):
+        """(tabela, estado) com as barras novas recalculadas sobre a tabela compacta `previous`.
+
+        Retorna (None, None) se não houver barras para ler.
+        """
+        last_day = np.datetime64(int(previous.axis[-1]), 'D')
+        tail = store.read_level(asset_key, level, str(last_day))
+        if tail.empty:
+            return None, None
+        columns = list(previous.columns)
+        start = len(previous) - 1  # a última barra é substituída pela versão lida agora
+        # Só a janela das médias móveis antes de `start` é lida da tabela compacta
+        lo = max(0, start - _WARMUP)
+        close = np.concatenate((previous.values[lo:start, columns.index('close')].astype(np.float64),
+                                tail.to_numpy(dtype=np.float64)))
+        new = compute_indicators(close, start - lo, seeds)
+        new['close'] = close[start - lo:]
+        rows = np.column_stack([new[name] for name in columns])
+        axis = np.concatenate((previous.axis[:start].astype('datetime64[D]'),
+                               tail.index.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')))
+        table = pd.DataFrame(np.concatenate((previous.values[:start], rows.astype(previous.values.dtype))),
+                             index=pd.DatetimeIndex(axis.astype('datetime64[ns]'), name=previous.index_name),
+                             columns=columns)
+        # Estado na nova penúltima barra: a anterior a `start` se só a última mudou
+        if len(tail) > 1:
+            seeds = {name: new[name][-2] for name in _SEED_COLUMNS}
+        return table, seeds
+
+_indicator_cache = None
+_indicator_cache_lock = threading.Lock()
+
+def get_indicator_cache():
+    """Cache de indicadores compartilhado pelo processo."""
+    global _indicator_cache
+    if _indicator_cache is None:
+        with _indicator_cache_lock:
+            if _indicator_cache is None:
+                _indicator_cache = IndicatorCache()
+    return _indicator_cache
@@ -0,0 +1,194 @@
+"""Barras intradiárias (1m/5m/15m) em buffers circulares mapeados em memória.
+
+Cada ativo e intervalo tem um arquivo de tamanho fixo com as barras mais
+recentes (instante em segundos UTC e fechamento), acessado via `numpy.memmap`.
+A memória usada é limitada pela capacidade do buffer, e o sistema operacional
+só carrega as páginas efetivamente lidas.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Pasta com um arquivo por ativo e intervalo
+INTRADAY_DIR = "intraday_cache"
+
+# Intervalos oferecidos: rótulo -> código do intervalo
+INTRADAY_INTERVALS = {
+    "1 minuto": "1m",
+    "5 minutos": "5m",
+    "15 minutos": "15m",
+}
+INTERVAL_SECONDS = {"1m": 60, "5m": 300, "15m": 900}
+
+# Barras mantidas por buffer (1m: dois dias corridos; 5m: uma semana; 15m: um mês)
+INTRADAY_CAPACITY = {"1m": 2880, "5m": 2016, "15m": 2880}
+
+# Janela baixada na primeira carga de uma ação (o Yahoo limita 1m a poucos dias)
+INTRADAY_INITIAL_PERIOD = {"1m": "5d", "5m": "7d", "15m": "30d"}
+
+_MAGIC = 0x54544252  # "TTBR"
+_HEADER_FIELDS = 4   # magic, capacidade, início, quantidade
+
+class BarRingBuffer:
+    """Buffer circular de barras (instante, fechamento) persistido em um arquivo.
+
+    Cada barra é gravada duas vezes, nas posições `i` e `i + capacidade`, de
+    modo que as `n` barras mais recentes sempre ocupam um trecho contíguo e
+    podem ser lidas como visão do arquivo, sem cópia. Acrescentar uma barra
+    custa O(1).
+    """
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+        header_bytes = _HEADER_FIELDS * 8
+        size = header_bytes + 2 * capacity * 16
+        header = None
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            header = np.memmap(path, dtype=np.int64, mode='r+', shape=(_HEADER_FIELDS,))
+            if header[0] != _MAGIC or header[1] != capacity:
+                header = None
+        if header is None:
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            header = np.memmap(path, dtype=np.int64, mode='r+', shape=(_HEADER_FIELDS,))
+            header[:] = (_MAGIC, capacity, 0, 0)
+        self._header = header
+        self._times = np.memmap(path, dtype=np.int64, mode='r+', offset=header_bytes, shape=(2 * capacity,))
+        self._prices = np.memmap(path, dtype=np.float64, mode='r+',
+                                 offset=header_bytes + 2 * capacity * 8, shape=(2 * capacity,))
+
+    def __len__(self):
+        return int(self._header[3])
+
+    @property
+    def last_time(self):
+        """Instante (segundos UTC) da barra mais recente, ou None se vazio."""
+        with self._lock:
+            start, count = int(self._header[2]), int(self._header[3])
+            return int(self._times[start + count - 1]) if count else None
+
+    def _write(self, position, timestamp, price):
+        self._times[position] = self._times[position + self.capacity] = timestamp
+        self._prices[position] = self._prices[position + self.capacity] = price
+
+    def append(self, timestamp, price):
+        """Acrescenta uma barra; a barra do mesmo instante da última é substituída."""
+        with self._lock:
+            start, count = int(self._header[2]), int(self._header[3])
+            if count:
+                last = start + count - 1
+                if timestamp == self._times[last]:
+                    # Barra em formação: atualiza o fechamento
+                    self._write(last % self.capacity, timestamp, price)
+                    return
+                if timestamp < self._times[last]:
+                    return
+            self._write((start + count) % self.capacity, timestamp, price)
+            if count < self.capacity:
+                self._header[3] = count + 1
+            else:
+                self._header[2] = (start + 1) % self.capacity
+
+    def extend(self, timestamps, prices):
+        """Acrescenta barras em ordem crescente (as anteriores à última são ignoradas)."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        last = self.last_time
+        if last is not None:
+            keep = timestamps >= last
+            timestamps, prices = timestamps[keep], prices[keep]
+        for timestamp, price in zip(timestamps[-self.capacity:].tolist(), prices[-self.capacity:].tolist()):
+            self.append(timestamp, price)
+
+    def window(self, since=None):
+        """Visões (instantes, fechamentos) das barras a partir de `since`, sem cópia.
+
+        As visões apontam para o arquivo: copie-as se precisar guardá-las
+        enquanto novas barras são gravadas.
+        """
+        with self._lock:
+            start, count = int(self._header[2]), int(self._header[3])
+            times = self._times[start:start + count]
+            prices = self._prices[start:start + count]
+        if since is not None:
+            first = int(np.searchsorted(times, since, side='left'))
+            times, prices = times[first:], prices[first:]
+        return times, prices
+
+def bars_to_arrays(series, interval):
+    """Converte uma série de preços em barras (instante UTC do início da barra, último preço)."""
+    if series.empty:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    index = pd.DatetimeIndex(series.index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    seconds = index.tz_convert('UTC').as_unit('s').asi8
+    step = INTERVAL_SECONDS[interval]
+    bars = pd.Series(series.to_numpy(dtype=float), index=seconds - seconds % step).dropna()
+    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+    return bars.index.to_numpy(dtype=np.int64), bars.to_numpy()
+
+class IntradayStore:
+    """Buffers intradiários abertos sob demanda, um por ativo e intervalo."""
+
+    def __init__(self, directory=INTRADAY_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._buffers = {}     # (asset_key, intervalo) -> BarRingBuffer
+        self._fetched_at = {}  # (asset_key, intervalo) -> instante da última busca
+
+    @staticmethod
+    def _file_name(asset_key, interval):
+        """Nome de arquivo seguro e único para um ativo e intervalo."""
+        slug = re.sub(r'[^0-9a-z]+', '_', asset_key.lower())
+        digest = hashlib.sha1(asset_key.encode('utf-8')).hexdigest()[:8]
+        return f"bars_{slug}_{digest}_{interval}.bin"
+
+    def buffer(self, asset_key, interval):
+        key = (asset_key, interval)
+        with self._lock:
+            ring = self._buffers.get(key)
+            if ring is None:
+                path = os.path.join(self.directory, self._file_name(asset_key, interval))
+                ring = self._buffers[key] = BarRingBuffer(path, INTRADAY_CAPACITY[interval])
+            return ring
+
+    def needs_refresh(self, asset_key, interval):
+        """Indica se já passou um intervalo desde a última busca do ativo."""
+        with self._lock:
+            fetched_at = self._fetched_at.get((asset_key, interval))
+        return fetched_at is None or time.time() - fetched_at >= INTERVAL_SECONDS[interval]
+
+    def write(self, asset_key, interval, series):
+        """Grava as barras de uma série no buffer do ativo."""
+        timestamps, prices = bars_to_arrays(series, interval)
+        self.buffer(asset_key, interval).extend(timestamps, prices)
+        with self._lock:
+            self._fetched_at[(asset_key, interval)] = time.time()
+
+    def read(self, asset_key, interval, since=None):
+        """Série de fechamentos (índice em UTC, sem fuso) apoiada diretamente no buffer."""
+        times, prices = self.buffer(asset_key, interval).window(since)
+        index = pd.DatetimeIndex(times.view('datetime64[s]'), copy=False)
+        return pd.Series(prices, index=index, name='price', copy=False)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_intraday_store():
+    """Armazenamento intradiário compartilhado pelo processo (criado sob demanda)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IntradayStore()
+    return _store
@@ -0,0 +1,232 @@
+"""Dados de mercado compactos em memória, com um orçamento por servidor.
+
+Séries diárias são guardadas como um eixo de datas (dias desde 1970, em
+int32) e valores em float32. Séries com as mesmas datas (ações da mesma
+bolsa, criptomoedas) apontam para um único eixo, e as strings das chaves
+são internadas. Históricos, indicadores, curvas do portfólio e figuras
+prontas dividem o mesmo orçamento de memória do processo, comum a todas as
+sessões; ao estourá-lo, saem as entradas usadas há mais tempo.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .metrics import get_metrics
+
+# Orçamento de memória dos dados de mercado do processo (MB)
+MEMORY_BUDGET_ENV = "TICKER_TRACKER_MEMORY_BUDGET_MB"
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+def memory_budget_bytes():
+    """Orçamento em bytes: `TICKER_TRACKER_MEMORY_BUDGET_MB` ou o padrão."""
+    return int(float(os.environ.get(MEMORY_BUDGET_ENV, DEFAULT_MEMORY_BUDGET_MB)) * 1024 * 1024)
+
+def intern_key(key):
+    """Chave com as strings internadas (uma só cópia de cada identificador no processo)."""
+    if isinstance(key, str):
+        return sys.intern(key)
+    if isinstance(key, tuple):
+        return tuple(intern_key(part) for part in key)
+    return key
+
+def _day_number(date):
+    """Dias desde 1970-01-01 de uma data (string ou Timestamp)."""
+    return int(pd.Timestamp(date).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+class CompactSeries:
+    """Série (ou tabela) diária compacta: eixo de dias em int32 e valores em float32.
+
+    Com `columns`, `values` tem uma coluna por nome; sem, é uma Series.
+    As leituras devolvem objetos pandas novos, em float64.
+    """
+    __slots__ = ('axis', 'values', 'columns', 'name', 'index_name')
+
+    def __init__(self, axis, values, columns=None, name=None, index_name=None):
+        self.axis = axis
+        self.values = values
+        self.columns = columns
+        self.name = name
+        self.index_name = index_name
+
+    @classmethod
+    def from_pandas(cls, data, dtype=np.float32):
+        """Compacta uma Series/DataFrame com índice diário (sem horário)."""
+        dates = pd.DatetimeIndex(data.index).to_numpy(dtype='datetime64[ns]')
+        days = dates.astype('datetime64[D]')
+        if (days != dates).any():
+            raise ValueError("Só séries diárias (sem horário) podem ser compactadas")
+        values = data.to_numpy(dtype=dtype)
+        values.flags.writeable = False
+        if isinstance(data, pd.Series):
+            return cls(days.astype(np.int32), values, name=data.name, index_name=data.index.name)
+        return cls(days.astype(np.int32), values, columns=intern_key(tuple(data.columns)),
+                   index_name=data.index.name)
+
+    def __len__(self):
+        return len(self.axis)
+
+    @property
+    def nbytes(self):
+        """Bytes dos valores (o eixo é contado uma vez por eixo compartilhado)."""
+        return self.values.nbytes
+
+    def to_pandas(self, start=None):
+        """Series/DataFrame em float64 a partir de `start` (inclusive)."""
+        axis, values = self.axis, self.values
+        if start is not None:
+            first = int(np.searchsorted(axis, _day_number(start), side='left'))
+            axis, values = axis[first:], values[first:]
+        index = pd.DatetimeIndex(axis.astype('datetime64[D]').astype('datetime64[ns]'), name=self.index_name)
+        values = values.astype(np.float64)
+        if self.columns is None:
+            return pd.Series(values, index=index, name=self.name)
+        return pd.DataFrame(values, index=index, columns=list(self.columns))
+
+class MarketDataCache:
+    """Cache LRU thread-safe limitado em bytes, compartilhado por todas as sessões.
+
+    Series/DataFrames diários entram como `CompactSeries`; outros objetos
+    (ex.: figuras) entram com o tamanho estimado por quem os guarda. Cada
+    entrada tem um carimbo (`stamp`) com a versão dos dados de origem e,
+    opcionalmente, uma validade em segundos.
+    """
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = memory_budget_bytes() if budget_bytes is None else budget_bytes
+        self._entries = OrderedDict()  # chave -> (stamp, valor, bytes, eixo, inserido_em, expira_em)
+        self._axes = {}                # digest do eixo -> [eixo, entradas que o usam]
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def get(self, key):
+        """(stamp, valor) se presente e dentro da validade; caso contrário None."""
+        key = intern_key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[5] is not None and time.monotonic() >= entry[5]:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, value, stamp=None, ttl=None, nbytes=None, dtype=np.float32):
+        """Guarda `value` e devolve o que ficou em memória (a `CompactSeries`, para dados pandas).
+
+        Entradas maiores que o orçamento inteiro não são guardadas.
+        """
+        key = intern_key(key)
+        digest = None
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            value = CompactSeries.from_pandas(value, dtype)
+            digest = hashlib.blake2b(value.axis.tobytes(), digest_size=16).digest()
+            nbytes = value.nbytes
+            if nbytes + value.axis.nbytes > self.budget_bytes:
+                return value
+        elif nbytes is None:
+            raise ValueError("Informe `nbytes` para valores que não são séries pandas")
+        elif nbytes > self.budget_bytes:
+            return value
+
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if digest is not None:
+                value.axis = self._intern_axis(value.axis, digest)
+            self._entries[key] = (stamp, value, nbytes, digest, now, now + ttl if ttl is not None else None)
+            self.used_bytes += nbytes
+            # A entrada recém-gravada é a última do LRU e nunca é a removida
+            while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+                self.evicted_bytes += self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def _intern_axis(self, axis, digest):
+        shared = self._axes.get(digest)
+        if shared is None or not np.array_equal(shared[0], axis):
+            axis.flags.writeable = False
+            shared = self._axes[digest] = [axis, 0]
+            self.used_bytes += axis.nbytes
+        shared[1] += 1
+        return shared[0]
+
+    def _drop(self, key):
+        """Remove uma entrada (com o lock) e retorna os bytes liberados."""
+        _, _, nbytes, digest, _, _ = self._entries.pop(key)
+        freed = nbytes
+        shared = self._axes.get(digest) if digest is not None else None
+        if shared is not None:
+            shared[1] -= 1
+            if not shared[1]:
+                del self._axes[digest]
+                freed += shared[0].nbytes
+        self.used_bytes -= freed
+        return freed
+
+    def invalidate(self, key):
+        """Remove uma entrada específica do cache."""
+        key = intern_key(key)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        """Esvazia o cache (os contadores são mantidos)."""
+        with self._lock:
+            self._entries.clear()
+            self._axes.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        """Tamanho, memória usada, contadores e idade da entrada mais antiga."""
+        with self._lock:
+            now = time.monotonic()
+            oldest_age = max((now - entry[4] for entry in self._entries.values()), default=0)
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self.used_bytes,
+                'budget_bytes': self.budget_bytes,
+                'axes': len(self._axes),
+                'axis_bytes': sum(axis.nbytes for axis, _ in self._axes.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'oldest_age': oldest_age,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_market_data_cache():
+    """Cache de dados de mercado do processo (criado sob demanda com o orçamento configurado)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MarketDataCache()
+                get_metrics().register_cache("market_data", _cache)
+    return _cache
+
+def set_market_data_cache(cache):
+    """Substitui o cache de dados de mercado do processo (ex.: outro orçamento)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+    get_metrics().register_cache("market_data", cache)
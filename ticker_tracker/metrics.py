@@ -0,0 +1,276 @@
+"""Métricas internas: latência por provedor, erros, caches e tempo de rerun.
+
+Registro em memória compartilhado pelo processo. Pode ser exportado em texto
+no formato de exposição do Prometheus ou em JSON e, opcionalmente, servido
+por HTTP para coleta (`start_metrics_server`).
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prefixo dos nomes exportados
+METRICS_PREFIX = "ticker_tracker"
+
+# Limites superiores dos baldes de latência (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Histograma de baldes fixos com soma, contagem e máximo."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # último balde: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimativa do quantil pelo limite superior do balde que o contém."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else repr(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class _Timer:
+    """Context manager de `MetricsRegistry.time` (mais leve que um gerador, usado em caminhos quentes)."""
+    __slots__ = ('registry', 'key', 'start')
+
+    def __init__(self, registry, key):
+        self.registry = registry
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._observe(self.key, time.perf_counter() - self.start)
+        return False
+
+class MetricsRegistry:
+    """Contadores, medidores e histogramas identificados por nome e rótulos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (nome, rótulos) -> valor
+        self._gauges = {}      # (nome, rótulos) -> valor
+        self._histograms = {}  # (nome, rótulos) -> Histogram
+        self._caches = {}      # nome -> objeto com stats() (PriceCache)
+        self._http_clients = {}  # nome -> HttpClient
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        self._observe((name, _label_key(labels)), value)
+
+    def _observe(self, key, value):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def time(self, name, **labels):
+        """Mede a duração do bloco em segundos no histograma `name`."""
+        return _Timer(self, (name, _label_key(labels)))
+
+    def register_cache(self, name, cache):
+        """Inclui as estatísticas de um cache (`stats()`) nas exportações."""
+        with self._lock:
+            self._caches[name] = cache
+
+    def register_http_client(self, name, client):
+        """Inclui as estatísticas de conexões de um HttpClient nas exportações."""
+        with self._lock:
+            self._http_clients[name] = client
+
+    def reset(self):
+        """Zera contadores, medidores e histogramas (os caches continuam registrados)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _collect_caches(caches, counters, gauges):
+        for cache_name, cache in caches:
+            stats = cache.stats()
+            labels = (('cache', cache_name),)
+            counters[('cache_hits_total', labels)] = stats['hits']
+            counters[('cache_misses_total', labels)] = stats['misses']
+            counters[('cache_evictions_total', labels)] = stats['evictions']
+            gauges[('cache_hit_ratio', labels)] = stats['hit_ratio']
+            gauges[('cache_size', labels)] = stats['size']
+            gauges[('cache_oldest_age_seconds', labels)] = stats['oldest_age']
+            if 'bytes' in stats:
+                # Caches limitados em memória (ex.: dados de mercado)
+                gauges[('cache_bytes', labels)] = stats['bytes']
+                gauges[('cache_budget_bytes', labels)] = stats['budget_bytes']
+                counters[('cache_evicted_bytes_total', labels)] = stats['evicted_bytes']
+
+    @staticmethod
+    def _collect_http_clients(clients, counters, gauges):
+        for client_name, client in clients:
+            stats = client.stats()
+            labels = (('client', client_name),)
+            counters[('http_requests_total', labels)] = stats['requests']
+            counters[('http_connections_opened_total', labels)] = stats['connections_opened']
+            counters[('http_not_modified_total', labels)] = stats['not_modified']
+            gauges[('http_connection_reuse_ratio', labels)] = stats['connection_reuse_ratio']
+
+    def snapshot(self):
+        """Cópia consistente de todas as métricas como estruturas simples."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: histogram.to_dict() for key, histogram in self._histograms.items()}
+            caches = list(self._caches.items())
+            http_clients = list(self._http_clients.items())
+        # Fora do lock: caches e clientes têm os seus próprios
+        self._collect_caches(caches, counters, gauges)
+        self._collect_http_clients(http_clients, counters, gauges)
+
+        def rows(items, field):
+            return [{'name': name, 'labels': dict(labels), field: value}
+                    for (name, labels), value in sorted(items.items())]
+
+        return {
+            'timestamp': time.time(),
+            'counters': rows(counters, 'value'),
+            'gauges': rows(gauges, 'value'),
+            'histograms': [{'name': name, 'labels': dict(labels), **data}
+                           for (name, labels), data in sorted(histograms.items())],
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_text(self):
+        """Exportação no formato texto do Prometheus."""
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for kind, rows in (('counter', snapshot['counters']), ('gauge', snapshot['gauges'])):
+            for row in rows:
+                name = f"{METRICS_PREFIX}_{row['name']}"
+                declare(name, kind)
+                lines.append(f"{name}{_format_labels(row['labels'])} {_format_value(row['value'])}")
+        for row in snapshot['histograms']:
+            name = f"{METRICS_PREFIX}_{row['name']}"
+            declare(name, 'histogram')
+            for bound, count in row['buckets'].items():
+                lines.append(f"{name}_bucket{_format_labels(row['labels'], le=bound)} {count}")
+            lines.append(f"{name}_sum{_format_labels(row['labels'])} {_format_value(row['sum'])}")
+            lines.append(f"{name}_count{_format_labels(row['labels'])} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels, **extra):
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in items.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(items, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+_registry = MetricsRegistry()
+
+def get_metrics():
+    """Registro de métricas único para o processo."""
+    return _registry
+
+@contextmanager
+def track_request(provider, endpoint):
+    """Mede uma chamada a um provedor, contando erros e timeouts."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        import requests
+
+        kind = "timeout" if isinstance(e, (TimeoutError, requests.Timeout)) else "error"
+        _registry.inc("provider_errors_total", provider=provider, endpoint=endpoint, kind=kind)
+        raise
+    finally:
+        _registry.observe("provider_request_seconds", time.perf_counter() - start,
+                          provider=provider, endpoint=endpoint)
+
+# --- Exposição por HTTP ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path in ("/metrics", "/"):
+            body, content_type = _registry.to_text(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = _registry.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve `/metrics` (texto) e `/metrics.json` em uma thread daemon (uma vez por processo)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
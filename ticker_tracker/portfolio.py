@@ -0,0 +1,186 @@
+"""Organização e análise vetorizada das posições da carteira."""
+import numpy as np
+import pandas as pd
+
+from .fx import native_currencies
+from .pricing import get_portfolio_prices
+
+def extract_category_from_display_name(display_name):
+    """Extrai a categoria do display_name dos ativos."""
+    if ' - ' in display_name:
+        category = display_name.split(' - ')[0]
+        # Remove texto entre parênteses se houver
+        if '(' in category:
+            category = category.split('(')[0].strip()
+        return category
+    return "SEM CATEGORIA"
+
+def organize_assets_by_category(assets):
+    """Organiza ativos por categoria."""
+    categories = {}
+    
+    # Organizar ações por categoria
+    for stock in assets.get('stocks', []):
+        category = extract_category_from_display_name(stock['display_name'])
+        if category not in categories:
+            categories[category] = {'stocks': [], 'cryptos': []}
+        categories[category]['stocks'].append(stock)
+    
+    # Organizar criptomoedas (categoria CRYPTO)
+    if assets.get('cryptos'):
+        categories['CRYPTO'] = {'stocks': [], 'cryptos': assets['cryptos']}
+    
+    return categories
+
+def position_metrics(quantity, purchase_price, current_price):
+    """Retorna (variação %, valor atual, total investido).
+
+    Aceita escalares ou arrays/Series, de modo que a mesma fórmula atende um
+    único ativo e o portfólio inteiro.
+    """
+    purchase_total = purchase_price * quantity
+    current_value = current_price * quantity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variation = (current_price - purchase_price) / purchase_price * 100
+    return variation, current_value, purchase_total
+
+def _categories_from_display_names(display_names):
+    """Versão vetorizada de `extract_category_from_display_name`."""
+    has_separator = display_names.str.contains(' - ', regex=False)
+    head = display_names.str.split(' - ', n=1).str[0]
+    head = head.where(~head.str.contains('(', regex=False), head.str.split('(', n=1).str[0].str.strip())
+    return head.where(has_separator, "SEM CATEGORIA")
+
+def build_holdings_frame(assets):
+    """Carrega os ativos em um DataFrame tipado, uma linha por posição.
+
+    Colunas: identifier, api_choice, price_key, display_name, short_name,
+    symbol, category, purchase_date, quantity, purchase_price (custo médio)
+    e os agregados do livro de operações: realized_pnl, realized_pnl_fifo e
+    fifo_cost (carteiras sem livro têm lucro realizado zero e custo FIFO
+    igual ao custo médio). Valores monetários estão na moeda nativa de cada
+    posição, indicada em `currency`.
+    """
+    fields = ['display_name', 'purchase_date', 'quantity', 'purchase_price',
+              'realized_pnl', 'realized_pnl_fifo', 'fifo_cost']
+    # Linhas normalizadas em Python e carregadas em um único construtor (sem concat/assign por tipo)
+    rows = [
+        dict({field: stock.get(field) for field in fields},
+             identifier=stock.get('ticker'), symbol=stock.get('ticker'), api_choice="yahoo_stock")
+        for stock in assets.get('stocks', [])
+    ] + [
+        dict({field: crypto.get(field) for field in fields},
+             identifier=crypto.get('id'), symbol=crypto.get('symbol'), api_choice="coingecko")
+        for crypto in assets.get('cryptos', [])
+    ]
+    frame = pd.DataFrame(rows, columns=['identifier', 'api_choice', 'symbol'] + fields)
+
+    display_names = frame['display_name'].astype(str)
+    is_stock = frame['api_choice'] == "yahoo_stock"
+    category = _categories_from_display_names(display_names).where(is_stock, "CRYPTO")
+    quantity = frame['quantity'].astype('float64')
+    purchase_price = frame['purchase_price'].astype('float64')
+
+    # Colunas montadas de uma vez: inserções uma a uma custam caro em carteiras com muitas categorias
+    return pd.DataFrame({
+        'identifier': frame['identifier'],
+        'api_choice': frame['api_choice'].astype('category'),
+        'display_name': frame['display_name'],
+        'symbol': frame['symbol'],
+        'purchase_date': frame['purchase_date'],
+        'quantity': quantity,
+        'purchase_price': purchase_price,
+        'realized_pnl': frame['realized_pnl'].astype('float64').fillna(0.0),
+        'realized_pnl_fifo': frame['realized_pnl_fifo'].astype('float64').fillna(0.0),
+        'fifo_cost': frame['fifo_cost'].astype('float64').fillna(quantity * purchase_price),
+        'price_key': frame['api_choice'] + "_" + frame['identifier'].astype(str),
+        'currency': native_currencies(frame['api_choice'], frame['identifier']).astype('category'),
+        'short_name': display_names.str.split(' - ').str[1].fillna(display_names).where(is_stock, display_names),
+        # Categorias na ordem de primeira ocorrência (ações primeiro, CRYPTO por último)
+        'category': pd.Categorical(category, categories=pd.unique(category)),
+    })
+
+def convert_currency(frame, fx_rates):
+    """Converte os valores monetários do frame para a moeda de referência em uma operação.
+
+    `fx_rates` é o dicionário {moeda: fator} de `get_fx_rates`; moedas sem
+    taxa ficam sem conversão.
+    """
+    rate = frame['currency'].astype(object).map(fx_rates).astype('float64').fillna(1.0)
+    return frame.assign(**{column: frame[column] * rate
+                           for column in ('purchase_price', 'fifo_cost', 'realized_pnl', 'realized_pnl_fifo')}), rate
+
+def compute_holdings_analytics(frame, prices, fx_rates=None, stale=None):
+    """Calcula métricas por posição e totais por categoria em uma passada.
+
+    Com `fx_rates`, cotações e valores de compra são convertidos para a
+    moeda de referência antes dos totais (sem consultas por ativo).
+    Ativos sem cotação em `prices` usam o preço de compra (`priced` falso);
+    os avaliados pela última cotação conhecida (`stale`, de
+    `get_prices_batch`) trazem a idade dela em `quote_age`. Retorna o frame
+    com as colunas de métricas e um DataFrame de totais por categoria. O
+    lucro não realizado vem do custo médio (`profit_loss`) e do custo FIFO
+    (`unrealized_pnl_fifo`); o realizado vem dos agregados do livro.
+    """
+    price_lookup = pd.Series(dict(prices), dtype='float64')
+    current_price = frame['price_key'].map(price_lookup)
+    priced = current_price.notna() & (current_price > 0)
+    if fx_rates is not None:
+        frame, rate = convert_currency(frame, fx_rates)
+        current_price = current_price * rate
+    current_price = current_price.where(priced, frame['purchase_price'])
+
+    variation, current_value, invested = position_metrics(frame['quantity'], frame['purchase_price'], current_price)
+    total_invested = invested.sum()
+    holdings = frame.assign(
+        current_price=current_price,
+        priced=priced,
+        quote_age=frame['price_key'].map(pd.Series(dict(stale or {}), dtype='float64')),
+        invested=invested,
+        current_value=current_value,
+        profit_loss=current_value - invested,
+        unrealized_pnl_fifo=current_value - frame['fifo_cost'],
+        variation=variation,
+        weight=(invested / total_invested * 100) if total_invested > 0 else 0.0,
+    )
+
+    # Uma soma sobre as colunas selecionadas sai bem mais barata que a agregação nomeada
+    grouped = holdings.groupby('category', observed=True, sort=False)
+    by_category = grouped[['invested', 'current_value', 'realized_pnl', 'realized_pnl_fifo']].sum().rename(
+        columns={'invested': 'total_invested', 'current_value': 'total_current'})
+    by_category.insert(2, 'asset_count', grouped.size())
+    by_category['profit_loss'] = by_category['total_current'] - by_category['total_invested']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        by_category['profit_loss_pct'] = np.where(
+            by_category['total_invested'] > 0,
+            by_category['profit_loss'] / by_category['total_invested'] * 100, 0.0)
+    by_category['weight'] = (by_category['total_invested'] / total_invested * 100) if total_invested > 0 else 0.0
+    return holdings, by_category
+
+def calculate_category_totals(category_assets, prices=None, errors=None, fx_rates=None):
+    """Calcula totais investidos e valores atuais por categoria.
+
+    `prices` é o dicionário retornado por `get_portfolio_prices`; se omitido,
+    os preços da categoria são obtidos em lote (erros vão para `errors`).
+    Com `fx_rates`, os totais ficam na moeda de referência.
+    """
+    stale = {}
+    if prices is None:
+        prices = get_portfolio_prices(category_assets, errors, stale=stale)
+
+    holdings, _ = compute_holdings_analytics(build_holdings_frame(category_assets), prices, fx_rates, stale)
+    total_invested = float(holdings['invested'].sum())
+    total_current = float(holdings['current_value'].sum())
+    
+    return {
+        'total_invested': total_invested,
+        'total_current': total_current,
+        'asset_count': len(holdings),
+        # Avaliados pela última cotação conhecida e pelo preço de compra (sem cotação)
+        'stale_count': int(holdings['quote_age'].notna().sum()),
+        'unpriced_count': int((~holdings['priced']).sum()),
+        'profit_loss': total_current - total_invested,
+        'profit_loss_pct': ((total_current - total_invested) / total_invested * 100) if total_invested > 0 else 0,
+        'realized_pnl': float(holdings['realized_pnl'].sum()),
+        'realized_pnl_fifo': float(holdings['realized_pnl_fifo'].sum()),
+    }
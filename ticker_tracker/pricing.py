@@ -0,0 +1,235 @@
+"""Motor de cotações em lote: um pedido por provedor, não por ativo.
+
+As cotações também passam pelo quadro compartilhado entre processos
+(`board.py`): o que outra réplica já buscou é lido de lá, e cada chave é
+reservada por um único processo enquanto é buscada.
+
+Quando um provedor falha, está com o disjuntor aberto ou demora mais que o
+limite de espera pedido, o ativo recebe a última cotação conhecida (da
+memória ou do último fechamento armazenado), marcada com a sua idade.
+"""
+import time
+from concurrent.futures import wait
+
+from .board import get_quote_board
+from .cache import (CACHE_TTL_SECONDS, DEFAULT_CACHE_TTL_SECONDS, LAST_KNOWN_PRICE_TTL_SECONDS, get_cached_price,
+                    get_last_known_price, get_price_cache, price_cache_key, set_cached_price)
+from .executor import get_fetch_executor
+from .history import get_history_store
+from .metrics import get_metrics
+from .providers import PRICE_FETCHERS
+from .singleflight import SingleFlight
+
+# Espera máxima das páginas por um lote que já tem cotações conhecidas para servir (segundos)
+QUOTE_MAX_WAIT_SECONDS = 0.5
+
+# Cotações sendo buscadas agora, compartilhadas entre sessões e threads
+_price_flight = SingleFlight("prices")
+
+def _chunks(items, size):
+    """Divide uma lista em lotes de tamanho fixo."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _fetch_chunk(api_choice, fetch_chunk, chunk, chunk_flights):
+    """Busca um lote, grava as cotações no cache e no quadro e libera quem as aguarda."""
+    board = get_quote_board()
+    try:
+        provider_prices = fetch_chunk(chunk)
+    except Exception as e:
+        # As chaves são liberadas também em caso de erro, para não bloquear quem aguarda
+        _price_flight.resolve(chunk_flights, error=e)
+        board.release(chunk_flights)
+        raise
+    fetched = {}
+    for identifier, price in provider_prices.items():
+        cache_key = price_cache_key(api_choice, identifier)
+        set_cached_price(cache_key, price, api_choice)
+        fetched[cache_key] = price
+    _price_flight.resolve(chunk_flights, fetched)
+    # Publica para as outras réplicas e libera as reservas na mesma transação
+    board.put_many(fetched, release=chunk_flights)
+    return fetched
+
+def _read_board(api_choice, keys, max_age):
+    """Cotações do quadro mais novas que `max_age`, copiadas para o cache do processo: {chave: preço}."""
+    now = time.time()
+    prices = {}
+    for cache_key, (price, fetched_at) in get_quote_board().get_many(keys, max_age).items():
+        set_cached_price(cache_key, price, api_choice, age=max(0.0, now - fetched_at))
+        prices[cache_key] = price
+    if prices:
+        get_metrics().inc("quotes_shared_total", len(prices), provider=api_choice)
+    return prices
+
+def _last_known_prices(cache_keys):
+    """Últimas cotações conhecidas {chave: (preço, idade)}: memória, quadro compartilhado e histórico local."""
+    known = {}
+    for cache_key in cache_keys:
+        entry = get_last_known_price(cache_key)
+        if entry is not None:
+            known[cache_key] = entry
+    now = time.time()
+    remaining = [cache_key for cache_key in cache_keys if cache_key not in known]
+    if remaining:
+        for cache_key, (price, fetched_at) in get_quote_board().get_many(remaining,
+                                                                          LAST_KNOWN_PRICE_TTL_SECONDS).items():
+            known[cache_key] = (price, max(0.0, now - fetched_at))
+    remaining = [cache_key for cache_key in remaining if cache_key not in known]
+    if remaining:
+        for cache_key, (price, updated_at) in get_history_store().last_prices(remaining).items():
+            known[cache_key] = (price, max(0.0, now - updated_at))
+    return known
+
+def get_prices_batch(assets_to_price, errors=None, use_cache=True, stale=None, max_wait=None, max_age=None):
+    """Obtém preços de uma lista de pares (api_choice, identificador).
+
+    Consulta o cache primeiro e resolve o restante com uma chamada em lote
+    por provedor; os lotes são executados em paralelo pelo executor de
+    requisições. Cotações que outra chamada já está buscando não são
+    pedidas de novo: aguarda-se o resultado dela, também quando quem busca
+    é outro processo. Retorna um dicionário {chave_de_cache: preço}.
+    Mensagens de erro são acrescentadas a `errors`, se fornecida. Com
+    `use_cache=False` todas as cotações são buscadas novamente (e
+    regravadas no cache), exceto as que outro processo gravou no quadro
+    compartilhado há menos de `max_age` segundos.
+
+    Ativos sem cotação nova recebem a última conhecida; as suas chaves vão
+    para `stale` ({chave: idade em segundos}), se fornecido. Com `max_wait`,
+    lotes que têm cotação conhecida para todos os ativos e não terminam
+    nesse prazo seguem em segundo plano (e atualizam o cache) enquanto a
+    chamada já devolve as cotações conhecidas.
+    """
+    prices = {}
+    requested = {}  # chave -> api_choice
+    # Dicionários como conjuntos ordenados (evita duplicatas mantendo a ordem)
+    missing = {api_choice: {} for api_choice in PRICE_FETCHERS}
+
+    for api_choice, identifier in assets_to_price:
+        cache_key = price_cache_key(api_choice, identifier)
+        if cache_key in requested:
+            continue
+        requested[cache_key] = api_choice
+        cached_price = get_cached_price(cache_key) if use_cache else None
+        if cached_price is not None:
+            prices[cache_key] = cached_price
+        else:
+            missing[api_choice][identifier] = None
+    if not any(missing.values()):
+        # Tudo no cache: nada a buscar nem a aguardar
+        return prices
+
+    started = time.time()
+    executor = get_fetch_executor()
+    board = get_quote_board()
+    cache = get_price_cache()
+    futures = []
+    shared = []  # (api_choice, label, chave, Future) buscadas por outra chamada
+    remote = []  # (api_choice, label, {chave: Future}) reservadas por outro processo
+    for api_choice, identifiers in missing.items():
+        if not identifiers:
+            continue
+        fetch_chunk, batch_size, label = PRICE_FETCHERS[api_choice]
+        keys = {price_cache_key(api_choice, identifier): identifier for identifier in identifiers}
+        owned, in_flight = _price_flight.claim(keys)
+        shared.extend((api_choice, label, key, future) for key, future in in_flight.items())
+
+        if use_cache:
+            # Uma busca concorrente pode ter terminado entre a consulta ao cache e a reivindicação
+            cached = {key: cache.peek(key) for key in owned}
+            cached = {key: price for key, price in cached.items() if price is not None}
+            prices.update(cached)
+            _price_flight.resolve({key: owned.pop(key) for key in cached}, cached)
+
+        # Cotações que outra réplica buscou há pouco
+        board_max_age = CACHE_TTL_SECONDS.get(api_choice, DEFAULT_CACHE_TTL_SECONDS) if use_cache else max_age
+        if owned and board_max_age:
+            shared_prices = _read_board(api_choice, owned, board_max_age)
+            prices.update(shared_prices)
+            _price_flight.resolve({key: owned.pop(key) for key in shared_prices}, shared_prices)
+
+        # Só as chaves reservadas por este processo vão ao provedor
+        leased = board.acquire(owned)
+        remote.append((api_choice, label, {key: owned.pop(key) for key in list(owned) if key not in leased}))
+
+        for chunk in _chunks([keys[key] for key in owned], batch_size):
+            chunk_flights = {key: owned[key] for key in (price_cache_key(api_choice, i) for i in chunk)}
+            args = (api_choice, fetch_chunk, chunk, chunk_flights)
+            futures.append((api_choice, label, chunk, args, executor.submit(_fetch_chunk, *args)))
+
+    known = {}
+    if max_wait is not None:
+        deadline = time.monotonic() + max_wait
+        known = _last_known_prices([key for key in requested if key not in prices])
+
+    def finished(future, keys):
+        # Sem cotação conhecida para servir, vale esperar pela busca
+        if max_wait is None or any(key not in known for key in keys):
+            return True
+        return bool(wait([future], max(0.0, deadline - time.monotonic())).done)
+
+    metrics = get_metrics()
+    slow = {}
+    for api_choice, label, chunk, args, future in futures:
+        metrics.inc("quotes_requested_total", len(chunk), provider=api_choice)
+        if not finished(future, args[3]):
+            # A busca continua em segundo plano e atualiza o cache para as próximas chamadas
+            slow[label] = slow.get(label, 0) + len(chunk)
+            continue
+        try:
+            fetched = executor.result(future, _fetch_chunk, *args)
+        except Exception as e:
+            metrics.inc("quotes_missing_total", len(chunk), provider=api_choice)
+            if errors is not None:
+                errors.append(f"Erro ao obter preços de {label} ({len(chunk)} ativos): {e}")
+            continue
+        metrics.inc("quotes_missing_total", len(chunk) - len(fetched), provider=api_choice)
+        prices.update(fetched)
+
+    failed = {}
+    for _, label, cache_key, future in shared:
+        if not finished(future, (cache_key,)):
+            slow[label] = slow.get(label, 0) + 1
+            continue
+        try:
+            price = future.result()
+        except Exception as e:
+            failed.setdefault(label, [0, e])[0] += 1
+            continue
+        if price is not None:
+            prices[cache_key] = price
+    for api_choice, label, flights in remote:
+        if not flights:
+            continue
+        if max_wait is not None and all(key in known for key in flights):
+            timeout = max(0.0, deadline - time.monotonic())
+        else:
+            timeout = board.lease_seconds
+        if not board.wait_released(flights, timeout):
+            slow[label] = slow.get(label, 0) + len(flights)
+        # Resultado gravado pelo outro processo depois do início desta chamada
+        fetched = _read_board(api_choice, flights, time.time() - started)
+        prices.update(fetched)
+        _price_flight.resolve(flights, fetched)
+
+    if errors is not None:
+        for label, (count, error) in failed.items():
+            errors.append(f"Erro ao obter preços de {label} ({count} ativos): {error}")
+        for label, count in slow.items():
+            errors.append(f"Cotações de {label} demorando ({count} ativos); usando as últimas conhecidas.")
+
+    unpriced = [cache_key for cache_key in requested if cache_key not in prices]
+    if unpriced:
+        # As idades são relidas: uma busca lenta pode ter terminado enquanto se esperava pelas outras
+        for cache_key, (price, age) in _last_known_prices(unpriced).items():
+            prices[cache_key] = price
+            if stale is not None:
+                stale[cache_key] = age
+            metrics.inc("quotes_stale_total", provider=requested[cache_key])
+    return prices
+
+def get_portfolio_prices(assets, errors=None, use_cache=True, stale=None):
+    """Obtém os preços atuais de todos os ativos de um portfólio em lote."""
+    assets_to_price = [("yahoo_stock", s['ticker']) for s in assets.get('stocks', [])]
+    assets_to_price += [("coingecko", c['id']) for c in assets.get('cryptos', [])]
+    return get_prices_batch(assets_to_price, errors, use_cache, stale)
@@ -0,0 +1,210 @@
+"""Acesso aos provedores de dados: Yahoo Finance (ações) e CoinGecko (cripto).
+
+As funções deste módulo fazem as chamadas de rede e levantam exceções em
+caso de falha; quem chama decide como reportá-las. A CoinGecko é acessada
+pelo cliente HTTP compartilhado (conexões persistentes e novas tentativas),
+com o limitador do provedor em volta de cada tentativa, não das esperas.
+O `yfinance` é importado apenas na primeira chamada, pois sua importação é
+lenta. Ele registra falhas de rede em log e devolve tabelas vazias; aqui
+elas viram exceções dentro do limitador, para o disjuntor do Yahoo contá-las.
+A lista de ações da B3 usada no autocompletar vem da listagem pública da
+brapi.dev, pois o Yahoo não lista os tickers por bolsa.
+"""
+import os
+import warnings
+
+import pandas as pd
+import requests
+
+from .executor import get_fetch_executor
+from .httpclient import HTTP_TIMEOUT_SECONDS, get_coingecko_client
+from .metrics import track_request
+
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+# Listagem de ativos da B3 (ações, FIIs, BDRs), em páginas; o token é opcional
+B3_LISTING_URL = "https://brapi.dev/api/quote/list"
+B3_LISTING_PAGE_SIZE = 1000
+B3_LISTING_TOKEN_ENV = "BRAPI_TOKEN"
+# Sufixo dos tickers da B3 no Yahoo
+B3_YAHOO_SUFFIX = ".SA"
+# A API pública da CoinGecko só tem preços a cada ~5 minutos (últimas 24h):
+# não há barras de 1 minuto para criptomoedas
+COINGECKO_INTRADAY_INTERVALS = ("5m", "15m")
+
+# Tamanho máximo de cada lote enviado aos provedores
+YAHOO_BATCH_SIZE = 100
+COINGECKO_BATCH_SIZE = 250
+
+def _yahoo_missing_errors():
+    """Exceções do yfinance para ticker sem dados (o provedor respondeu; não é queda)."""
+    try:
+        from yfinance import exceptions
+    except ImportError:
+        # Versões antigas (ou substitutos do módulo) sem exceções próprias
+        return ()
+    # Sem YFTzMissingError: ele também aparece quando a consulta do fuso falhou por rede
+    names = ("YFPricesMissingError", "YFTickerMissingError", "YFInvalidPeriodError")
+    return tuple(getattr(exceptions, name) for name in names if hasattr(exceptions, name))
+
+def _yahoo_history(ticker, **kwargs):
+    """`Ticker.history` que levanta as falhas de rede/HTTP em vez de devolver uma tabela vazia.
+
+    Ticker sem dados (removido da bolsa, período sem pregão) continua
+    resultando em tabela vazia.
+    """
+    with warnings.catch_warnings():
+        # Nas versões recentes o parâmetro está obsoleto, mas ainda é respeitado
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            return ticker.history(raise_errors=True, **kwargs)
+        except _yahoo_missing_errors():
+            return pd.DataFrame()
+
+def _close_frame(data, tickers):
+    """Fechamentos de um `yf.download` como tabela (datas × ticker), ou None se vazio."""
+    if data is None or data.empty or 'Close' not in data:
+        return None
+    close = data['Close']
+    # Versões antigas do yfinance retornam Series quando há um único ticker
+    if isinstance(close, pd.Series):
+        close = close.to_frame(name=tickers[0])
+    return None if close.isna().all().all() else close
+
+def fetch_stock_prices_chunk(tickers):
+    """Obtém o último preço de um lote de ações com um único download do Yahoo.
+
+    Se nenhum ticker do lote vier com preço, uma consulta de teste distingue
+    queda do provedor (exceção) de tickers sem dados (lote vazio).
+    """
+    import yfinance as yf
+
+    with get_fetch_executor().limit("yahoo_stock"), track_request("yahoo_stock", "download"):
+        data = yf.download(tickers, period="5d", interval="1d", auto_adjust=False,
+                           progress=False, threads=True)
+        close = _close_frame(data, tickers)
+        if close is None:
+            _yahoo_history(yf.Ticker(tickers[0]), period="5d", interval="1d")
+    if close is None:
+        return {}
+
+    last_prices = close.ffill().iloc[-1]
+
+    prices = {}
+    for ticker in tickers:
+        price = last_prices.get(ticker)
+        if price is not None and pd.notna(price):
+            prices[ticker] = float(price)
+    return prices
+
+def fetch_crypto_prices_chunk(crypto_ids):
+    """Obtém o preço de um lote de criptomoedas com uma chamada `ids=`."""
+    params = {'ids': ','.join(crypto_ids), 'vs_currencies': 'usd'}
+    with track_request("coingecko", "simple/price"):
+        data = get_coingecko_client().get_json(f"{COINGECKO_BASE_URL}/simple/price", params=params,
+                                               guard=get_fetch_executor().limit("coingecko"))
+
+    prices = {}
+    for crypto_id in crypto_ids:
+        try:
+            prices[crypto_id] = float(data[crypto_id]['usd'])
+        except (KeyError, TypeError, ValueError):
+            pass
+    return prices
+
+def fetch_crypto_symbols():
+    """Lista completa de moedas da CoinGecko como [(id, símbolo, nome)]."""
+    with track_request("coingecko", "coins/list"):
+        data = get_coingecko_client().get_json(f"{COINGECKO_BASE_URL}/coins/list",
+                                               guard=get_fetch_executor().limit("coingecko"))
+    return [(coin['id'], coin.get('symbol') or "", coin.get('name') or "")
+            for coin in data if coin.get('id')]
+
+def fetch_stock_symbols():
+    """Ativos negociados na B3 como [(ticker do Yahoo, nome)], de todas as páginas da listagem."""
+    params = {'limit': B3_LISTING_PAGE_SIZE, 'page': 1, 'sortBy': 'name', 'sortOrder': 'asc'}
+    if os.environ.get(B3_LISTING_TOKEN_ENV):
+        params['token'] = os.environ[B3_LISTING_TOKEN_ENV]
+    symbols = []
+    while True:
+        with track_request("brapi", "quote/list"):
+            response = requests.get(B3_LISTING_URL, params=params, timeout=HTTP_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            data = response.json()
+        for item in data.get('stocks') or []:
+            ticker = (item.get('stock') or "").strip().upper()
+            if ticker:
+                symbols.append((f"{ticker}{B3_YAHOO_SUFFIX}", " ".join((item.get('name') or ticker).split())))
+        if not data.get('hasNextPage'):
+            return symbols
+        params['page'] += 1
+
+# Função de busca, tamanho de lote e rótulo por provedor
+PRICE_FETCHERS = {
+    "yahoo_stock": (fetch_stock_prices_chunk, YAHOO_BATCH_SIZE, "ações"),
+    "coingecko": (fetch_crypto_prices_chunk, COINGECKO_BATCH_SIZE, "criptomoedas"),
+}
+
+def normalize_daily_series(series):
+    """Normaliza uma série de preços para uma barra por dia (sem fuso horário)."""
+    if series.empty:
+        return pd.Series(dtype=float)
+    index = pd.DatetimeIndex(series.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    series = pd.Series(series.values, index=index.normalize(), name='price').astype(float)
+    return series[~series.index.duplicated(keep='last')].sort_index()
+
+def fetch_crypto_history(crypto_id, days_or_period):
+    """Baixa o histórico diário de uma criptomoeda (`days` ou "max")."""
+    url = f"{COINGECKO_BASE_URL}/coins/{crypto_id}/market_chart"
+    params = {'vs_currency': 'usd', 'days': days_or_period, 'interval': 'daily'}
+
+    with track_request("coingecko", "market_chart"):
+        data = get_coingecko_client().get_json(url, params=params, guard=get_fetch_executor().limit("coingecko"))
+    prices = data.get('prices', [])
+    if not prices:
+        return pd.Series(dtype=float)
+    timestamps, values = zip(*prices)
+    return normalize_daily_series(pd.Series(values, index=pd.to_datetime(timestamps, unit='ms')))
+
+def fetch_stock_history(stock_ticker, period=None, start=None):
+    """Baixa o histórico diário de uma ação por período ("30d", "max") ou data inicial."""
+    import yfinance as yf
+
+    ticker = yf.Ticker(stock_ticker)
+    with get_fetch_executor().limit("yahoo_stock"), track_request("yahoo_stock", "history"):
+        if start is not None:
+            hist = _yahoo_history(ticker, start=start, interval="1d")
+        else:
+            hist = _yahoo_history(ticker, period=period, interval="1d")
+    return normalize_daily_series(hist['Close']) if not hist.empty else pd.Series(dtype=float)
+
+def fetch_stock_intraday(stock_ticker, interval, period=None, start=None):
+    """Baixa barras intradiárias ("1m", "5m", "15m") de uma ação por período ou instante inicial."""
+    import yfinance as yf
+
+    ticker = yf.Ticker(stock_ticker)
+    with get_fetch_executor().limit("yahoo_stock"), track_request("yahoo_stock", "history_intraday"):
+        if start is not None:
+            hist = _yahoo_history(ticker, start=start, interval=interval)
+        else:
+            hist = _yahoo_history(ticker, period=period, interval=interval)
+    return hist['Close'].dropna() if not hist.empty else pd.Series(dtype=float)
+
+def fetch_crypto_intraday(crypto_id, since=None):
+    """Preços das últimas 24h de uma criptomoeda (pontos de ~5 minutos na API pública).
+
+    Com `since` (Timestamp em UTC), devolve só os pontos a partir dele: a
+    API não tem início para essa janela, então o filtro é feito aqui.
+    """
+    url = f"{COINGECKO_BASE_URL}/coins/{crypto_id}/market_chart"
+    params = {'vs_currency': 'usd', 'days': 1}
+
+    with track_request("coingecko", "market_chart_intraday"):
+        data = get_coingecko_client().get_json(url, params=params, guard=get_fetch_executor().limit("coingecko"))
+    prices = data.get('prices', [])
+    if not prices:
+        return pd.Series(dtype=float)
+    timestamps, values = zip(*prices)
+    series = pd.Series(values, index=pd.to_datetime(timestamps, unit='ms', utc=True), dtype=float)
+    return series[series.index >= since] if since is not None else series
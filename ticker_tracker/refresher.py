@@ -0,0 +1,131 @@
+"""Atualização de cotações em segundo plano com publicação de snapshots."""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+
+from .cache import price_cache_key
+from .holdings import get_holdings_store
+from .pricing import get_prices_batch
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre atualizações automáticas das cotações do portfólio (segundos)
+QUOTE_REFRESH_INTERVAL_SECONDS = 60
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """Cotações imutáveis do portfólio em um instante.
+
+    `stale` traz as cotações que vieram da última conhecida (provedor com
+    falha ou lento), com a idade que tinham quando a foto foi tirada.
+    """
+    prices: MappingProxyType
+    taken_at: datetime
+    errors: tuple = field(default_factory=tuple)
+    stale: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def age_seconds(self):
+        return (datetime.now() - self.taken_at).total_seconds()
+
+    def get(self, cache_key):
+        return self.prices.get(cache_key)
+
+    def quote_age(self, cache_key):
+        """Idade atual (segundos) da cotação de um ativo, contando a da foto."""
+        return self.stale.get(cache_key, 0.0) + self.age_seconds
+
+class QuoteRefresher:
+    """Thread que relê a carteira (banco de posições) e publica novas cotações.
+
+    As páginas leem a última `PriceSnapshot` publicada sem esperar pela rede;
+    `request_refresh` antecipa a próxima atualização. Assinantes (ex.: o
+    motor de alertas) recebem cada nova foto nesta mesma thread.
+    """
+
+    def __init__(self, interval=QUOTE_REFRESH_INTERVAL_SECONDS, store=None):
+        self.interval = interval
+        self.store = store
+        self._snapshot = None
+        self._subscribers = []
+        self._attempted = {}  # chave de preço -> instante (monotônico) da última rodada que a buscou
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="quote-refresher", daemon=True)
+        self._thread.start()
+
+    def latest(self):
+        """Última cotação publicada (ou None antes da primeira atualização)."""
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """Registra `callback(snapshot)`, chamado a cada foto publicada (deve retornar rápido)."""
+        self._subscribers.append(callback)
+
+    def request_refresh(self):
+        """Solicita uma atualização imediata sem bloquear quem chama."""
+        self._wakeup.set()
+
+    def request_missing(self, keys):
+        """Pede uma atualização para cotações ausentes não tentadas no último intervalo.
+
+        Um ativo que o provedor não cota (ex.: ticker deslistado) é pedido de
+        novo só depois de um intervalo, em vez de forçar uma rodada completa
+        a cada renderização. Retorna True se a atualização foi pedida.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [key for key in keys if key not in self._attempted or now - self._attempted[key] >= self.interval]
+            self._attempted.update(dict.fromkeys(due, now))
+        if due:
+            self.request_refresh()
+        return bool(due)
+
+    def refresh(self, force=True):
+        """Busca as cotações de todos os ativos configurados e publica o resultado.
+
+        Sem `force`, cotações que outra réplica gravou no quadro compartilhado
+        dentro do intervalo não são pedidas de novo.
+        """
+        errors, stale = [], {}
+        store = self.store or get_holdings_store()
+        assets = store.price_assets()
+        started = time.monotonic()
+        prices = get_prices_batch(assets, errors, use_cache=False, stale=stale,
+                                  max_age=None if force else self.interval)
+        with self._lock:
+            self._attempted = dict.fromkeys((price_cache_key(*asset) for asset in assets), started)
+        # A troca de referência é atômica: leitores veem a foto antiga ou a nova
+        self._snapshot = PriceSnapshot(MappingProxyType(dict(prices)), datetime.now(), tuple(errors),
+                                       MappingProxyType(stale))
+        for callback in list(self._subscribers):
+            try:
+                callback(self._snapshot)
+            except Exception:
+                logger.exception("Falha ao notificar assinante das cotações")
+
+    def _loop(self):
+        # Rodadas pedidas com `request_refresh` sempre vão aos provedores
+        force = False
+        while True:
+            self._wakeup.clear()
+            try:
+                self.refresh(force)
+            except Exception:
+                logger.exception("Falha ao atualizar cotações em segundo plano")
+            force = self._wakeup.wait(self.interval)
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def get_quote_refresher():
+    """Atualizador de cotações único para o processo (iniciado sob demanda)."""
+    global _refresher
+    if _refresher is None:
+        with _refresher_lock:
+            if _refresher is None:
+                _refresher = QuoteRefresher()
+    return _refresher
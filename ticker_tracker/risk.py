@@ -0,0 +1,316 @@
+"""Risco da carteira: volatilidade, correlação, beta e VaR/CVaR.
+
+Tudo sai de uma matriz de retornos diários (dias úteis × posição) alinhada,
+com o benchmark na última coluna. A covariância por pares é mantida por
+somas acumuladas (ΣrᵢΣrⱼ, Σrᵢrⱼ e contagens), de modo que a chegada de
+uma barra nova soma e subtrai só as linhas que entraram ou saíram da
+janela, em vez de refazer o produto da matriz inteira. Na atualização, só
+o trecho final dos preços é lido e realinhado.
+"""
+import copy
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .cache import PriceCache, price_cache_key
+from .executor import get_fetch_executor
+from .fx import FX_API_CHOICE, fx_ticker
+from .history import HISTORY_REFRESH_SECONDS, get_history_store
+from .metrics import get_metrics
+from .singleflight import SingleFlight
+from .timeseries import load_fx_matrix, load_price_matrix
+from .tracker import AssetTracker
+
+# Benchmarks oferecidos: rótulo -> (api_choice, identificador)
+RISK_BENCHMARKS = {
+    "Ibovespa (^BVSP)": ("yahoo_stock", "^BVSP"),
+    "S&P 500 (^GSPC)": ("yahoo_stock", "^GSPC"),
+    "Bitcoin": ("coingecko", "bitcoin"),
+}
+BENCHMARK_COLUMN = "benchmark"
+
+# Histórico carregado (dias corridos) e janela de retornos (dias úteis)
+RISK_LOOKBACK_DAYS = 365
+RISK_WINDOW_DAYS = 252
+ROLLING_VOLATILITY_DAYS = 21
+TRADING_DAYS_PER_YEAR = 252
+VAR_CONFIDENCES = (0.95, 0.99)
+
+# Atualizações incrementais antes de refazer as somas do zero (limita erro de arredondamento)
+RISK_REBUILD_UPDATES = 250
+RISK_MODEL_CACHE_SIZE = 16
+RISK_MODEL_TTL_SECONDS = 24 * 3600
+# Dias de câmbio lidos antes do primeiro preço (a primeira data usa o câmbio anterior)
+RISK_FX_MARGIN_DAYS = 10
+
+# Modelos publicados nunca são alterados: cada atualização monta uma cópia
+_risk_model_cache = PriceCache(max_size=RISK_MODEL_CACHE_SIZE)
+get_metrics().register_cache("risk_model", _risk_model_cache)
+_risk_flight = SingleFlight("risk_model")
+
+def return_matrix(prices):
+    """Retornos simples por dia útil; fins de semana de cripto entram no retorno de segunda-feira."""
+    if prices.empty:
+        return prices
+    dates = pd.bdate_range(prices.index.min(), prices.index.max())
+    aligned = prices.reindex(prices.index.union(dates)).ffill().reindex(dates).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = aligned[1:] / aligned[:-1] - 1
+    return pd.DataFrame(returns, index=dates[1:], columns=prices.columns)
+
+class RiskModel:
+    """Janela de retornos e a sua covariância por pares, atualizada por linhas.
+
+    Valores ausentes (ativo sem cotação na data) ficam fora apenas dos pares
+    que os envolvem: cada par usa as datas em que os dois têm retorno.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.prices = pd.DataFrame(columns=self.columns, dtype=float)  # preços lidos, sem alinhar
+        self.returns = pd.DataFrame(columns=self.columns, dtype=float)
+        self.last_prices = pd.Series(dtype=float)
+        self.stamp = {}  # chave do histórico -> última data armazenada na leitura
+        self.checked_at = 0.0
+        self._reset()
+
+    def copy(self):
+        """Cópia com somas próprias (as tabelas são sempre substituídas, nunca alteradas)."""
+        model = copy.copy(self)
+        model._count, model._cross, model._sums = self._count.copy(), self._cross.copy(), self._sums.copy()
+        return model
+
+    def _reset(self):
+        n = len(self.columns)
+        self._count = np.zeros((n, n))  # datas com os dois retornos
+        self._cross = np.zeros((n, n))  # Σ rᵢ·rⱼ
+        self._sums = np.zeros((n, n))   # Σ rᵢ nas datas em que j também tem retorno
+        self._updates = 0
+
+    def _accumulate(self, rows, sign):
+        values = rows.to_numpy(dtype=np.float64)
+        present = np.isfinite(values)
+        r = np.where(present, values, 0.0)
+        m = present.astype(np.float64)
+        self._count += sign * (m.T @ m)
+        self._cross += sign * (r.T @ r)
+        self._sums += sign * (r.T @ m)
+
+    def update(self, returns):
+        """Troca a janela pela nova, somando/subtraindo só as linhas que mudaram.
+
+        Além das datas que entraram ou saíram da janela, são trocadas as
+        datas em comum cujos retornos mudaram (pregão em andamento, barras
+        que chegaram atrasadas e substituíram um retorno zero do ffill).
+        """
+        old = self.returns
+        if old.empty or returns.empty or self._updates >= RISK_REBUILD_UPDATES:
+            self._reset()
+            self._accumulate(returns, 1)
+        else:
+            overlap = old.index.intersection(returns.index)
+            before = old.loc[overlap].to_numpy(dtype=np.float64)
+            after = returns.loc[overlap].to_numpy(dtype=np.float64)
+            same = ((before == after) | (np.isnan(before) & np.isnan(after))).all(axis=1)
+            changed = overlap[~same]
+            self._accumulate(old[~old.index.isin(overlap) | old.index.isin(changed)], -1)
+            self._accumulate(returns[~returns.index.isin(overlap) | returns.index.isin(changed)], 1)
+            self._updates += 1
+        self.returns = returns
+
+    def covariance(self):
+        """Matriz de covariância diária por pares (NaN para pares com menos de duas datas)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self._cross - self._sums * self._sums.T / self._count) / (self._count - 1)
+        return np.where(self._count > 1, cov, np.nan)
+
+    def means(self):
+        """Retorno médio diário de cada coluna."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.diagonal(self._sums) / np.diagonal(self._count)
+
+def load_risk_prices(frame, benchmark, reporting_currency=None, errors=None, lookback_days=RISK_LOOKBACK_DAYS):
+    """Preços das posições (na moeda de referência) e do benchmark, nas datas de cada um.
+
+    O benchmark fica na última coluna. Com `lookback_days` menor, lê só o
+    trecho final (atualização incremental).
+    """
+    errors = [] if errors is None else errors
+    api_choice, identifier = benchmark
+    benchmark_tracker = AssetTracker(api_choice, identifier, identifier)
+    benchmark_future = get_fetch_executor().submit(benchmark_tracker.get_historical_data, lookback_days)
+    prices = load_price_matrix(frame, lookback_days, errors)
+    benchmark_prices = benchmark_future.result()
+    errors.extend(benchmark_tracker.errors)
+    if prices.empty:
+        return prices
+
+    if reporting_currency:
+        currencies = frame.drop_duplicates('price_key').set_index('price_key')['currency'].astype(object)
+        currencies = currencies.reindex(prices.columns)
+        fx = load_fx_matrix(set(currencies), reporting_currency, lookback_days + RISK_FX_MARGIN_DAYS, errors)
+        if not fx.empty:
+            # Câmbio do dia de cada preço; antes da primeira cotação vale a mais antiga conhecida
+            factors = (fx.reindex(fx.index.union(prices.index)).ffill().bfill()
+                       .reindex(index=prices.index, columns=currencies).to_numpy())
+            prices = prices * np.where(np.isnan(factors), 1.0, factors)
+
+    # O benchmark fica na sua própria moeda (beta contra o índice como ele é cotado)
+    return prices.join(benchmark_prices.rename(BENCHMARK_COLUMN), how='outer')
+
+def aligned_returns(prices, since=None):
+    """Retornos por dia útil de `prices`, opcionalmente só a partir de `since`.
+
+    Com `since`, alinha apenas o trecho a partir da última cotação de cada
+    coluna anterior a `since`: o ffill dá o mesmo que sobre a matriz inteira.
+    """
+    if since is None:
+        return return_matrix(prices)
+    before = prices[prices.index < since]
+    seeds = [before[column].last_valid_index() for column in before]
+    start = min((seed for seed in seeds if seed is not None), default=since)
+    returns = return_matrix(prices[prices.index >= start])
+    return returns[returns.index >= since]
+
+def _stamp_keys(frame, benchmark, reporting_currency):
+    """Chaves de histórico cujas barras novas mudam o modelo: posições, benchmark e câmbio."""
+    keys = sorted(frame['price_key'].unique())
+    keys.append(price_cache_key(*benchmark))
+    if reporting_currency:
+        currencies = set(frame['currency'].astype(object)) - {reporting_currency}
+        keys += [price_cache_key(FX_API_CHOICE, fx_ticker(currency, reporting_currency))
+                 for currency in sorted(currencies)]
+    return keys
+
+def _incremental_start(model, stamp_keys):
+    """Data a partir da qual os preços do modelo podem ter mudado, ou None para reler tudo.
+
+    A atualização incremental de um histórico só grava barras a partir da
+    sua última data, então basta reler a partir da menor delas.
+    """
+    if (model is None or set(model.stamp) != set(stamp_keys) or None in model.stamp.values()
+            or model._updates + 1 >= RISK_REBUILD_UPDATES):
+        # Releitura completa de tempos em tempos (cobre históricos baixados de novo por inteiro)
+        return None
+    since = min(pd.Timestamp(last_date) for last_date in model.stamp.values())
+    if since <= pd.Timestamp.today().normalize() - pd.Timedelta(days=RISK_LOOKBACK_DAYS):
+        return None
+    return since
+
+def _refresh_risk_model(cache_key, frame, benchmark, reporting_currency, stamp_keys):
+    """Monta e publica um modelo novo a partir do anterior; retorna (modelo, erros)."""
+    errors = []
+    cached = _risk_model_cache.peek(cache_key)
+    today = pd.Timestamp.today().normalize()
+    since = _incremental_start(cached, stamp_keys)
+    prices = None
+    if since is not None:
+        tail = load_risk_prices(frame, benchmark, reporting_currency, errors, (today - since).days + 1)
+        if not tail.empty and set(tail.columns) <= set(cached.columns):
+            prices = pd.concat([cached.prices[cached.prices.index < since],
+                                tail[tail.index >= since].reindex(columns=cached.columns)])
+    if prices is None:
+        since = None
+        prices = load_risk_prices(frame, benchmark, reporting_currency, errors)
+    prices = prices[prices.index >= today - pd.Timedelta(days=RISK_LOOKBACK_DAYS)]
+    if prices.empty:
+        return None, errors
+
+    if since is None:
+        model = RiskModel(prices.columns)
+        returns = return_matrix(prices)
+    else:
+        model = cached.copy()
+        returns = pd.concat([cached.returns[cached.returns.index < since], aligned_returns(prices, since)])
+        # Mesma primeira data da matriz completa (retornos a partir do 2º dia útil da janela)
+        first_day = pd.bdate_range(prices.index.min(), periods=1)[0]
+        returns = returns[returns.index > first_day]
+    model.update(returns.iloc[-RISK_WINDOW_DAYS:])
+    model.prices = prices
+    model.last_prices = prices.drop(columns=BENCHMARK_COLUMN).ffill().iloc[-1]
+    last_dates = get_history_store().get_last_dates()
+    model.stamp = {key: last_dates.get(key) for key in stamp_keys}
+    model.checked_at = time.time()
+    _risk_model_cache.set(cache_key, model, RISK_MODEL_TTL_SECONDS)
+    return model, errors
+
+def get_risk_model(frame, benchmark, reporting_currency=None, errors=None):
+    """Modelo de risco da carteira, atualizado só quando chegam novas barras.
+
+    Até `HISTORY_REFRESH_SECONDS` depois da última conferência, ou enquanto
+    o histórico armazenado não muda, o modelo em memória é devolvido sem
+    ler nada. Com barras novas, só o trecho final dos preços é relido e a
+    covariância é atualizada por linhas, em uma cópia: o modelo devolvido
+    nunca muda depois de publicado, e sessões simultâneas podem usá-lo
+    enquanto outra o atualiza. Atualizações simultâneas da mesma carteira
+    são feitas uma vez só.
+    """
+    keys = tuple(sorted(frame['price_key'].unique()))
+    cache_key = (keys, benchmark, reporting_currency)
+    stamp_keys = _stamp_keys(frame, benchmark, reporting_currency)
+    cached = _risk_model_cache.get(cache_key)
+    if cached is not None and time.time() - cached.checked_at < HISTORY_REFRESH_SECONDS:
+        last_dates = get_history_store().get_last_dates()
+        if cached.stamp == {key: last_dates.get(key) for key in stamp_keys}:
+            return cached
+
+    model, refresh_errors = _risk_flight.do(cache_key, _refresh_risk_model,
+                                            cache_key, frame, benchmark, reporting_currency, stamp_keys)
+    if errors is not None:
+        errors.extend(refresh_errors)
+    return model
+
+def risk_report(model, quantities, confidences=VAR_CONFIDENCES):
+    """Indicadores de risco para as quantidades informadas (Series por price_key).
+
+    VaR/CVaR são perdas de um dia, em valor monetário: o histórico usa os
+    retornos diários da carteira na janela; o paramétrico supõe retornos
+    normais com a média e a covariância estimadas.
+    """
+    assets = model.columns[:-1]
+    cov = model.covariance()
+    means = model.means()
+    variances = np.diagonal(cov)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(variances)
+        correlation = cov / np.outer(std, std)
+        betas = cov[:-1, -1] / variances[-1]
+
+    values = (quantities.groupby(level=0).sum().reindex(assets).fillna(0.0)
+              * model.last_prices.reindex(assets).fillna(0.0))
+    total = float(values.sum())
+    weights = (values / total).to_numpy() if total else np.zeros(len(assets))
+
+    asset_cov = np.nan_to_num(cov[:-1, :-1])
+    portfolio_std = float(np.sqrt(max(weights @ asset_cov @ weights, 0.0)))
+    portfolio_mean = float(np.nan_to_num(means[:-1]) @ weights)
+    portfolio_returns = pd.Series(np.nan_to_num(model.returns[assets].to_numpy()) @ weights,
+                                  index=model.returns.index)
+
+    var_rows = {}
+    for confidence in confidences:
+        tail = 1 - confidence
+        cutoff = float(np.quantile(portfolio_returns, tail))
+        losses = portfolio_returns[portfolio_returns <= cutoff]
+        z = NormalDist().inv_cdf(tail)
+        var_rows[f"{confidence:.0%}"] = {
+            'VaR histórico': -cutoff * total,
+            'CVaR histórico': -float(losses.mean()) * total,
+            'VaR paramétrico': -(portfolio_mean + z * portfolio_std) * total,
+            'CVaR paramétrico': -(portfolio_mean - portfolio_std * NormalDist().pdf(z) / tail) * total,
+        }
+
+    annualize = np.sqrt(TRADING_DAYS_PER_YEAR)
+    return {
+        'value': total,
+        'assets': pd.DataFrame({'weight': weights, 'volatility': std[:-1] * annualize, 'beta': betas},
+                               index=assets),
+        'correlation': pd.DataFrame(correlation[:-1, :-1], index=assets, columns=assets),
+        'portfolio_volatility': portfolio_std * annualize,
+        'portfolio_beta': float(np.nansum(betas * weights)),
+        'rolling_volatility': portfolio_returns.rolling(ROLLING_VOLATILITY_DAYS).std() * annualize,
+        'var': pd.DataFrame(var_rows).T,
+        'observations': len(portfolio_returns),
+    }
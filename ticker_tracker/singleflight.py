@@ -0,0 +1,71 @@
+"""Coalescência de buscas: uma única requisição em andamento por chave.
+
+Quando várias sessões pedem a mesma cotação ou o mesmo histórico ao mesmo
+tempo, apenas a primeira chamada vai ao provedor; as demais aguardam o
+resultado dela.
+"""
+import threading
+from concurrent.futures import Future
+
+from .metrics import get_metrics
+
+class SingleFlight:
+    """Registro de buscas em andamento, identificadas por chave."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}  # chave -> Future da busca em andamento
+
+    def do(self, key, fn, *args, **kwargs):
+        """Executa `fn` ou, se já houver execução para `key`, aguarda o resultado dela."""
+        owned, in_flight = self.claim([key])
+        if in_flight:
+            return in_flight[key].result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.resolve(owned, error=e)
+            raise
+        self.resolve(owned, {key: result})
+        return result
+
+    def claim(self, keys):
+        """Reivindica as chaves livres para o chamador.
+
+        Retorna dois dicionários {chave: Future}: as chaves reivindicadas,
+        que o chamador deve buscar e depois liberar com `resolve`, e as que
+        já estão sendo buscadas por outra chamada.
+        """
+        owned, in_flight = {}, {}
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    future = self._calls[key] = Future()
+                    owned[key] = future
+                else:
+                    in_flight[key] = future
+        metrics = get_metrics()
+        if owned:
+            metrics.inc("singleflight_leader_total", len(owned), flight=self.name)
+        if in_flight:
+            metrics.inc("singleflight_shared_total", len(in_flight), flight=self.name)
+        return owned, in_flight
+
+    def resolve(self, owned, results=None, error=None):
+        """Publica o resultado (ou o erro) das chaves reivindicadas e as libera."""
+        with self._lock:
+            for key, future in owned.items():
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+        for key, future in owned.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result((results or {}).get(key))
+
+    def in_flight(self):
+        """Quantidade de chaves com busca em andamento."""
+        with self._lock:
+            return len(self._calls)
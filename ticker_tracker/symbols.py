@@ -0,0 +1,377 @@
+"""Índice local de símbolos para autocompletar buscas sem ir à rede.
+
+Reúne a lista de moedas da CoinGecko e a listagem de ativos da B3 (mais os
+identificadores já validados), persistidas em disco e atualizadas em
+segundo plano. Até a listagem da B3 ser baixada, vale uma pequena base
+fixa das ações mais negociadas. As consultas por prefixo usam termos
+ordenados com busca binária; as aproximadas (um erro de digitação) usam
+um dicionário de variantes com uma letra removida, de modo que cada busca
+custa poucas consultas a dicionário, não uma varredura da lista.
+"""
+import bisect
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Arquivo com o índice persistido
+SYMBOL_INDEX_FILE = "symbol_index.json"
+# Idade máxima das listagens antes de buscá-las de novo (segundos)
+SYMBOL_REFRESH_SECONDS = 24 * 3600
+# Espera após uma atualização que falhou (ex.: sem rede)
+SYMBOL_RETRY_SECONDS = 15 * 60
+
+# Termos mais longos que isso não entram no índice aproximado (limita a memória)
+FUZZY_MAX_LENGTH = 12
+# Tamanho mínimo da consulta para buscar aproximações
+FUZZY_MIN_QUERY = 3
+# Consultas de até esse tamanho (ex.: "b") usam candidatos pré-calculados
+SHORT_PREFIX_LENGTH = 2
+SHORT_PREFIX_CANDIDATES = 50
+# Máximo de termos examinados nas demais consultas por prefixo
+PREFIX_SCAN_LIMIT = 500
+
+# Base de ações da B3 (ticker do Yahoo, nome) usada até a listagem completa ser baixada;
+# não é o universo da bolsa
+B3_TICKERS = (
+    ("PETR3.SA", "Petrobras ON"), ("PETR4.SA", "Petrobras PN"), ("VALE3.SA", "Vale"),
+    ("ITUB4.SA", "Itaú Unibanco"), ("BBDC3.SA", "Bradesco ON"), ("BBDC4.SA", "Bradesco PN"),
+    ("BBAS3.SA", "Banco do Brasil"), ("SANB11.SA", "Santander Brasil"), ("BPAC11.SA", "BTG Pactual"),
+    ("ITSA4.SA", "Itaúsa"), ("B3SA3.SA", "B3"), ("BBSE3.SA", "BB Seguridade"),
+    ("ABEV3.SA", "Ambev"), ("WEGE3.SA", "WEG"), ("RENT3.SA", "Localiza"),
+    ("SUZB3.SA", "Suzano"), ("KLBN11.SA", "Klabin"), ("GGBR4.SA", "Gerdau"),
+    ("GOAU4.SA", "Metalúrgica Gerdau"), ("CSNA3.SA", "CSN"), ("CMIN3.SA", "CSN Mineração"),
+    ("USIM5.SA", "Usiminas"), ("ELET3.SA", "Eletrobras"), ("EGIE3.SA", "Engie Brasil"),
+    ("EQTL3.SA", "Equatorial"), ("CPLE6.SA", "Copel"), ("CMIG4.SA", "Cemig"),
+    ("CPFE3.SA", "CPFL Energia"), ("TAEE11.SA", "Taesa"), ("ENEV3.SA", "Eneva"),
+    ("SBSP3.SA", "Sabesp"), ("SAPR4.SA", "Sanepar"), ("RADL3.SA", "Raia Drogasil"),
+    ("FLRY3.SA", "Fleury"), ("HAPV3.SA", "Hapvida"), ("RDOR3.SA", "Rede D'Or"),
+    ("BIOM3.SA", "Biomm"), ("LREN3.SA", "Lojas Renner"), ("MGLU3.SA", "Magazine Luiza"),
+    ("ASAI3.SA", "Assaí"), ("JBSS3.SA", "JBS"), ("BRFS3.SA", "BRF"),
+    ("PRIO3.SA", "PRIO"), ("UGPA3.SA", "Ultrapar"), ("VBBR3.SA", "Vibra Energia"),
+    ("CSAN3.SA", "Cosan"), ("RAIL3.SA", "Rumo"), ("EMBR3.SA", "Embraer"),
+    ("TOTS3.SA", "Totvs"), ("VIVT3.SA", "Telefônica Brasil"), ("TIMS3.SA", "TIM"),
+    ("AMGN34.SA", "Amgen BDR"),
+)
+
+SymbolEntry = namedtuple('SymbolEntry', 'api_choice identifier symbol name')
+
+def _stock_entry(ticker, name):
+    return SymbolEntry("yahoo_stock", ticker, ticker.split(".")[0], name)
+
+def _seed_entries():
+    return [_stock_entry(ticker, name) for ticker, name in B3_TICKERS]
+
+def _listings():
+    """Listagem completa de cada provedor: {api_choice: função que devolve [SymbolEntry]}."""
+    from .providers import fetch_crypto_symbols, fetch_stock_symbols
+
+    return {
+        "yahoo_stock": lambda: [_stock_entry(ticker, name) for ticker, name in fetch_stock_symbols()],
+        "coingecko": lambda: [SymbolEntry("coingecko", coin_id, symbol.upper(), name)
+                              for coin_id, symbol, name in fetch_crypto_symbols()],
+    }
+
+# Provedores com listagem completa no índice principal
+LISTED_PROVIDERS = ("yahoo_stock", "coingecko")
+
+def normalize(text):
+    """Minúsculas sem acentos, para comparar termos."""
+    decomposed = unicodedata.normalize('NFKD', str(text).strip().lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def _deletes(term):
+    """Variantes do termo com uma letra removida."""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def _entry_terms(entry):
+    """Termos pesquisáveis de uma entrada: (termo, é identificador/símbolo)."""
+    identifier = normalize(entry.identifier)
+    terms = {identifier: True, normalize(entry.symbol): True}
+    if entry.api_choice == "yahoo_stock" and "." in identifier:
+        terms[identifier.split(".")[0]] = True  # ticker sem o sufixo da bolsa
+    name = normalize(entry.name)
+    terms.setdefault(name, False)
+    for word in name.split():
+        terms.setdefault(word, False)
+    terms.pop("", None)
+    return terms.items()
+
+def _prefix_score(term, rank, query_length):
+    """Pontuação de um casamento por prefixo: identificadores antes de nomes, termos curtos antes."""
+    return 1.0 + rank * 0.5 + (len(term) - query_length) * 0.01
+
+class SymbolIndex:
+    """Índice imutável de símbolos com busca por prefixo e por aproximação."""
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        self.api_choices = frozenset(entry.api_choice for entry in self.entries)
+        self._by_identifier = {}  # (api_choice, identificador normalizado) -> posição
+        self._exact = {}          # identificador/símbolo normalizado -> [posições]
+        self._deleted = {}        # variante com uma letra a menos -> [posições]
+        terms = []
+        for position, entry in enumerate(self.entries):
+            self._by_identifier[(entry.api_choice, normalize(entry.identifier))] = position
+            for term, is_key in _entry_terms(entry):
+                terms.append((term, 0 if is_key else 1, position))
+                if is_key:
+                    self._exact.setdefault(term, []).append(position)
+                    if len(term) <= FUZZY_MAX_LENGTH:
+                        for variant in _deletes(term):
+                            self._deleted.setdefault(variant, []).append(position)
+        terms.sort()
+        self._terms = [term for term, _, _ in terms]
+        self._refs = [(rank, position) for _, rank, position in terms]
+
+        # Prefixos curtos casam com milhares de termos: guarda só os melhores, por provedor
+        short = {}
+        for term, rank, position in terms:
+            api_choice = self.entries[position].api_choice
+            for length in range(1, min(len(term), SHORT_PREFIX_LENGTH) + 1):
+                candidate = (_prefix_score(term, rank, length), position)
+                short.setdefault((None, term[:length]), []).append(candidate)
+                short.setdefault((api_choice, term[:length]), []).append(candidate)
+        self._short = {key: heapq.nsmallest(SHORT_PREFIX_CANDIDATES, candidates)
+                       for key, candidates in short.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, api_choice, identifier):
+        """Entrada do identificador exato (validação), ou None."""
+        position = self._by_identifier.get((api_choice, normalize(identifier)))
+        return None if position is None else self.entries[position]
+
+    def scored(self, query, api_choice=None):
+        """{posição: pontuação} das entradas que casam com a consulta (menor é melhor)."""
+        query = normalize(query)
+        scores = {}
+        if not query:
+            return scores
+
+        def add(position, score):
+            if api_choice is not None and self.entries[position].api_choice != api_choice:
+                return
+            if score < scores.get(position, float('inf')):
+                scores[position] = score
+
+        for position in self._exact.get(query, ()):
+            add(position, 0.0)
+
+        if len(query) <= SHORT_PREFIX_LENGTH:
+            for score, position in self._short.get((api_choice, query), ()):
+                add(position, score)
+            return scores
+
+        # Prefixo: termos ordenados, do primeiro >= consulta enquanto começarem por ela
+        start = bisect.bisect_left(self._terms, query)
+        for offset in range(start, min(start + PREFIX_SCAN_LIMIT, len(self._terms))):
+            term = self._terms[offset]
+            if not term.startswith(query):
+                break
+            rank, position = self._refs[offset]
+            add(position, _prefix_score(term, rank, len(query)))
+
+        # Aproximação (distância de edição até 1) por variantes com uma letra removida
+        if len(query) >= FUZZY_MIN_QUERY:
+            for position in self._deleted.get(query, ()):            # falta uma letra na consulta
+                add(position, 3.0)
+            for variant in _deletes(query):
+                for position in self._exact.get(variant, ()):         # sobra uma letra
+                    add(position, 3.0)
+                for position in self._deleted.get(variant, ()):       # letra trocada
+                    add(position, 3.5)
+        return scores
+
+    def search(self, query, limit=10, api_choice=None):
+        """Melhores entradas para a consulta: exatas, depois prefixos, depois aproximações."""
+        scores = self.scored(query, api_choice)
+        best = sorted(scores, key=lambda position: (scores[position], len(self.entries[position].identifier)))
+        return [self.entries[position] for position in best[:limit]]
+
+class SymbolCatalog:
+    """Índice de símbolos persistido em disco e atualizado em segundo plano.
+
+    O índice principal (listagens da B3 e da CoinGecko) é trocado inteiro a
+    cada atualização; identificadores validados depois (posições da
+    carteira, buscas bem-sucedidas no Yahoo) ficam em um índice pequeno à
+    parte, reconstruído na hora. Até o arquivo ser carregado (em segundo
+    plano) e enquanto a listagem da B3 não tiver sido baixada, as ações vêm
+    da base fixa `B3_TICKERS`.
+    """
+
+    def __init__(self, path=SYMBOL_INDEX_FILE, refresh_interval=SYMBOL_REFRESH_SECONDS):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.updated_at = 0
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._last_attempt = 0.0
+        self._loaded = False
+        self._listed = frozenset()  # provedores cuja listagem completa está no índice
+        self._index = SymbolIndex(_seed_entries())
+        self._learned = {}  # (api_choice, identificador normalizado) -> SymbolEntry
+        self._learned_index = SymbolIndex(())
+
+    def load(self):
+        """Carrega o índice gravado em disco, mantendo o que já foi aprendido nesta execução."""
+        entries, learned, updated_at, listed = [], [], 0, ()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                entries = [SymbolEntry(*row) for row in data['entries']]
+                learned = [SymbolEntry(*row) for row in data.get('learned', [])]
+                updated_at = data.get('updated_at', 0)
+                # Arquivos anteriores à listagem da B3 só traziam a lista de moedas
+                listed = data.get('listed', {entry.api_choice for entry in entries} - {"yahoo_stock"})
+            except (OSError, ValueError, KeyError, TypeError):
+                logger.warning("Índice de símbolos inválido em %s; usando a base local", self.path)
+        index = SymbolIndex(entries) if entries else None
+        with self._lock:
+            if index is not None:
+                self._index = index
+                self.updated_at = updated_at
+                self._listed = frozenset(listed)
+            saved_keys = set()
+            for entry in learned:
+                key = (entry.api_choice, normalize(entry.identifier))
+                saved_keys.add(key)
+                self._learned.setdefault(key, entry)
+            unsaved = len(self._learned) > len(saved_keys)
+            self._learned_index = SymbolIndex(self._learned.values())
+            self._loaded = True
+        if unsaved:
+            try:
+                self._save()
+            except OSError:
+                logger.exception("Falha ao gravar o índice de símbolos")
+
+    def _save(self):
+        with self._lock:
+            data = {'updated_at': self.updated_at,
+                    'listed': sorted(self._listed),
+                    'entries': [list(entry) for entry in self._index.entries],
+                    'learned': [list(entry) for entry in self._learned.values()]}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def is_stale(self):
+        """Listagens vencidas ou alguma ainda não baixada."""
+        return (time.time() - self.updated_at >= self.refresh_interval
+                or not self._listed.issuperset(LISTED_PROVIDERS))
+
+    def has_listing(self, api_choice):
+        """Indica se a listagem completa do provedor (B3 ou CoinGecko) já foi carregada."""
+        return api_choice in self._listed
+
+    def lookup(self, api_choice, identifier):
+        return (self._index.lookup(api_choice, identifier)
+                or self._learned_index.lookup(api_choice, identifier))
+
+    def search(self, query, limit=10, api_choice=None):
+        """Sugestões para a consulta, combinando o índice principal e os validados."""
+        index, learned_index = self._index, self._learned_index
+        scores = {}
+        for source in (index, learned_index):
+            for position, score in source.scored(query, api_choice).items():
+                entry = source.entries[position]
+                key = (entry.api_choice, entry.identifier)
+                if score < scores.get(key, (float('inf'),))[0]:
+                    scores[key] = (score, len(entry.identifier), entry)
+        return [entry for _, _, entry in sorted(scores.values(), key=lambda item: item[:2])[:limit]]
+
+    def learn(self, entries):
+        """Acrescenta identificadores validados (ignora os já conhecidos)."""
+        new = [entry for entry in entries
+               if self.lookup(entry.api_choice, entry.identifier) is None]
+        if not new:
+            return
+        with self._lock:
+            for entry in new:
+                self._learned[(entry.api_choice, normalize(entry.identifier))] = entry
+            self._learned_index = SymbolIndex(self._learned.values())
+            loaded = self._loaded
+        if not loaded:
+            return  # gravado quando o arquivo for carregado
+        try:
+            self._save()
+        except OSError:
+            logger.exception("Falha ao gravar o índice de símbolos")
+
+    def refresh(self):
+        """Busca as listagens da B3 e da CoinGecko e troca o índice principal.
+
+        Um provedor cuja listagem falhar mantém as entradas atuais (para a
+        B3, no mínimo a base fixa); se todas falharem, o erro é propagado.
+        """
+        current = self._index.entries
+        entries, listed, error = [], set(), None
+        for api_choice, fetch in _listings().items():
+            try:
+                entries += fetch()
+                listed.add(api_choice)
+            except Exception as e:
+                logger.warning("Falha ao buscar a listagem de símbolos de %s: %s", api_choice, e)
+                error = e
+                entries += [entry for entry in current if entry.api_choice == api_choice]
+        if not listed:
+            raise error
+        # A base fixa completa a listagem da B3 (e a substitui se ela falhou)
+        known = {entry.identifier for entry in entries if entry.api_choice == "yahoo_stock"}
+        entries += [entry for entry in _seed_entries() if entry.identifier not in known]
+        index = SymbolIndex(entries)
+        with self._lock:
+            self._index = index
+            self._listed = self._listed | listed
+            self.updated_at = time.time()
+        self._save()
+
+    def refresh_async(self):
+        """Carrega o arquivo e atualiza o índice vencido em segundo plano (sem bloquear quem chama)."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            if self._loaded and (not self.is_stale or time.time() - self._last_attempt < SYMBOL_RETRY_SECONDS):
+                return
+            self._refresh_thread = threading.Thread(target=self._background, name="symbol-index", daemon=True)
+            self._refresh_thread.start()
+
+    def _background(self):
+        if not self._loaded:
+            self.load()
+        if self.is_stale:
+            self._last_attempt = time.time()
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Falha ao atualizar o índice de símbolos")
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_symbol_catalog():
+    """Índice de símbolos do processo (carregado do disco e atualizado em segundo plano)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = SymbolCatalog()
+    _catalog.refresh_async()
+    return _catalog
+
+def set_symbol_catalog(catalog):
+    """Substitui o índice de símbolos do processo (ex.: outro arquivo)."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
@@ -0,0 +1,126 @@
+"""Séries temporais do portfólio construídas sobre matrizes de preços alinhadas."""
+import numpy as np
+import pandas as pd
+
+from .cache import price_cache_key
+from .executor import get_fetch_executor
+from .fx import FX_API_CHOICE, fx_ticker
+from .history import HISTORY_REFRESH_SECONDS, get_history_store
+from .marketdata import get_market_data_cache
+from .tracker import AssetTracker
+
+def load_price_matrix(frame, days_or_period, errors=None):
+    """Carrega o histórico de todas as posições como matriz (datas × price_key)."""
+    executor = get_fetch_executor()
+    trackers = [AssetTracker(row.api_choice, row.identifier, row.display_name)
+                for row in frame.drop_duplicates('price_key').itertuples(index=False)]
+    futures = [executor.submit(tracker.get_historical_data, days_or_period) for tracker in trackers]
+
+    columns = {}
+    for tracker, future in zip(trackers, futures):
+        series = future.result()
+        if not series.empty:
+            columns[tracker.cache_key] = series
+        if errors is not None:
+            errors.extend(tracker.errors)
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1, sort=True)
+
+def load_fx_matrix(currencies, reporting_currency, days_or_period, errors=None):
+    """Histórico de câmbio (datas × moeda) para a moeda de referência.
+
+    Os pares de câmbio são tratados como qualquer outro ativo: ficam no
+    mesmo armazenamento de históricos e são atualizados incrementalmente.
+    """
+    sources = sorted(set(currencies) - {reporting_currency})
+    if not sources:
+        return pd.DataFrame()
+    executor = get_fetch_executor()
+    trackers = {currency: AssetTracker(FX_API_CHOICE, fx_ticker(currency, reporting_currency),
+                                       f"{currency}/{reporting_currency}")
+                for currency in sources}
+    futures = {currency: executor.submit(tracker.get_historical_data, days_or_period)
+               for currency, tracker in trackers.items()}
+
+    columns = {}
+    for currency, future in futures.items():
+        series = future.result()
+        if not series.empty:
+            columns[currency] = series
+        if errors is not None:
+            errors.extend(trackers[currency].errors)
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1, sort=True)
+
+def compute_portfolio_history(frame, price_matrix, fx_matrix=None):
+    """Calcula o valor diário do portfólio a partir da matriz de preços.
+
+    As séries são alinhadas em um índice diário comum (feriados da B3 e fins
+    de semana repetem o último fechamento, já que cripto negocia todo dia),
+    cada posição é zerada antes da sua `purchase_date` e o resultado é a soma
+    ponderada pelas quantidades, tudo em operações sobre a matriz inteira.
+    Posições sem cotação em uma data usam o preço de compra. Com
+    `fx_matrix` (de `load_fx_matrix`), cada preço é convertido pelo câmbio
+    do dia e o valor investido pelo câmbio da data de compra.
+    """
+    if price_matrix.empty:
+        return pd.DataFrame(columns=['Valor do Portfólio', 'Valor Investido'])
+
+    dates = pd.date_range(price_matrix.index.min(), price_matrix.index.max(), freq='D')
+    prices = price_matrix.reindex(index=dates, columns=frame['price_key']).ffill().to_numpy()
+
+    quantities = frame['quantity'].to_numpy()
+    purchase_prices = frame['purchase_price'].to_numpy()
+    purchase_dates = pd.to_datetime(frame['purchase_date'], errors='coerce').fillna(dates[0]).to_numpy('datetime64[ns]')
+
+    held = dates.to_numpy()[:, None] >= purchase_dates[None, :]
+    prices = np.where(np.isnan(prices), purchase_prices[None, :], prices)
+    if fx_matrix is not None and not fx_matrix.empty:
+        # Câmbio por data e posição; antes da primeira cotação vale a mais antiga conhecida
+        fx = (fx_matrix.reindex(fx_matrix.index.union(dates)).ffill().bfill()
+              .reindex(index=dates, columns=frame['currency'].astype(object)).to_numpy())
+        fx = np.where(np.isnan(fx), 1.0, fx)
+        purchase_rows = np.clip(dates.to_numpy().searchsorted(purchase_dates), 0, len(dates) - 1)
+        purchase_prices = purchase_prices * fx[purchase_rows, np.arange(len(purchase_rows))]
+        prices = prices * fx
+    values = np.where(held, prices * quantities, 0.0).sum(axis=1)
+    invested = np.where(held, purchase_prices * quantities, 0.0).sum(axis=1)
+    return pd.DataFrame({'Valor do Portfólio': values, 'Valor Investido': invested}, index=dates)
+
+def get_portfolio_history(frame, days_or_period, errors=None, reporting_currency=None):
+    """Curva de valor do portfólio, recalculada apenas quando chegam novas barras.
+
+    Com `reporting_currency`, os valores são convertidos pelo câmbio histórico;
+    sem ela, cada posição fica na sua moeda nativa.
+    """
+    signature = pd.util.hash_pandas_object(
+        frame[['price_key', 'quantity', 'purchase_price', 'purchase_date']], index=False
+    ).sum()
+    # Curvas compartilhadas por todo o processo, no cache compacto de dados de mercado
+    cache_key = ("portfolio_history", int(signature), days_or_period, reporting_currency)
+    cache = get_market_data_cache()
+    store = get_history_store()
+
+    currencies = set(frame['currency'].astype(object)) if reporting_currency else set()
+    stamp_keys = list(frame['price_key'])
+    stamp_keys += [price_cache_key(FX_API_CHOICE, fx_ticker(currency, reporting_currency))
+                   for currency in sorted(currencies - {reporting_currency})]
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        stamp, history = cached
+        last_dates = store.get_last_dates()
+        if stamp == tuple(last_dates.get(key) for key in stamp_keys):
+            return history.to_pandas()
+
+    price_matrix = load_price_matrix(frame, days_or_period, errors)
+    fx_matrix = load_fx_matrix(currencies, reporting_currency, days_or_period, errors) if currencies else None
+    history = compute_portfolio_history(frame, price_matrix, fx_matrix)
+    last_dates = store.get_last_dates()
+    stamp = tuple(last_dates.get(key) for key in stamp_keys)
+    # Expira junto com a janela de atualização incremental do histórico; totais em
+    # dinheiro ficam em float64 (em float32, carteiras grandes perderiam os centavos)
+    cache.put(cache_key, history, stamp, HISTORY_REFRESH_SECONDS, dtype=np.float64)
+    return history
@@ -0,0 +1,255 @@
+"""Classe AssetTracker: preço atual, histórico e métricas de um ativo."""
+import time
+
+import pandas as pd
+
+from .board import get_quote_board
+from .cache import price_cache_key
+from .executor import CircuitOpenError, get_fetch_executor
+from .fx import currency_symbol, native_currency
+from .history import FULL_HISTORY_START, HISTORY_REFRESH_SECONDS, get_history_store, level_for_span
+from .intraday import INTERVAL_SECONDS, INTRADAY_INITIAL_PERIOD, get_intraday_store
+from .metrics import get_metrics
+from .portfolio import position_metrics
+from .pricing import get_prices_batch
+from .providers import (COINGECKO_BASE_URL, COINGECKO_INTRADAY_INTERVALS, fetch_crypto_history,
+                        fetch_crypto_intraday, fetch_stock_history, fetch_stock_intraday)
+from .singleflight import SingleFlight
+
+# Atualizações de histórico em andamento, por ativo e cobertura pedida
+_history_flight = SingleFlight("history")
+_intraday_flight = SingleFlight("intraday")
+
+class AssetTracker:
+    def __init__(self, api_choice, identifier, display_symbol, purchase_date=None, quantity=None, purchase_price=None,
+                 realized_pnl=0.0, realized_pnl_fifo=0.0, fifo_cost=None):
+        self.api_choice = api_choice
+        self.display_symbol = display_symbol
+        self.purchase_date = purchase_date
+        self.quantity = quantity
+        # Preço médio da posição; os agregados abaixo vêm do livro de operações
+        self.purchase_price = purchase_price
+        self.realized_pnl = realized_pnl or 0.0
+        self.realized_pnl_fifo = realized_pnl_fifo or 0.0
+        self.fifo_cost = fifo_cost
+        # Mensagens de erro das buscas (exibidas por quem usa o tracker)
+        self.errors = []
+        # Idade (s) do último preço obtido quando veio da última cotação conhecida; None se atual
+        self.quote_age = None
+        
+        self._setup_api_config(identifier)
+
+    def _setup_api_config(self, identifier):
+        if self.api_choice == "coingecko":
+            self.crypto_id = identifier
+            self.base_url = COINGECKO_BASE_URL
+            self.stock_ticker = None
+        elif self.api_choice == "yahoo_stock":
+            self.stock_ticker = identifier
+            self.crypto_id = None
+        else:
+            raise ValueError("API inválida. Use 'coingecko' ou 'yahoo_stock'.")
+
+    @property
+    def identifier(self):
+        return self.stock_ticker or self.crypto_id
+
+    @property
+    def cache_key(self):
+        return price_cache_key(self.api_choice, self.identifier)
+
+    @property
+    def intraday_intervals(self):
+        """Intervalos intradiários que o provedor do ativo fornece."""
+        if self.api_choice == "coingecko":
+            return COINGECKO_INTRADAY_INTERVALS
+        return tuple(INTERVAL_SECONDS)
+
+    @property
+    def currency(self):
+        """Moeda das cotações e dos preços de compra do ativo."""
+        return native_currency(self.api_choice, self.identifier)
+
+    def get_current_price(self, max_wait=None):
+        """Obtém o preço atual do ativo (via motor de cotações em lote).
+
+        Se o provedor falhar (ou passar de `max_wait` segundos), devolve a
+        última cotação conhecida e registra a sua idade em `quote_age`.
+        """
+        stale = {}
+        with get_metrics().time("tracker_call_seconds", method="get_current_price", provider=self.api_choice):
+            prices = get_prices_batch([(self.api_choice, self.identifier)], self.errors,
+                                      stale=stale, max_wait=max_wait)
+        self.quote_age = stale.get(self.cache_key)
+        return prices.get(self.cache_key)
+
+    def get_historical_data(self, days_or_period):
+        """Obtém dados históricos do ativo a partir do armazenamento local.
+
+        Na primeira carga (ou quando o período pedido é maior que o já
+        armazenado) baixa a janela completa; depois busca apenas as barras
+        posteriores à última data gravada. Se outra chamada já estiver
+        atualizando o mesmo ativo e período, aguarda por ela em vez de
+        repetir a requisição.
+        """
+        with get_metrics().time("tracker_call_seconds", method="get_historical_data", provider=self.api_choice):
+            return self._load_historical_data(days_or_period)
+
+    def get_chart_history(self, days_or_period):
+        """Histórico do período no nível mais grosso que ainda preenche o gráfico.
+
+        Retorna (fechamentos, nível), com nível "daily", "weekly" ou "monthly"
+        conforme a extensão do período.
+        """
+        with get_metrics().time("tracker_call_seconds", method="get_chart_history", provider=self.api_choice):
+            store = get_history_store()
+            start = self._sync_period(store, days_or_period)
+            first, last = store.date_range(self.cache_key, start)
+            if first is None:
+                return pd.Series(dtype=float), "daily"
+            level = level_for_span((pd.Timestamp(last) - pd.Timestamp(first)).days)
+            return store.read_level(self.cache_key, level, start), level
+
+    def _load_historical_data(self, days_or_period):
+        store = get_history_store()
+        return store.read(self.cache_key, self._sync_period(store, days_or_period))
+
+    def _sync_period(self, store, days_or_period):
+        """Garante o período no armazenamento local e retorna a data inicial a ler."""
+        asset_key = self.cache_key
+
+        if days_or_period == "max":
+            start = None
+            coverage_start = FULL_HISTORY_START
+        else:
+            start = (pd.Timestamp.today().normalize() - pd.Timedelta(days=days_or_period)).strftime('%Y-%m-%d')
+            coverage_start = start
+
+        try:
+            _history_flight.do((asset_key, coverage_start), self._sync_history,
+                               store, days_or_period, coverage_start)
+        except CircuitOpenError as e:
+            # Mesma mensagem para todos os ativos do provedor (exibida uma vez)
+            self.errors.append(f"{e.provider} indisponível; históricos exibidos com os dados já armazenados.")
+        except Exception as e:
+            self.errors.append(f"Erro ao obter histórico de {self.display_symbol}: {e}")
+        return start
+
+    @staticmethod
+    def _history_action(meta, coverage_start):
+        """"full", "incremental" ou None conforme o que falta no armazenamento."""
+        if meta is None or meta['coverage_start'] > coverage_start:
+            return "full"
+        if meta['last_date'] and time.time() - meta['updated_at'] >= HISTORY_REFRESH_SECONDS:
+            return "incremental"
+        return None
+
+    def _sync_history(self, store, days_or_period, coverage_start):
+        """Baixa do provedor o que falta no armazenamento local para a cobertura pedida."""
+        asset_key = self.cache_key
+        if self._history_action(store.get_meta(asset_key), coverage_start) is None:
+            return
+        # Outra réplica pode estar baixando o mesmo histórico: espera por ela e confere de novo
+        with get_quote_board().exclusive(f"history:{asset_key}"):
+            meta = store.get_meta(asset_key)
+            action = self._history_action(meta, coverage_start)
+            if action == "full":
+                series = self._fetch_history(days_or_period)
+                if not series.empty:
+                    store.write(asset_key, series, coverage_start)
+            elif action == "incremental":
+                # A última barra é buscada de novo para atualizar o pregão em andamento
+                series = self._fetch_history_since(pd.Timestamp(meta['last_date']))
+                store.write(asset_key, series, meta['coverage_start'])
+
+    def get_intraday_data(self, interval):
+        """Barras intradiárias recentes ("1m", "5m" ou "15m") do buffer local.
+
+        O buffer é completado no máximo uma vez por intervalo; a série
+        retornada é uma visão do buffer, sem cópia.
+        """
+        if interval not in self.intraday_intervals:
+            raise ValueError(f"Intervalo {interval} não disponível para {self.display_symbol}.")
+        with get_metrics().time("tracker_call_seconds", method="get_intraday_data", provider=self.api_choice):
+            store = get_intraday_store()
+            if store.needs_refresh(self.cache_key, interval):
+                try:
+                    _intraday_flight.do((self.cache_key, interval), self._sync_intraday, store, interval)
+                except Exception as e:
+                    self.errors.append(f"Erro ao obter dados intradiários de {self.display_symbol}: {e}")
+            return store.read(self.cache_key, interval)
+
+    def _sync_intraday(self, store, interval):
+        """Baixa as barras posteriores à última gravada (ou a janela inicial)."""
+        last_time = store.buffer(self.cache_key, interval).last_time
+        since = pd.Timestamp(last_time, unit='s', tz='UTC') if last_time is not None else None
+        if self.api_choice == "coingecko":
+            series = fetch_crypto_intraday(self.crypto_id, since)
+        elif since is None:
+            series = fetch_stock_intraday(self.stock_ticker, interval, period=INTRADAY_INITIAL_PERIOD[interval])
+        else:
+            series = fetch_stock_intraday(self.stock_ticker, interval, start=since)
+        store.write(self.cache_key, interval, series)
+
+    def _fetch_history(self, days_or_period):
+        """Baixa a janela completa de histórico do provedor."""
+        if self.api_choice == "coingecko":
+            return fetch_crypto_history(self.crypto_id, days_or_period)
+        return fetch_stock_history(self.stock_ticker, period="max" if days_or_period == "max" else f"{days_or_period}d")
+
+    def _fetch_history_since(self, since):
+        """Baixa apenas as barras a partir de `since` (inclusive)."""
+        if self.api_choice == "coingecko":
+            days = (pd.Timestamp.today().normalize() - since).days + 1
+            return fetch_crypto_history(self.crypto_id, max(days, 1))
+        return fetch_stock_history(self.stock_ticker, start=since.strftime('%Y-%m-%d'))
+
+    def format_price(self, price):
+        """Formata o preço para exibição, na moeda do ativo."""
+        if price is None:
+            return "N/A"
+        symbol = currency_symbol(self.currency)
+        if price < 1:
+            return f"{symbol}{price:.6f}"
+        elif price < 100:
+            return f"{symbol}{price:.2f}"
+        else:
+            return f"{symbol}{price:,.2f}"
+
+    def _calculate_portfolio_metrics(self, current_price):
+        """Calcula métricas do portfólio se houver dados de compra.
+
+        Usa os agregados mantidos pelo livro de operações (preço médio, custo
+        FIFO e lucro realizado), sem reprocessar as operações.
+        """
+        if not all([self.purchase_date, self.purchase_price, self.quantity]):
+            return None
+            
+        variation, current_value, purchase_total = position_metrics(self.quantity, self.purchase_price, current_price)
+        fifo_cost = purchase_total if self.fifo_cost is None else self.fifo_cost
+        
+        return {
+            'variation': variation,
+            'current_value': current_value,
+            'purchase_total': purchase_total,
+            'unrealized_pnl': current_value - purchase_total,
+            'unrealized_pnl_fifo': current_value - fifo_cost,
+            'realized_pnl': self.realized_pnl,
+            'realized_pnl_fifo': self.realized_pnl_fifo,
+            'status': "📈" if variation > 0 else "📉"
+        }
+
+    def get_chart_link(self):
+        """Retorna o link para o gráfico completo."""
+        if self.api_choice == "yahoo_stock" and self.stock_ticker:
+            return f"https://finance.yahoo.com/quote/{self.stock_ticker}/chart?p={self.stock_ticker}"
+        elif self.api_choice == "coingecko" and self.crypto_id:
+            return f"https://www.coingecko.com/en/coins/{self.crypto_id}"
+        return ""
+
+def fetch_price_and_history(tracker, days_or_period):
+    """Obtém preço atual e histórico de um ativo em paralelo."""
+    executor = get_fetch_executor()
+    price_future = executor.submit(tracker.get_current_price)
+    history_future = executor.submit(tracker.get_historical_data, days_or_period)
+    return price_future.result(), history_future.result()